@@ -0,0 +1,626 @@
+"""
+Load-test / benchmark harness for the MCP server tools.
+
+Runs the real tool functions from mcp_server.py in-process against a local SQLite
+database. The heavy backend services are replaced by in-memory stand-ins: a numpy
+vector store with a deterministic hashing "embedding", a fixed-size chunker for
+ingestion, and a context builder over that store. SQL, auth (real JWTs), caches,
+the outbox, the full-text and tag indexes all run for real.
+
+Usage (needs the backend `app` package importable, plus aiosqlite and numpy):
+
+    python benchmark.py --memories 10000 --duration 30 --concurrency 16
+    python benchmark.py --sizes 1000,10000,100000,1000000 --output results.json
+    python benchmark.py --memories 10000 --save-baseline bench_baseline.json
+    python benchmark.py --memories 10000 --baseline bench_baseline.json --threshold 0.15
+
+Seeded databases are kept (bench_<size>.sqlite) and reused by later runs with the
+same --memories/--users/--seed. With --baseline, the exit code is 1 if any tool's
+p95 latency grew or its throughput fell by more than --threshold.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+import zlib
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+# Keep the benchmark about the tools: no background model loading, no throttling
+os.environ.setdefault("BRAIN_VAULT_WARMUP", "0")
+os.environ.setdefault("BRAIN_VAULT_RATE_LIMITS", "0")
+os.environ.setdefault("BRAIN_VAULT_LOG_LEVEL", "WARNING")
+
+logger = logging.getLogger("mcp_server.benchmark")
+
+WORDS = (
+    "alpha api async auth backend bug build cache celery chroma client config context cursor "
+    "database deploy design docker embedding endpoint error feature fastapi index ingest inbox "
+    "latency limit meeting memory migration model network note outbox pagination parser plan "
+    "postgres prompt python query queue redis release retrieval roadmap schema search server "
+    "session sqlite sprint tag task test thread token update vault vector worker"
+).split()
+TAGS = ("work", "personal", "project", "idea", "bug", "meeting", "research", "todo", "python", "infra")
+
+DEFAULT_MIX = "search=35,save=10,update=5,delete=5,list=15,tags=10,date=15,inbox=5"
+
+
+# --- IN-MEMORY STAND-INS ---
+
+class HashingEmbedder:
+    """Deterministic bag-of-words embedding (feature hashing); cheap but shaped like a model."""
+
+    def __init__(self, dim: int):
+        import numpy as np
+
+        self._np = np
+        self.dim = dim
+        self.model_name = f"bench-hashing-{dim}"
+
+    def __call__(self, input):
+        np = self._np
+        out = np.zeros((len(input), self.dim), dtype=np.float32)
+        for row, text in enumerate(input):
+            for word in text.lower().split():
+                out[row, zlib.crc32(word.encode()) % self.dim] += 1.0
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        return out / np.maximum(norms, 1e-6)
+
+
+class InMemoryVectorStore:
+    """Per-user numpy matrices with the add_documents/delete interface the server uses."""
+
+    def __init__(self, dim: int):
+        import numpy as np
+
+        self._np = np
+        self.dim = dim
+        self.embedding_function = HashingEmbedder(dim)
+        self._lock = threading.Lock()
+        # user_id -> {"vectors": ndarray, "size": int, "ids": list, "docs": list, "metas": list}
+        self._users: Dict[int, dict] = {}
+        self._where: Dict[str, tuple] = {}
+
+    def _partition(self, user_id: int) -> dict:
+        part = self._users.get(user_id)
+        if part is None:
+            part = self._users[user_id] = {
+                "vectors": self._np.zeros((1024, self.dim), dtype=self._np.float32),
+                "size": 0, "ids": [], "docs": [], "metas": [],
+            }
+        return part
+
+    def load(self, user_id: int, ids: List[str], documents: List[str], metadatas: List[dict], vectors) -> None:
+        """Bulk-load precomputed vectors (seeding)."""
+        with self._lock:
+            self._append(user_id, ids, documents, metadatas, vectors)
+
+    def _append(self, user_id, ids, documents, metadatas, vectors):
+        np = self._np
+        part = self._partition(user_id)
+        needed = part["size"] + len(ids)
+        if needed > len(part["vectors"]):
+            grown = np.zeros((max(needed, len(part["vectors"]) * 2), self.dim), dtype=np.float32)
+            grown[:part["size"]] = part["vectors"][:part["size"]]
+            part["vectors"] = grown
+        start = part["size"]
+        part["vectors"][start:needed] = vectors
+        for offset, (vector_id, doc, meta) in enumerate(zip(ids, documents, metadatas)):
+            self._where[vector_id] = (user_id, start + offset)
+            part["ids"].append(vector_id)
+            part["docs"].append(doc)
+            part["metas"].append(meta)
+        part["size"] = needed
+
+    def add_documents(self, ids: List[str], documents: List[str], metadatas: List[dict]) -> None:
+        vectors = self._np.asarray(self.embedding_function(list(documents)), dtype=self._np.float32)
+        self.delete(ids)
+        with self._lock:
+            by_user: Dict[int, list] = {}
+            for i, meta in enumerate(metadatas):
+                by_user.setdefault(int(meta.get("user_id", 0)), []).append(i)
+            for user_id, rows in by_user.items():
+                self._append(user_id, [ids[i] for i in rows], [documents[i] for i in rows],
+                             [metadatas[i] for i in rows], vectors[rows])
+
+    def delete(self, ids: List[str]) -> None:
+        with self._lock:
+            for vector_id in ids:
+                where = self._where.pop(vector_id, None)
+                if where:
+                    part = self._users[where[0]]
+                    part["vectors"][where[1]] = 0.0
+                    part["ids"][where[1]] = None
+
+    def query(self, text: str, user_id: int, k: int = 5):
+        np = self._np
+        q = np.asarray(self.embedding_function([text]), dtype=np.float32)[0]
+        with self._lock:
+            part = self._users.get(user_id)
+            if not part or not part["size"]:
+                return []
+            scores = part["vectors"][:part["size"]] @ q
+            top = np.argpartition(-scores, min(k * 2, part["size"] - 1))[:k * 2]
+            top = top[np.argsort(-scores[top])]
+            return [(part["ids"][i], part["docs"][i], part["metas"][i], float(scores[i]))
+                    for i in top if part["ids"][i] is not None][:k]
+
+    def count(self) -> int:
+        return len(self._where)
+
+
+class BenchContextBuilder:
+    def __init__(self, store: InMemoryVectorStore):
+        self.store = store
+
+    def build_context(self, query: str, user_id: int, limit_tokens: int = 2000) -> dict:
+        hits = self.store.query(query, user_id, k=8)
+        budget = limit_tokens * 4
+        parts, sources = [], []
+        for vector_id, doc, meta, score in hits:
+            if budget - len(doc) < 0 and parts:
+                break
+            budget -= len(doc)
+            parts.append(f"[{vector_id}] {doc}")
+            sources.append({"metadata": meta, "score": score})
+        return {"text": "\n\n".join(parts) or "No relevant context found.", "sources": sources}
+
+
+class BenchIngestionService:
+    CHUNK_CHARS = 1000
+
+    async def process_text(self, text: str, document_id=None, title=None, doc_type="memory", metadata=None):
+        chunks = [text[i:i + self.CHUNK_CHARS] for i in range(0, len(text), self.CHUNK_CHARS)] or [""]
+        enriched = [f"{title}\n{chunk}" if title else chunk for chunk in chunks]
+        metadatas = [dict(metadata or {}, chunk_index=i) for i in range(len(chunks))]
+        ids = [f"{doc_type}_{document_id}_{i}" for i in range(len(chunks))]
+        return ids, chunks, enriched, metadatas
+
+
+class BenchMemoryService:
+    """create_memory() as the backend does it: insert and commit, then embed and add the chunks."""
+
+    def __init__(self, server):
+        self.server = server
+
+    async def create_memory(self, db, user, content: str, source: str = "mcp", tags=None):
+        server = self.server
+        memory = server.Memory(user_id=user.id, content=content, title=_title(content),
+                               source_llm=source, tags=tags, status="pending")
+        db.add(memory)
+        await db.commit()
+        await db.refresh(memory)
+        ids, _, chunks, metadatas = await server.ingestion_service.process_text(
+            text=content, document_id=memory.id, title=memory.title, doc_type="memory",
+            metadata={"user_id": user.id, "memory_id": memory.id, "source": source},
+        )
+        store = await server.vector_store.aload()
+        store.add_documents(ids=ids, documents=chunks, metadatas=metadatas)
+        memory.embedding_id = ids[0] if ids else None
+        await db.commit()
+        return memory
+
+
+def _title(text: str) -> str:
+    return text.strip().splitlines()[0][:80] if text.strip() else ""
+
+
+class BenchRequestContext:
+    def __init__(self, token: str):
+        self.headers = {"authorization": f"Bearer {token}"}
+
+
+class BenchContext:
+    """Carries a real bearer token the way an HTTP request context does."""
+
+    def __init__(self, token: str):
+        self.request_context = BenchRequestContext(token)
+
+
+# --- SEEDING ---
+
+def _random_text(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+
+def _filler(column):
+    """A value for a NOT NULL column the benchmark doesn't care about."""
+    from sqlalchemy import Boolean, DateTime, Integer, JSON
+
+    if isinstance(column.type, Boolean):
+        return False
+    if isinstance(column.type, Integer):
+        return 0
+    if isinstance(column.type, DateTime):
+        return datetime.utcnow()
+    if isinstance(column.type, JSON):
+        return {}
+    return f"bench-{column.name}"
+
+
+def _row(table, values: dict) -> dict:
+    for column in table.columns:
+        if column.name in values or column.primary_key or column.nullable:
+            continue
+        if column.default is None and column.server_default is None:
+            values[column.name] = _filler(column)
+    return values
+
+
+def _memory_text(rng: random.Random, n: int) -> str:
+    return f"Note {n}: " + _random_text(rng, rng.randint(12, 80))
+
+
+async def seed(server, session_factory, args) -> dict:
+    """Create users and memories in bulk (skipped when the database already matches)."""
+    from sqlalchemy import JSON, func, insert, select
+
+    import fulltext
+    import schema
+    import tag_index
+    import dedup
+
+    Memory, User = server.Memory, server.User
+    meta_path = args.db + ".json"
+    expected = {"memories": args.memories, "users": args.users, "seed": args.seed}
+
+    async with session_factory() as db:
+        conn = await db.connection()
+        await conn.run_sync(Memory.metadata.create_all)
+        await db.commit()
+    await schema.upgrade(session_factory)
+    await server._ensure_mcp_tables()
+
+    if os.path.exists(meta_path):
+        with open(meta_path) as f:
+            if json.load(f) == expected:
+                return expected
+
+    rng = random.Random(args.seed)
+    tags_are_json = isinstance(Memory.__table__.c.tags.type, JSON)
+    started = time.perf_counter()
+    async with session_factory() as db:
+        for user_id in range(1, args.users + 1):
+            if not (await db.execute(select(User.id).filter(User.id == user_id))).first():
+                await db.execute(insert(User.__table__), [_row(User.__table__, {"id": user_id, "email": f"bench{user_id}@example.com"})])
+        await db.commit()
+
+        existing = (await db.execute(select(func.count(Memory.id)))).scalar() or 0
+        now = datetime.utcnow()
+        batch = []
+        for n in range(existing, args.memories):
+            text = _memory_text(rng, n)
+            tags = rng.sample(TAGS, rng.randint(0, 3))
+            batch.append(_row(Memory.__table__, {
+                "user_id": 1 + n % args.users,
+                "content": text,
+                "title": _title(text),
+                "status": "pending" if rng.random() < 0.05 else "approved",
+                "source_llm": "benchmark",
+                "tags": tags if tags_are_json else json.dumps(tags),
+                "created_at": now - timedelta(seconds=rng.randint(0, args.days * 86400)),
+            }))
+            if len(batch) >= 5000:
+                await db.execute(insert(Memory.__table__), batch)
+                await db.commit()
+                batch = []
+                logger.warning(f"seeded {n + 1}/{args.memories} memories")
+        if batch:
+            await db.execute(insert(Memory.__table__), batch)
+            await db.commit()
+
+        # Build the derived indexes up front so the first measured call isn't a backfill
+        for user_id in range(1, args.users + 1):
+            await tag_index.rebuild(db, user_id, Memory)
+            await dedup.sync(db, user_id, Memory)
+            await fulltext.backfill(db, user_id, server._fulltext_rows_since)
+
+    with open(meta_path, "w") as f:
+        json.dump(expected, f)
+    logger.warning(f"seeded {args.memories} memories in {time.perf_counter() - started:.1f}s")
+    return expected
+
+
+async def load_vectors(server, session_factory, store: InMemoryVectorStore) -> None:
+    """Index every memory in the stand-in vector store, as the real store would hold them."""
+    from sqlalchemy.future import select
+
+    Memory = server.Memory
+    async with session_factory() as db:
+        result = await db.stream(select(Memory.id, Memory.user_id, Memory.title, Memory.content).execution_options(yield_per=5000))
+        async for rows in result.partitions(5000):
+            ids, docs, metas, users = [], [], [], []
+            for memory_id, user_id, title, content in rows:
+                ids.append(f"mem_{memory_id}_0")
+                docs.append(f"{title}\n{content}")
+                metas.append({"user_id": user_id, "memory_id": memory_id})
+                users.append(user_id)
+            vectors = store.embedding_function(docs)
+            by_user: Dict[int, list] = {}
+            for i, user_id in enumerate(users):
+                by_user.setdefault(user_id, []).append(i)
+            for user_id, idx in by_user.items():
+                store.load(user_id, [ids[i] for i in idx], [docs[i] for i in idx], [metas[i] for i in idx], vectors[idx])
+
+
+# --- WORKLOAD ---
+
+class Recorder:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+        self.samples: Dict[str, str] = {}
+
+    def record(self, tool: str, seconds: float, result) -> None:
+        self.latencies.setdefault(tool, []).append(seconds)
+        if isinstance(result, str) and result.startswith("Error"):
+            self.errors[tool] = self.errors.get(tool, 0) + 1
+            self.samples.setdefault(tool, result[:200])
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    # Nearest-rank percentile
+    rank = max(0, min(len(sorted_values) - 1, math.ceil(pct / 100.0 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+def parse_mix(mix: str) -> Dict[str, float]:
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        weights[name.strip()] = float(weight or 1)
+    return weights
+
+
+class Workload:
+    def __init__(self, server, args, tokens: Dict[int, str], id_ranges: Dict[int, List[int]]):
+        self.server = server
+        self.args = args
+        self.contexts = {uid: BenchContext(token) for uid, token in tokens.items()}
+        # Seeded memory IDs per user (updated in place) and IDs created during the run (deletable)
+        self.seeded = id_ranges
+        self.created: Dict[int, List[int]] = {uid: [] for uid in tokens}
+        self.cursors: Dict[int, Optional[str]] = {}
+        mix = parse_mix(args.mix)
+        self.ops = list(mix)
+        self.weights = [mix[name] for name in self.ops]
+
+    async def run_one(self, rng: random.Random, recorder: Optional[Recorder]) -> None:
+        s = self.server
+        user_id = rng.randint(1, self.args.users)
+        ctx = self.contexts[user_id]
+        op = rng.choices(self.ops, self.weights)[0]
+        started = time.perf_counter()
+        if op == "search":
+            if rng.random() < 0.2:
+                query = f"Note {rng.randint(0, max(self.args.memories - 1, 0))}:"
+            else:
+                query = " ".join(rng.sample(WORDS, rng.randint(2, 4)))
+            tool, result = "search_memwyre", await s.search_memwyre(query=query, ctx=ctx)
+        elif op == "save":
+            text = _random_text(rng, rng.randint(20, 120))
+            tool, result = "save_memory", await s.save_memory(text=text, ctx=ctx, tags=rng.sample(TAGS, 2))
+            if isinstance(result, str) and "ID: mem_" in result:
+                self.created[user_id].append(int(result.split("ID: mem_")[1].split()[0]))
+        elif op == "update" and self.seeded.get(user_id):
+            memory_id = rng.choice(self.seeded[user_id])
+            tool, result = "update_memory", await s.update_memory(memory_id=f"mem_{memory_id}", content=_memory_text(rng, memory_id), ctx=ctx)
+        elif op == "delete" and self.created[user_id]:
+            memory_id = self.created[user_id].pop(rng.randrange(len(self.created[user_id])))
+            tool, result = "delete_memory", await s.delete_memory(memory_id=f"mem_{memory_id}", ctx=ctx)
+        elif op == "list":
+            cursor = self.cursors.pop(user_id, None) if rng.random() < 0.5 else None
+            tool, result = "list_memories", await s.list_memories(ctx=ctx, limit=20, cursor=cursor)
+            if isinstance(result, str) and "Next cursor: " in result:
+                self.cursors[user_id] = result.rsplit("Next cursor: ", 1)[1].strip()
+        elif op == "tags":
+            prefix = rng.choice(TAGS)[:1] if rng.random() < 0.5 else None
+            tool, result = "get_all_tags", await s.get_all_tags(ctx=ctx, prefix=prefix)
+        elif op == "date":
+            day = datetime.utcnow() - timedelta(days=rng.randint(0, self.args.days))
+            end = day + timedelta(days=rng.choice((0, 0, 6)))
+            tool, result = "search_by_date", await s.search_by_date(start_date=day.strftime("%Y-%m-%d"), ctx=ctx, end_date=end.strftime("%Y-%m-%d"))
+        elif op == "inbox":
+            tool, result = "get_inbox", await s.get_inbox(ctx=ctx)
+        else:
+            # update/delete with nothing to act on yet
+            return
+        if recorder is not None:
+            recorder.record(tool, time.perf_counter() - started, result)
+
+
+async def drive(workload: Workload, args) -> tuple:
+    recorder = Recorder()
+    measuring = asyncio.Event()
+    stop_at = [float("inf")]
+
+    async def worker(n: int):
+        rng = random.Random(args.seed * 1000 + n)
+        while time.perf_counter() < stop_at[0]:
+            try:
+                await workload.run_one(rng, recorder if measuring.is_set() else None)
+            except Exception as e:
+                logger.error(f"worker {n}: {e}", exc_info=True)
+
+    tasks = [asyncio.create_task(worker(n)) for n in range(args.concurrency)]
+    await asyncio.sleep(args.warmup)
+    measuring.set()
+    started = time.perf_counter()
+    stop_at[0] = started + args.duration
+    await asyncio.gather(*tasks)
+    return recorder, time.perf_counter() - started
+
+
+def summarize(recorder: Recorder, elapsed: float) -> Dict[str, dict]:
+    report = {}
+    for tool, values in sorted(recorder.latencies.items()):
+        values.sort()
+        report[tool] = {
+            "count": len(values),
+            "errors": recorder.errors.get(tool, 0),
+            "throughput": round(len(values) / elapsed, 2),
+            "p50_ms": round(percentile(values, 50) * 1000, 2),
+            "p95_ms": round(percentile(values, 95) * 1000, 2),
+            "p99_ms": round(percentile(values, 99) * 1000, 2),
+        }
+    total = sum(len(v) for v in recorder.latencies.values())
+    report["_total"] = {"count": total, "throughput": round(total / elapsed, 2), "elapsed_s": round(elapsed, 2)}
+    return report
+
+
+def compare(report: Dict[str, dict], baseline: Dict[str, dict], threshold: float) -> List[str]:
+    """Human-readable regressions of report against baseline (empty if none)."""
+    regressions = []
+    for tool, current in report.items():
+        before = baseline.get(tool)
+        if tool.startswith("_") or not before:
+            continue
+        if before["p95_ms"] and current["p95_ms"] > before["p95_ms"] * (1 + threshold):
+            regressions.append(f"{tool}: p95 {before['p95_ms']}ms -> {current['p95_ms']}ms")
+        if before["throughput"] and current["throughput"] < before["throughput"] * (1 - threshold):
+            regressions.append(f"{tool}: throughput {before['throughput']}/s -> {current['throughput']}/s")
+    return regressions
+
+
+def print_report(size: int, report: Dict[str, dict], baseline: Optional[Dict[str, dict]] = None) -> None:
+    print(f"\n== {size} memories ==")
+    print(f"{'tool':<16}{'count':>8}{'errors':>8}{'ops/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'vs base p95':>13}")
+    for tool, row in report.items():
+        if tool.startswith("_"):
+            continue
+        delta = ""
+        if baseline and baseline.get(tool, {}).get("p95_ms"):
+            delta = f"{(row['p95_ms'] / baseline[tool]['p95_ms'] - 1) * 100:+.1f}%"
+        print(f"{tool:<16}{row['count']:>8}{row['errors']:>8}{row['throughput']:>10}{row['p50_ms']:>10}{row['p95_ms']:>10}{row['p99_ms']:>10}{delta:>13}")
+    total = report["_total"]
+    print(f"total: {total['count']} calls in {total['elapsed_s']}s ({total['throughput']} ops/s)")
+
+
+# --- ENTRY POINTS ---
+
+async def run_size(args) -> Dict[str, dict]:
+    from sqlalchemy import event
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+    from sqlalchemy.future import select
+
+    import mcp_server as server
+
+    engine = create_async_engine(f"sqlite+aiosqlite:///{args.db}", connect_args={"timeout": 30})
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def _sqlite_pragmas(dbapi_conn, _record):
+        cursor = dbapi_conn.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.close()
+
+    # Point the server at the benchmark database and stand-in services
+    session_factory = server._timed_session_factory(async_sessionmaker(engine, expire_on_commit=False))
+    server.AsyncSessionLocal = session_factory
+    server.outbox_worker.session_factory = session_factory
+    server.inbox_notifier.session_factory = session_factory
+    store = InMemoryVectorStore(args.dim)
+    if args.embedding_cache:
+        server.embeddings.install(store)
+    server.vector_store.set(store)
+    server.context_builder.set(BenchContextBuilder(store))
+    server.ingestion_service.set(BenchIngestionService())
+    server.memory_service.set(BenchMemoryService(server))
+
+    await seed(server, session_factory, args)
+    started = time.perf_counter()
+    await load_vectors(server, session_factory, store)
+    logger.warning(f"loaded {store.count()} vectors in {time.perf_counter() - started:.1f}s")
+
+    tokens = {uid: server.jwt.encode({"sub": str(uid)}, server.settings.SECRET_KEY, algorithm=server.settings.ALGORITHM)
+              for uid in range(1, args.users + 1)}
+    id_ranges = {}
+    async with session_factory() as db:
+        for uid in tokens:
+            result = await db.execute(select(server.Memory.id).filter(server.Memory.user_id == uid).limit(10000))
+            id_ranges[uid] = [row[0] for row in result.all()]
+
+    recorder, elapsed = await drive(Workload(server, args, tokens, id_ranges), args)
+    report = summarize(recorder, elapsed)
+    report["_total"]["memories"] = args.memories
+    report["_server"] = server.get_server_stats()
+    for tool, sample in recorder.samples.items():
+        logger.warning(f"{tool} error sample: {sample}")
+    await engine.dispose()
+    return report
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark MCP server tools against a local SQLite vault.")
+    parser.add_argument("--memories", type=int, default=1000, help="Vault size (total memories across users).")
+    parser.add_argument("--sizes", help="Comma-separated vault sizes to run in turn (each in its own process).")
+    parser.add_argument("--users", type=int, default=4)
+    parser.add_argument("--days", type=int, default=365, help="Spread created_at over this many days.")
+    parser.add_argument("--db", help="SQLite file (default bench_<memories>.sqlite).")
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent simulated clients.")
+    parser.add_argument("--duration", type=float, default=30.0, help="Measured seconds.")
+    parser.add_argument("--warmup", type=float, default=5.0, help="Unmeasured seconds before measuring.")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"Operation weights (default {DEFAULT_MIX}).")
+    parser.add_argument("--dim", type=int, default=64, help="Stand-in embedding dimension.")
+    parser.add_argument("--embedding-cache", action="store_true", help="Install the embedding cache on the stand-in store.")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="Write the JSON report here.")
+    parser.add_argument("--baseline", help="Compare against this saved report.")
+    parser.add_argument("--save-baseline", help="Save this run as a baseline.")
+    parser.add_argument("--threshold", type=float, default=0.15, help="Allowed relative regression (default 0.15).")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s %(message)s")
+
+    if args.sizes:
+        # One process per size: module-level caches and schema flags must start fresh
+        reports = {}
+        for size in [int(s) for s in args.sizes.split(",")]:
+            out = f"bench_{size}.report.json"
+            cmd = [sys.executable, __file__, "--memories", str(size), "--output", out]
+            skip = {"sizes", "memories", "output", "baseline", "save_baseline", "db"}
+            for key, value in vars(args).items():
+                if key in skip or value is None or value is False:
+                    continue
+                cmd += [f"--{key.replace('_', '-')}"] + ([] if value is True else [str(value)])
+            subprocess.run(cmd, check=True)
+            with open(out) as f:
+                reports[str(size)] = json.load(f)[str(size)]
+    else:
+        args.db = args.db or f"bench_{args.memories}.sqlite"
+        reports = {str(args.memories): asyncio.run(run_size(args))}
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    regressions = []
+    for size, report in reports.items():
+        size_baseline = (baseline or {}).get(size)
+        print_report(int(size), report, size_baseline)
+        if size_baseline:
+            regressions += [f"[{size}] {r}" for r in compare(report, size_baseline, args.threshold)]
+
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, "w") as f:
+                json.dump(reports, f, indent=2, default=str)
+
+    if regressions:
+        print("\nRegressions vs baseline:")
+        for line in regressions:
+            print(f"- {line}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,67 @@
+"""
+Time-range queries over memories: date parsing, the (user_id, created_at) index,
+and the aggregate view (per-day/week counts and top tags) used by search_by_date.
+
+The index is created by the MCP migrations (revision mcp_0006), not by this server
+at runtime. With it, range scans, keyset pages and the per-day GROUP BY are all
+served from the index.
+"""
+from collections import Counter
+from datetime import date, datetime, timedelta
+from typing import List, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.future import select
+
+import tag_index
+
+BUCKETS = ("day", "week")
+
+
+def parse_range(start_date: str, end_date: Optional[str] = None) -> Tuple[datetime, datetime]:
+    """[start, end) for YYYY-MM-DD inputs; end_date is inclusive and defaults to start_date."""
+    try:
+        start = datetime.strptime(start_date, "%Y-%m-%d")
+        end = datetime.strptime(end_date, "%Y-%m-%d") if end_date else start
+    except ValueError:
+        raise ValueError("Invalid date format. Use YYYY-MM-DD.")
+    if end < start:
+        raise ValueError("end_date is before start_date.")
+    return start, end + timedelta(days=1)
+
+
+def _range_filter(model, user_id: int, start: datetime, end: datetime):
+    return (model.user_id == user_id, model.created_at >= start, model.created_at < end)
+
+
+async def day_counts(db, model, user_id: int, start: datetime, end: datetime) -> List[Tuple[date, int]]:
+    """[(day, count)] for days in the range that have any rows, oldest first."""
+    day = func.date(model.created_at)
+    result = await db.execute(
+        select(day.label("day"), func.count().label("n"))
+        .filter(*_range_filter(model, user_id, start, end))
+        .group_by(day)
+        .order_by(day)
+    )
+    # SQLite returns 'YYYY-MM-DD' strings, Postgres returns dates
+    return [(date.fromisoformat(str(row.day)[:10]), row.n) for row in result.all()]
+
+
+def week_counts(days: List[Tuple[date, int]]) -> List[Tuple[date, int]]:
+    """Roll per-day counts up into ISO weeks, keyed by the week's Monday."""
+    weeks: dict = {}
+    for day, n in days:
+        monday = day - timedelta(days=day.weekday())
+        weeks[monday] = weeks.get(monday, 0) + n
+    return sorted(weeks.items())
+
+
+async def top_tags(db, model, user_id: int, start: datetime, end: datetime, limit: int = 10) -> List[Tuple[str, int]]:
+    """Most used tags in the range. Reads only the tags column."""
+    result = await db.execute(
+        select(model.tags).filter(*_range_filter(model, user_id, start, end), model.tags.isnot(None))
+    )
+    counts = Counter()
+    for (raw,) in result.all():
+        counts.update(set(tag_index.parse_tags(raw)))
+    return counts.most_common(limit)
@@ -0,0 +1,220 @@
+"""
+Per-user near-duplicate index for memories, based on 64-bit SimHash signatures.
+
+Each memory's signature is stored with its four 16-bit bands. Two signatures within
+Hamming distance 3 must share at least one band exactly (pigeonhole), so candidate
+lookup is an indexed equality query on the bands and only a handful of rows are
+compared in Python. That guarantee is why distances are capped at MAX_DISTANCE: a
+larger one would silently miss pairs that differ in every band. Checking costs one
+small query and no model work, so save_memory can run it before anything is embedded.
+
+Modes: "flag" saves as usual and reports the match, "reject" refuses the save,
+"merge" adds the new tags to the existing memory, "off" skips the check.
+
+Signatures are written by the MCP write tools; sync() backfills a user on first use
+and afterwards re-signs memories created or edited elsewhere (the web app) since the
+last sync. Signatures of memories deleted elsewhere are dropped when they next match.
+"""
+import hashlib
+import re
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import BigInteger, Column, DateTime, Integer, delete, or_
+from sqlalchemy.future import select
+
+from schema import McpBase
+
+MODES = ("off", "flag", "reject", "merge")
+BANDS = 4
+BAND_BITS = 64 // BANDS
+# Largest distance the band lookup finds every match for (one band must be untouched)
+MAX_DISTANCE = BANDS - 1
+# Texts with fewer shingles than this only match exact duplicates (SimHash is noisy on tiny inputs)
+MIN_SHINGLES = 8
+
+# Saves short-circuited as near-duplicates, by mode
+handled = {"flag": 0, "reject": 0, "merge": 0}
+
+# Per-process throttle for sync(), and how far before the last sync it re-reads
+SYNC_INTERVAL = 5.0
+SYNC_OVERLAP = timedelta(seconds=60)
+
+_last_sync: Dict[int, float] = {}
+
+
+class MemorySignature(McpBase):
+    __tablename__ = "mcp_memory_signatures"
+
+    memory_id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, nullable=False, index=True)
+    simhash = Column(BigInteger, nullable=False)
+    shingles = Column(Integer, nullable=False)
+    band0 = Column(Integer, nullable=False, index=True)
+    band1 = Column(Integer, nullable=False, index=True)
+    band2 = Column(Integer, nullable=False, index=True)
+    band3 = Column(Integer, nullable=False, index=True)
+
+
+class SignatureState(McpBase):
+    __tablename__ = "mcp_memory_signature_state"
+
+    user_id = Column(Integer, primary_key=True)
+    built_at = Column(DateTime, nullable=False)
+    synced_at = Column(DateTime, nullable=True)
+
+
+def _shingles(text: str, size: int = 3) -> List[str]:
+    words = re.findall(r"\w+", text.lower())
+    if len(words) < size:
+        return [" ".join(words)] if words else []
+    return [" ".join(words[i:i + size]) for i in range(len(words) - size + 1)]
+
+
+def simhash(text: str) -> Tuple[int, int]:
+    """(unsigned 64-bit SimHash over word 3-shingles, number of shingles)."""
+    shingles = _shingles(text)
+    weights = [0] * 64
+    for shingle in shingles:
+        h = int.from_bytes(hashlib.blake2b(shingle.encode(), digest_size=8).digest(), "big")
+        for bit in range(64):
+            weights[bit] += 1 if (h >> bit) & 1 else -1
+    value = 0
+    for bit in range(64):
+        if weights[bit] > 0:
+            value |= 1 << bit
+    return value, len(shingles)
+
+
+def _bands(value: int) -> List[int]:
+    mask = (1 << BAND_BITS) - 1
+    return [(value >> (i * BAND_BITS)) & mask for i in range(BANDS)]
+
+
+def _signed(value: int) -> int:
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def _unsigned(value: int) -> int:
+    return value + (1 << 64) if value < 0 else value
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def near(a: Tuple[int, int], b: Tuple[int, int], max_distance: int = MAX_DISTANCE) -> Optional[int]:
+    """Distance between two (simhash, shingles) signatures if they are near-duplicates, else None."""
+    if a[1] == 0 or b[1] == 0:
+        return None
+    limit = 0 if min(a[1], b[1]) < MIN_SHINGLES else min(max_distance, MAX_DISTANCE)
+    distance = hamming(a[0], b[0])
+    return distance if distance <= limit else None
+
+
+def _add(db, user_id: int, memory_id: int, signature: Tuple[int, int]) -> None:
+    value, count = signature
+    bands = _bands(value)
+    db.add(MemorySignature(
+        memory_id=memory_id, user_id=user_id, simhash=_signed(value), shingles=count,
+        band0=bands[0], band1=bands[1], band2=bands[2], band3=bands[3],
+    ))
+
+
+def record(db, user_id: int, memory_id: int, text: str) -> None:
+    """Add a signature row for a new memory. Does not commit."""
+    _add(db, user_id, memory_id, simhash(text or ""))
+
+
+async def replace(db, user_id: int, memory_id: int, text: str) -> None:
+    await remove(db, [memory_id])
+    record(db, user_id, memory_id, text)
+
+
+async def remove(db, memory_ids: List[int]) -> None:
+    if memory_ids:
+        await db.execute(delete(MemorySignature).where(MemorySignature.memory_id.in_(memory_ids)))
+
+
+def _changed_since(model, since):
+    if hasattr(model, "updated_at"):
+        return or_(model.created_at > since, model.updated_at > since)
+    return model.created_at > since
+
+
+async def sync(db, user_id: int, memory_model) -> None:
+    """
+    Backfill signatures for a user's existing memories on first use (reads content a
+    single time); afterwards re-sign only memories created or updated since the last
+    sync whose signature changed. Throttled to once per SYNC_INTERVAL per process.
+    """
+    result = await db.execute(select(SignatureState).filter(SignatureState.user_id == user_id))
+    state = result.scalars().first()
+    now = time.monotonic()
+    if state is not None and now - _last_sync.get(user_id, -SYNC_INTERVAL) < SYNC_INTERVAL:
+        return
+    _last_sync[user_id] = now
+    started = datetime.utcnow()
+
+    if state is None:
+        result = await db.execute(select(memory_model.id, memory_model.content).filter(memory_model.user_id == user_id))
+        await db.execute(delete(MemorySignature).where(MemorySignature.user_id == user_id))
+        for memory_id, content in result.all():
+            record(db, user_id, memory_id, content)
+        db.add(SignatureState(user_id=user_id, built_at=started, synced_at=started))
+        await db.commit()
+        return
+
+    since = (state.synced_at or state.built_at) - SYNC_OVERLAP
+    result = await db.execute(
+        select(memory_model.id, memory_model.content).filter(
+            memory_model.user_id == user_id, _changed_since(memory_model, since)
+        )
+    )
+    changed = {memory_id: simhash(content or "") for memory_id, content in result.all()}
+    if changed:
+        result = await db.execute(
+            select(MemorySignature.memory_id, MemorySignature.simhash, MemorySignature.shingles)
+            .filter(MemorySignature.memory_id.in_(list(changed)))
+        )
+        current = {memory_id: (_unsigned(value), count) for memory_id, value, count in result.all()}
+        stale = [memory_id for memory_id, signature in changed.items() if current.get(memory_id) != signature]
+        await remove(db, stale)
+        for memory_id in stale:
+            _add(db, user_id, memory_id, changed[memory_id])
+    state.synced_at = started
+    await db.commit()
+
+
+async def find_duplicate(db, user_id: int, text: str, max_distance: int = MAX_DISTANCE,
+                         signature: Optional[Tuple[int, int]] = None) -> Optional[Tuple[int, int]]:
+    """
+    Closest existing memory within max_distance (capped at MAX_DISTANCE) as
+    (memory_id, distance), or None. signature is simhash(text), if already computed.
+    """
+    value, count = signature or simhash(text or "")
+    if count == 0:
+        return None
+    bands = _bands(value)
+    result = await db.execute(
+        select(MemorySignature.memory_id, MemorySignature.simhash, MemorySignature.shingles).filter(
+            MemorySignature.user_id == user_id,
+            or_(
+                MemorySignature.band0 == bands[0],
+                MemorySignature.band1 == bands[1],
+                MemorySignature.band2 == bands[2],
+                MemorySignature.band3 == bands[3],
+            ),
+        )
+    )
+    best = None
+    for memory_id, stored, shingles in result.all():
+        distance = near((value, count), (_unsigned(stored), shingles), max_distance)
+        if distance is not None and (best is None or distance < best[1]):
+            best = (memory_id, distance)
+    return best
+
+
+def stats() -> dict:
+    return {"handled": dict(handled)}
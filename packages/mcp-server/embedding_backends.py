@@ -0,0 +1,427 @@
+"""
+Pluggable embedding backends, installed under the embedding cache.
+
+The backend vector store embeds with its own sentence-transformers function (a
+full-precision PyTorch model). BRAIN_VAULT_EMBEDDING_BACKEND selects what actually
+runs when the cache misses, for both ingestion and queries:
+
+- "default": the store's own function.
+- "onnx": the same model exported to ONNX, int8-quantized (dynamic quantization of
+  the weights) and run with ONNX Runtime on CPU. The export and the quantized file
+  are produced once and kept in BRAIN_VAULT_ONNX_DIR.
+
+With the ONNX backend, calls go through a DynamicBatcher: texts from concurrent calls
+that arrive within a short window (BRAIN_VAULT_EMBEDDING_BATCH_WAIT_MS, default 5;
+set it above 0 to batch the default backend too) go through the model as one batch.
+Queries and bulk ingestion are batched in separate lanes. Thread counts are set with
+BRAIN_VAULT_EMBEDDING_THREADS and BRAIN_VAULT_EMBEDDING_INTER_THREADS.
+
+Vectors from the ONNX backend are close to, not identical to, the PyTorch ones; the
+cache keys them under their own model id. Check a model before switching with:
+
+    python embedding_backends.py --parity [--model NAME] [--texts FILE] [--min-cosine 0.99]
+
+or run tests/test_embedding_parity.py with pytest.
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from typing import Callable, List, Optional, Sequence
+
+import embeddings
+
+logger = logging.getLogger("mcp_server.embedding_backends")
+
+BACKENDS = ("default", "onnx")
+DEFAULT_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
+
+class OnnxEmbeddingBackend:
+    """
+    int8 ONNX Runtime version of a sentence-transformers model, callable on a list of
+    texts like the store's embedding function. Texts are sorted by length before
+    batching so each batch pads to a similar length.
+    """
+
+    def __init__(self, model_name: str, directory: str, intra_op_threads: int = 0, inter_op_threads: int = 1,
+                 max_length: Optional[int] = None, batch_size: int = 64, pooling: str = "mean", normalize: bool = True):
+        import numpy as np
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        if pooling not in ("mean", "cls"):
+            raise ValueError("pooling must be 'mean' or 'cls'")
+        self._np = np
+        self.base_model = model_name
+        self.model_name = f"{model_name}@onnx-int8"
+        self.batch_size = batch_size
+        self.pooling = pooling
+        self.normalize = normalize
+        self.directory = os.path.join(directory, model_name.replace("/", "__"))
+
+        model_path = self._quantized_model()
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = intra_op_threads  # 0 = one per physical core
+        options.inter_op_num_threads = inter_op_threads
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.log_severity_level = 3
+        self._session = ort.InferenceSession(model_path, sess_options=options, providers=["CPUExecutionProvider"])
+        self._inputs = {i.name for i in self._session.get_inputs()}
+        try:
+            self._tokenizer = AutoTokenizer.from_pretrained(self.directory)
+        except (OSError, ValueError):
+            # model.onnx was placed there by hand, without tokenizer files
+            self._tokenizer = AutoTokenizer.from_pretrained(model_name)
+            self._tokenizer.save_pretrained(self.directory)
+        # Truncate where the sentence-transformers model does, or the vectors drift on long texts
+        self.max_length = max_length or self._model_max_length()
+
+    def _model_max_length(self) -> int:
+        """The model's max_seq_length (sentence_bert_config.json), else the tokenizer's limit."""
+        config_path = os.path.join(self.directory, "sentence_bert_config.json")
+        if not os.path.exists(config_path):
+            try:
+                if os.path.isdir(self.base_model):
+                    source = os.path.join(self.base_model, "sentence_bert_config.json")
+                else:
+                    from huggingface_hub import hf_hub_download
+
+                    source = hf_hub_download(self.base_model, "sentence_bert_config.json")
+                with open(source) as f:
+                    config = json.load(f)
+                # Kept next to the model so later loads work offline
+                with open(config_path, "w") as f:
+                    json.dump(config, f)
+            except Exception as e:
+                logger.warning(f"No sentence_bert_config.json for {self.base_model}: {e}")
+        if os.path.exists(config_path):
+            with open(config_path) as f:
+                max_seq_length = json.load(f).get("max_seq_length")
+            if max_seq_length:
+                return int(max_seq_length)
+        # Newer sentence-transformers save max_seq_length as the tokenizer's model_max_length;
+        # tokenizers without a limit report a huge sentinel
+        return min(self._tokenizer.model_max_length, 512)
+
+    def _quantized_model(self) -> str:
+        """Path of the int8 model, exporting and quantizing on first use."""
+        quantized = os.path.join(self.directory, "model.int8.onnx")
+        if os.path.exists(quantized):
+            return quantized
+        exported = os.path.join(self.directory, "model.onnx")
+        if not os.path.exists(exported):
+            try:
+                from optimum.exporters.onnx import main_export
+            except ImportError:
+                raise RuntimeError(
+                    f"No ONNX export of {self.base_model} in {self.directory}. Install optimum[exporters] "
+                    f"or place model.onnx and the tokenizer files there."
+                )
+            logger.info(f"Exporting {self.base_model} to ONNX")
+            main_export(self.base_model, output=self.directory, task="feature-extraction")
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        logger.info(f"Quantizing {exported} to int8")
+        # Write then rename, so a concurrent process never loads a half-written model
+        partial = f"{quantized}.{os.getpid()}.tmp"
+        quantize_dynamic(exported, partial, weight_type=QuantType.QInt8)
+        os.replace(partial, quantized)
+        return quantized
+
+    def _run(self, texts: List[str]):
+        np = self._np
+        encoded = self._tokenizer(texts, padding=True, truncation=True, max_length=self.max_length, return_tensors="np")
+        feeds = {name: encoded[name].astype(np.int64) for name in self._inputs if name in encoded}
+        if "token_type_ids" in self._inputs and "token_type_ids" not in feeds:
+            feeds["token_type_ids"] = np.zeros_like(feeds["input_ids"])
+        hidden = self._session.run(None, feeds)[0]
+        if self.pooling == "cls":
+            pooled = hidden[:, 0]
+        else:
+            mask = encoded["attention_mask"][..., None].astype(np.float32)
+            pooled = (hidden * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+        if self.normalize:
+            pooled = pooled / np.maximum(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12)
+        return pooled.astype(np.float32)
+
+    def __call__(self, input):
+        np = self._np
+        texts = list(input)
+        if not texts:
+            return []
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        out = np.empty((len(texts), 0), dtype=np.float32)
+        for start in range(0, len(order), self.batch_size):
+            picked = order[start:start + self.batch_size]
+            vectors = self._run([texts[i] for i in picked])
+            if out.shape[1] == 0:
+                out = np.empty((len(texts), vectors.shape[1]), dtype=np.float32)
+            out[picked] = vectors
+        return list(out)
+
+
+class _Request:
+    __slots__ = ("texts", "done", "result", "error")
+
+    def __init__(self, texts: List[str]):
+        self.texts = texts
+        self.done = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+
+
+class _BatchLane:
+    """Pending requests and the worker thread that batches them."""
+
+    def __init__(self, name: str, inner: Callable, max_batch: int, max_wait: float):
+        self.name = name
+        self._inner = inner
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._pending: List[_Request] = []
+        self._cond = threading.Condition()
+        self._worker: Optional[threading.Thread] = None
+        self.batches = 0
+        self.texts = 0
+
+    def submit(self, request: _Request) -> None:
+        with self._cond:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name=f"embedding-{self.name}", daemon=True)
+                self._worker.start()
+            self._pending.append(request)
+            self._cond.notify()
+
+    def _take_batch(self) -> List[_Request]:
+        with self._cond:
+            while not self._pending:
+                self._cond.wait()
+            deadline = time.monotonic() + self.max_wait
+            while sum(len(r.texts) for r in self._pending) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            batch, size = [], 0
+            while self._pending and (not batch or size + len(self._pending[0].texts) <= self.max_batch):
+                request = self._pending.pop(0)
+                batch.append(request)
+                size += len(request.texts)
+            return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._take_batch()
+            texts = [t for request in batch for t in request.texts]
+            try:
+                vectors = list(self._inner(texts))
+            except BaseException as e:
+                for request in batch:
+                    request.error = e
+                    request.done.set()
+                continue
+            self.batches += 1
+            self.texts += len(texts)
+            start = 0
+            for request in batch:
+                request.result = vectors[start:start + len(request.texts)]
+                start += len(request.texts)
+                request.done.set()
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "texts": self.texts,
+            "avg_batch": round(self.texts / self.batches, 2) if self.batches else 0.0,
+        }
+
+
+class DynamicBatcher:
+    """
+    Merges concurrent embedding calls. Calls of up to small_call texts (search queries,
+    short memories) go to the "query" lane, larger ones to the "bulk" lane; each lane
+    has its own worker thread, so a bulk import never delays a query. A lane worker
+    takes the first waiting call, collects more for up to max_wait seconds (or until
+    max_batch texts), runs the model once and hands each caller its slice. Calls larger
+    than max_batch are split, so other bulk callers interleave with them.
+    """
+
+    def __init__(self, inner: Callable, max_batch: int = 64, max_wait: float = 0.005, small_call: int = 8):
+        self._inner = inner
+        self.max_batch = max_batch
+        self.small_call = small_call
+        self._lanes = {name: _BatchLane(name, inner, max_batch, max_wait) for name in ("query", "bulk")}
+        self.calls = 0
+
+    def __call__(self, input):
+        texts = list(input)
+        if not texts:
+            return []
+        self.calls += 1
+        lane = self._lanes["query" if len(texts) <= self.small_call else "bulk"]
+        requests = [_Request(texts[i:i + self.max_batch]) for i in range(0, len(texts), self.max_batch)]
+        for request in requests:
+            lane.submit(request)
+        vectors = []
+        for request in requests:
+            request.done.wait()
+            if request.error is not None:
+                raise request.error
+            vectors.extend(request.result)
+        return vectors
+
+    def __getattr__(self, name):
+        return getattr(self._inner, name)
+
+    def stats(self) -> dict:
+        return {"calls": self.calls, **{name: lane.stats() for name, lane in self._lanes.items()}}
+
+
+active_backend: Optional[str] = None
+active_batcher: Optional[DynamicBatcher] = None
+
+
+def _threads(name: str, default: int) -> int:
+    return int(os.environ.get(name, str(default)))
+
+
+def load_onnx_backend(model_name: str) -> OnnxEmbeddingBackend:
+    return OnnxEmbeddingBackend(
+        model_name,
+        directory=os.environ.get("BRAIN_VAULT_ONNX_DIR", os.path.expanduser("~/.cache/memwyre/onnx")),
+        intra_op_threads=_threads("BRAIN_VAULT_EMBEDDING_THREADS", 0),
+        inter_op_threads=_threads("BRAIN_VAULT_EMBEDDING_INTER_THREADS", 1),
+        # Unset: the model's own max_seq_length
+        max_length=int(os.environ.get("BRAIN_VAULT_ONNX_MAX_LENGTH", "0")) or None,
+        pooling=os.environ.get("BRAIN_VAULT_ONNX_POOLING", "mean"),
+        normalize=os.environ.get("BRAIN_VAULT_ONNX_NORMALIZE", "1") == "1",
+    )
+
+
+def install(vector_store) -> bool:
+    """
+    Put the configured backend (behind a DynamicBatcher when batching is on) in the store's
+    embedding function attribute (see embeddings.embedding_attr).
+    Must run before embeddings.install so the cache wraps it. Returns True if installed.
+    """
+    global active_backend, active_batcher
+    backend = os.environ.get("BRAIN_VAULT_EMBEDDING_BACKEND", "default")
+    if backend not in BACKENDS:
+        raise ValueError(f"BRAIN_VAULT_EMBEDDING_BACKEND must be one of {BACKENDS}")
+    slot = embeddings.find_embedding_slot(vector_store)
+    if slot is None:
+        logger.info(f"Embedding backend not installed: vector store has no '{embeddings.embedding_attr()}' embedding function")
+        return False
+    owner, fn_attr = slot
+    inner = getattr(owner, fn_attr)
+    if isinstance(inner, (DynamicBatcher, embeddings.CachedEmbeddingFunction)):
+        return True
+
+    if backend == "onnx":
+        model_name = embeddings.model_id_of(inner)
+        if model_name == type(inner).__name__:
+            # The store's function doesn't name its model: assume Chroma's default
+            model_name = DEFAULT_MODEL
+        inner = load_onnx_backend(os.environ.get("BRAIN_VAULT_ONNX_MODEL") or model_name)
+    elif os.environ.get("BRAIN_VAULT_EMBEDDING_THREADS"):
+        import torch
+
+        torch.set_num_threads(_threads("BRAIN_VAULT_EMBEDDING_THREADS", 0))
+
+    # Batching pays off with the ONNX backend; the default backend keeps calling the model directly
+    wait_ms = float(os.environ.get("BRAIN_VAULT_EMBEDDING_BATCH_WAIT_MS", "5" if backend == "onnx" else "0"))
+    if wait_ms > 0:
+        inner = active_batcher = DynamicBatcher(
+            inner,
+            max_batch=int(os.environ.get("BRAIN_VAULT_EMBEDDING_MAX_BATCH", "64")),
+            max_wait=wait_ms / 1000.0,
+            small_call=int(os.environ.get("BRAIN_VAULT_EMBEDDING_QUERY_MAX_TEXTS", "8")),
+        )
+    setattr(owner, fn_attr, inner)
+    active_backend = backend
+    logger.info(f"Embedding backend '{backend}' installed for model '{embeddings.model_id_of(inner)}'")
+    return True
+
+
+def stats() -> dict:
+    if active_backend is None:
+        return {}
+    return {"backend": active_backend, **({"batching": active_batcher.stats()} if active_batcher else {})}
+
+
+# --- PARITY CHECK ---
+
+PARITY_TEXTS = (
+    "Meeting notes: move the release to Friday and freeze the schema on Wednesday.",
+    "The outbox worker retries failed vector writes with exponential backoff.",
+    "Remember to renew the TLS certificate before it expires next month.",
+    "I prefer dark roast coffee, no sugar.",
+    "Postgres full-text search uses a GIN index over a tsvector column.",
+    "Idea: a weekly digest of the memories saved in the last seven days.",
+    "Bug: pagination skips items when two rows share the same created_at.",
+    "Call mom on Sunday.",
+    "Embeddings are L2-normalized so cosine similarity is a dot product.",
+    "short",
+    "The quick brown fox jumps over the lazy dog. " * 40,
+)
+
+
+def parity_check(reference: Callable, candidate: Callable, texts: Sequence[str], min_cosine: float = 0.99) -> dict:
+    """
+    Compare two embedding functions on the same texts: per-text cosine similarity,
+    vector norm ratio, and whether each text's nearest neighbour among the others is
+    the same under both. passed is True if every cosine is at least min_cosine.
+    """
+    import numpy as np
+
+    ref = np.asarray(reference(list(texts)), dtype=np.float32)
+    got = np.asarray(candidate(list(texts)), dtype=np.float32)
+    ref_norm = np.linalg.norm(ref, axis=1)
+    got_norm = np.linalg.norm(got, axis=1)
+    cosine = (ref * got).sum(axis=1) / np.maximum(ref_norm * got_norm, 1e-12)
+
+    def neighbours(vectors):
+        unit = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        sims = unit @ unit.T
+        np.fill_diagonal(sims, -np.inf)
+        return sims.argmax(axis=1)
+
+    return {
+        "texts": len(texts),
+        "min_cosine": float(cosine.min()),
+        "mean_cosine": float(cosine.mean()),
+        "max_norm_ratio_error": float(np.abs(got_norm / np.maximum(ref_norm, 1e-12) - 1).max()),
+        "neighbour_agreement": float((neighbours(ref) == neighbours(got)).mean()) if len(texts) > 2 else 1.0,
+        "passed": bool(cosine.min() >= min_cosine),
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Check the ONNX int8 embedding backend against the PyTorch model.")
+    parser.add_argument("--parity", action="store_true", help="Run the parity check (the only mode).")
+    parser.add_argument("--model", default=os.environ.get("BRAIN_VAULT_ONNX_MODEL", DEFAULT_MODEL))
+    parser.add_argument("--texts", help="File with one text per line (default: built-in samples).")
+    parser.add_argument("--min-cosine", type=float, default=0.99)
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, stream=sys.stderr)
+
+    from sentence_transformers import SentenceTransformer
+
+    texts = PARITY_TEXTS
+    if args.texts:
+        with open(args.texts) as f:
+            texts = [line.strip() for line in f if line.strip()]
+    model = SentenceTransformer(args.model, device="cpu")
+    reference = lambda batch: model.encode(batch, convert_to_numpy=True)
+    result = parity_check(reference, load_onnx_backend(args.model), texts, args.min_cosine)
+    for key, value in result.items():
+        print(f"{key}: {value}")
+    return 0 if result["passed"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
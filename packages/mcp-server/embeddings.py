@@ -0,0 +1,268 @@
+"""
+Content-addressed embedding cache shared by ingestion and queries.
+
+Vectors are keyed by (model id, sha256 of normalized text). Lookups go through an
+in-memory LRU first, then a persistent on-disk tier: a float32 numpy memmap of
+vectors plus a small SQLite file mapping keys to rows. Only texts missing from both
+tiers reach the model, in one batched call. Both tiers hold float32 arrays (the LRU
+costs 4 bytes per dimension, not a Python float object each); callers still get
+lists. Because the vector store embeds through the same function for add_documents
+and for queries, wrapping that function covers both paths: the backend can build it
+with wrap(), or install() replaces the store attribute named by
+BRAIN_VAULT_EMBEDDING_FUNCTION_ATTR (default: the public embedding_function).
+"""
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import threading
+from typing import Any, Dict, List, Optional, Sequence
+
+from cache import TTLCache, MISS
+
+logger = logging.getLogger("mcp_server.embeddings")
+
+
+def normalize_text(text: str) -> str:
+    return " ".join(text.split())
+
+
+def cache_key(model_id: str, text: str) -> str:
+    return hashlib.sha256(f"{model_id}\0{normalize_text(text)}".encode()).hexdigest()
+
+
+class DiskEmbeddingStore:
+    """
+    Append-only vector file (numpy memmap) + SQLite key -> row index.
+    Row allocation and file growth happen inside one IMMEDIATE transaction, so several
+    worker processes on the same host can share a directory safely.
+    """
+
+    GROW_ROWS = 4096
+
+    def __init__(self, directory: str, dim: int):
+        import numpy as np
+
+        self._np = np
+        self.dim = dim
+        os.makedirs(directory, exist_ok=True)
+        self._vectors_path = os.path.join(directory, f"vectors.f32x{dim}")
+        self._db = sqlite3.connect(os.path.join(directory, "index.sqlite"), check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS rows (key TEXT PRIMARY KEY, row INTEGER NOT NULL)")
+        if not os.path.exists(self._vectors_path):
+            open(self._vectors_path, "wb").close()
+        self._lock = threading.Lock()
+        self._map = None
+        self._mapped_rows = 0
+
+    def _capacity_rows(self) -> int:
+        return os.path.getsize(self._vectors_path) // (self.dim * 4)
+
+    def _mapped(self, row: int):
+        if self._map is None or row >= self._mapped_rows:
+            rows = self._capacity_rows()
+            self._map = self._np.memmap(self._vectors_path, dtype=self._np.float32, mode="r+", shape=(rows, self.dim)) if rows else None
+            self._mapped_rows = rows
+        return self._map
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, Any]:
+        found = {}
+        if not keys:
+            return found
+        with self._lock:
+            for i in range(0, len(keys), 500):
+                batch = list(keys[i:i + 500])
+                placeholders = ",".join("?" * len(batch))
+                for key, row in self._db.execute(f"SELECT key, row FROM rows WHERE key IN ({placeholders})", batch):
+                    vectors = self._mapped(row)
+                    if vectors is not None and row < self._mapped_rows:
+                        # Copied out of the memmap so the file can be remapped when it grows
+                        found[key] = self._np.array(vectors[row], dtype=self._np.float32)
+        return found
+
+    def put_many(self, items: Dict[str, Sequence[float]]) -> None:
+        if not items:
+            return
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                existing = {k for (k,) in self._db.execute(
+                    f"SELECT key FROM rows WHERE key IN ({','.join('?' * len(items))})", list(items))}
+                new = [k for k in items if k not in existing]
+                if not new:
+                    self._db.execute("COMMIT")
+                    return
+                (next_row,) = self._db.execute("SELECT COALESCE(MAX(row), -1) + 1 FROM rows").fetchone()
+                needed = next_row + len(new)
+                if needed > self._capacity_rows():
+                    # Only ever grow, and only while holding the write transaction
+                    grow_to = (needed // self.GROW_ROWS + 1) * self.GROW_ROWS
+                    with open(self._vectors_path, "r+b") as f:
+                        f.truncate(grow_to * self.dim * 4)
+                vectors = self._mapped(needed - 1)
+                for offset, key in enumerate(new):
+                    vectors[next_row + offset] = self._np.asarray(items[key], dtype=self._np.float32)
+                vectors.flush()
+                self._db.executemany("INSERT INTO rows (key, row) VALUES (?, ?)",
+                                     [(key, next_row + offset) for offset, key in enumerate(new)])
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+
+
+class EmbeddingCache:
+    def __init__(self, model_id: str, directory: Optional[str] = None, memory_size: int = 50000):
+        self.model_id = model_id
+        self.memory = TTLCache(maxsize=memory_size, ttl=float("inf"))
+        self._directory = os.path.join(directory, re.sub(r"[^A-Za-z0-9_.-]+", "_", model_id)) if directory else None
+        self.disk: Optional[DiskEmbeddingStore] = None
+        # Reopen a tier persisted by an earlier process (its file name records the dimension)
+        if self._directory and os.path.isdir(self._directory):
+            for name in os.listdir(self._directory):
+                match = re.fullmatch(r"vectors\.f32x(\d+)", name)
+                if match:
+                    self._disk(int(match.group(1)))
+                    break
+        self.disk_hits = 0
+        self.model_calls = 0
+        self.model_texts = 0
+
+    def _disk(self, dim: int) -> Optional[DiskEmbeddingStore]:
+        if self.disk is None and self._directory:
+            try:
+                self.disk = DiskEmbeddingStore(self._directory, dim)
+            except Exception as e:
+                logger.error(f"Disk embedding cache disabled: {e}")
+                self._directory = None
+        return self.disk
+
+    def embed(self, texts: Sequence[str], embed_fn) -> List[List[float]]:
+        """Embed texts, calling embed_fn(list_of_texts) once for texts not cached anywhere."""
+        import numpy as np
+
+        keys = [cache_key(self.model_id, t) for t in texts]
+        vectors: Dict[str, Any] = {}
+        for key in set(keys):
+            value = self.memory.get(key)
+            if value is not MISS:
+                vectors[key] = value
+
+        missing = [k for k in dict.fromkeys(keys) if k not in vectors]
+        if missing and self.disk is not None:
+            found = self.disk.get_many(missing)
+            self.disk_hits += len(found)
+            for key, value in found.items():
+                vectors[key] = value
+                self.memory.set(key, value)
+            missing = [k for k in missing if k not in vectors]
+
+        if missing:
+            # One model call for all unique uncached texts
+            text_by_key = {}
+            for key, text in zip(keys, texts):
+                text_by_key.setdefault(key, text)
+            computed = embed_fn([text_by_key[k] for k in missing])
+            self.model_calls += 1
+            self.model_texts += len(missing)
+            fresh = {}
+            for key, value in zip(missing, computed):
+                value = np.asarray(value, dtype=np.float32)
+                vectors[key] = value
+                fresh[key] = value
+                self.memory.set(key, value)
+            disk = self._disk(len(next(iter(fresh.values())))) if fresh else None
+            if disk is not None:
+                try:
+                    disk.put_many(fresh)
+                except Exception as e:
+                    logger.error(f"Failed to persist embeddings: {e}")
+
+        return [vectors[k].tolist() for k in keys]
+
+    def stats(self) -> dict:
+        return {
+            "model_id": self.model_id,
+            "memory": self.memory.stats(),
+            "disk_hits": self.disk_hits,
+            "model_calls": self.model_calls,
+            "model_texts": self.model_texts,
+        }
+
+
+class CachedEmbeddingFunction:
+    """Drop-in wrapper for a Chroma-style embedding function (callable on a list of texts)."""
+
+    def __init__(self, inner, cache: EmbeddingCache):
+        self._inner = inner
+        self.cache = cache
+
+    def __call__(self, input):
+        return self.cache.embed(list(input), self._inner)
+
+    def __getattr__(self, name):
+        return getattr(self._inner, name)
+
+
+active_cache: Optional[EmbeddingCache] = None
+
+
+def model_id_of(embedding_fn) -> str:
+    for attr in ("model_name", "_model_name", "model_id"):
+        value = getattr(embedding_fn, attr, None)
+        if isinstance(value, str) and value:
+            return value
+    return type(embedding_fn).__name__
+
+
+def embedding_attr() -> str:
+    """Dotted path, from the vector store, of the attribute holding its embedding function."""
+    return os.environ.get("BRAIN_VAULT_EMBEDDING_FUNCTION_ATTR", "embedding_function")
+
+
+def find_embedding_slot(vector_store):
+    """(owner, attribute) of the configured embedding function attribute, or None if unset."""
+    *path, fn_attr = embedding_attr().split(".")
+    owner = vector_store
+    for attr in path:
+        owner = getattr(owner, attr, None)
+        if owner is None:
+            return None
+    fn = getattr(owner, fn_attr, None)
+    return (owner, fn_attr) if fn is not None and callable(fn) else None
+
+
+def wrap(inner):
+    """
+    The cached embedding function for `inner`, for a vector store to build its collection
+    with. Returns `inner` unchanged when the cache is disabled.
+    """
+    global active_cache
+    if os.environ.get("BRAIN_VAULT_EMBEDDING_CACHE", "1") != "1" or isinstance(inner, CachedEmbeddingFunction):
+        return inner
+    model_id = os.environ.get("BRAIN_VAULT_EMBEDDING_MODEL_ID") or model_id_of(inner)
+    active_cache = EmbeddingCache(
+        model_id,
+        directory=os.environ.get("BRAIN_VAULT_EMBEDDING_CACHE_DIR", os.path.expanduser("~/.cache/memwyre/embeddings")),
+        memory_size=int(os.environ.get("BRAIN_VAULT_EMBEDDING_CACHE_SIZE", "50000")),
+    )
+    logger.info(f"Embedding cache enabled for model '{model_id}'")
+    return CachedEmbeddingFunction(inner, active_cache)
+
+
+def install(vector_store) -> bool:
+    """Wrap the store's configured embedding function attribute with the cache. Returns True if installed."""
+    slot = find_embedding_slot(vector_store)
+    if slot is None:
+        logger.info(f"Embedding cache not installed: vector store has no '{embedding_attr()}' embedding function")
+        return False
+    owner, fn_attr = slot
+    wrapped = wrap(getattr(owner, fn_attr))
+    setattr(owner, fn_attr, wrapped)
+    return isinstance(wrapped, CachedEmbeddingFunction)
+
+
+def stats() -> dict:
+    return active_cache.stats() if active_cache else {}
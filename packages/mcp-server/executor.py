@@ -0,0 +1,118 @@
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+
+class ServerBusyError(Exception):
+    """Raised immediately when the executor queue is full (caller should retry later)."""
+
+
+class CallTimeoutError(Exception):
+    """Raised when a call submitted to the executor exceeds its timeout."""
+
+
+class BoundedExecutor:
+    """
+    Thread pool for blocking work (vector search, embedding) called from async tools.
+
+    - max_workers: how many calls run concurrently.
+    - max_queue: how many more may wait for a worker; beyond that run() fails fast
+      with ServerBusyError instead of piling up.
+    - timeout: default per-call timeout in seconds (None disables).
+
+    A slot is only released when the underlying thread finishes, so timed-out
+    calls that are still running keep counting against the bound.
+    """
+
+    def __init__(self, max_workers: int = 4, max_queue: int = 16,
+                 timeout: Optional[float] = 30.0, name: str = "executor"):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._lock = threading.Lock()
+        self._pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timeouts = 0
+
+    def _release(self, _future=None):
+        with self._lock:
+            self._pending -= 1
+            self.completed += 1
+
+    async def run(self, fn: Callable[..., Any], *args, timeout: Optional[float] = None, **kwargs) -> Any:
+        with self._lock:
+            if self._pending >= self.max_workers + self.max_queue:
+                self.rejected += 1
+                raise ServerBusyError(f"Server busy ({self.name} queue full), please retry shortly")
+            self._pending += 1
+
+        try:
+            cf = self._pool.submit(functools.partial(fn, *args, **kwargs))
+        except Exception:
+            self._release()
+            raise
+        cf.add_done_callback(self._release)
+
+        timeout = self.timeout if timeout is None else timeout
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(cf), timeout)
+        except asyncio.TimeoutError:
+            with self._lock:
+                self.timeouts += 1
+            raise CallTimeoutError(f"{self.name} call timed out after {timeout}s")
+
+    def stats(self) -> dict:
+        return {
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "pending": self._pending,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "timeouts": self.timeouts,
+        }
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical async calls: while a call for `key` is in flight,
+    later callers await the same result instead of starting their own.
+    The shared task is shielded so one caller cancelling doesn't cancel the others.
+    """
+
+    def __init__(self):
+        self._inflight: dict = {}
+        self.calls = 0
+        self.deduplicated = 0
+
+    async def do(self, key, coro_fn: Callable[[], Any]) -> Any:
+        self.calls += 1
+        task = self._inflight.get(key)
+        if task is not None:
+            self.deduplicated += 1
+        else:
+            task = asyncio.ensure_future(coro_fn())
+            self._inflight[key] = task
+            task.add_done_callback(functools.partial(self._done, key))
+        return await asyncio.shield(task)
+
+    def _done(self, key, task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Mark the exception retrieved even if every waiter was cancelled
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> dict:
+        return {
+            "calls": self.calls,
+            "deduplicated": self.deduplicated,
+            "in_flight": len(self._inflight),
+        }
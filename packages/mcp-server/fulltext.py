@@ -0,0 +1,275 @@
+"""
+Full-text keyword index over memory and document-chunk text.
+
+Backed by SQLite FTS5 (external-content table + triggers) or a Postgres tsvector
+column with a GIN index, depending on the database dialect; both are created by the
+MCP migrations (migrations/versions/mcp_0003_fulltext.py). Rows live in
+mcp_fts_docs, one per memory or per document chunk, keyed by item_id ('mem_12',
+'doc_5'). Write tools keep it up to date; items created outside the MCP server are
+picked up by sync(), which incrementally adds anything newer than the last sync.
+A user's first full build runs in the background (Backfiller); until it finishes,
+sync() returns False and callers search by vector only. Items deleted or edited
+outside the server are caught when they come up as hits: callers check hits against
+the items themselves (see indexed_text) and drop or re-index stale ones.
+"""
+import asyncio
+import logging
+import re
+import time
+from datetime import datetime
+from typing import Awaitable, Callable, Iterable, List, Optional, Tuple
+
+from sqlalchemy import Column, DateTime, Integer, inspect, text
+from sqlalchemy.future import select
+
+from schema import McpBase
+
+logger = logging.getLogger("mcp_server.fulltext")
+
+# (item_id, part, title, body)
+IndexRow = Tuple[str, int, Optional[str], Optional[str]]
+
+
+class FullTextState(McpBase):
+    __tablename__ = "mcp_fts_state"
+
+    user_id = Column(Integer, primary_key=True)
+    synced_at = Column(DateTime, nullable=False)
+
+
+_ready = False
+# None until the schema has been checked; False if the database has no full-text index
+available: Optional[bool] = None
+
+# Single identifier-like token (snake_case, CamelCase, dotted paths, ticket numbers,
+# hashes) or an explicitly quoted string: answer from the keyword index alone.
+_LITERAL_RE = re.compile(
+    r'^(?:"[^"]+"|`[^`]+`|\S*[_:./#\\-]\S*|\S*\d\S*|[a-z]+[A-Z]\w*|[A-Z][a-z]+[A-Z]\w*)$'
+)
+
+
+def looks_literal(query: str) -> bool:
+    return bool(_LITERAL_RE.match(query.strip()))
+
+
+def _dialect(db) -> str:
+    return db.bind.dialect.name
+
+
+async def ensure_schema(session_factory) -> bool:
+    """
+    Check once per process whether the index exists (created by the MCP migrations,
+    revision mcp_0003). Returns False if it doesn't: searches fall back to vectors.
+    """
+    global _ready, available
+    if _ready:
+        return available
+    async with session_factory() as db:
+        conn = await db.connection()
+        tables = set(await conn.run_sync(lambda sync_conn: inspect(sync_conn).get_table_names()))
+        required = {"mcp_fts_docs", "mcp_fts"} if _dialect(db) == "sqlite" else {"mcp_fts_docs"}
+        available = required <= tables
+        if not available:
+            logger.error("Full-text index not found (run the MCP migrations), falling back to vector-only search")
+    _ready = True
+    return available
+
+
+async def remove_items(db, item_ids: Iterable[str]) -> None:
+    """Drop index rows for items. Does not commit."""
+    item_ids = list(item_ids)
+    if not available or not item_ids:
+        return
+    for i in range(0, len(item_ids), 500):
+        batch = item_ids[i:i + 500]
+        params = {f"i{n}": v for n, v in enumerate(batch)}
+        await db.execute(
+            text(f"DELETE FROM mcp_fts_docs WHERE item_id IN ({', '.join(':' + k for k in params)})"),
+            params,
+        )
+
+
+async def index_items(db, user_id: int, rows: List[IndexRow]) -> None:
+    """(Re)index items: replaces every existing row for each item_id. Does not commit."""
+    if not available or not rows:
+        return
+    await remove_items(db, {row[0] for row in rows})
+    await db.execute(
+        text("INSERT INTO mcp_fts_docs (item_id, user_id, part, title, body) VALUES (:item_id, :user_id, :part, :title, :body)"),
+        [{"item_id": r[0], "user_id": user_id, "part": r[1], "title": r[2], "body": r[3]} for r in rows],
+    )
+
+
+async def indexed_text(db, item_ids: Iterable[str]) -> dict:
+    """{item_id: (title, body)} of the first indexed part of each item, to compare with the item itself."""
+    item_ids = list(item_ids)
+    if not available or not item_ids:
+        return {}
+    params = {f"i{n}": v for n, v in enumerate(item_ids)}
+    result = await db.execute(
+        text(f"SELECT item_id, title, body FROM mcp_fts_docs WHERE part = 0 AND item_id IN ({', '.join(':' + k for k in params)})"),
+        params,
+    )
+    return {row.item_id: (row.title, row.body) for row in result.all()}
+
+
+_last_sync: dict = {}
+SYNC_INTERVAL = 30.0
+
+
+async def backfill(db, user_id: int, load_items: Callable[..., Awaitable[List[IndexRow]]]) -> None:
+    """Index every item a user has and start incremental syncs from now. Commits."""
+    if not available:
+        return
+    started = datetime.utcnow()
+    await index_items(db, user_id, await load_items(db, user_id, None))
+    state = (await db.execute(select(FullTextState).filter(FullTextState.user_id == user_id))).scalars().first()
+    if state:
+        state.synced_at = started
+    else:
+        db.add(FullTextState(user_id=user_id, synced_at=started))
+    await db.commit()
+
+
+async def sync(db, user_id: int, load_items: Callable[..., Awaitable[List[IndexRow]]]) -> bool:
+    """
+    Bring a user's index up to date with items created outside the MCP server.
+    load_items(db, user_id, since) returns rows for items created after `since`.
+    Throttled to once per SYNC_INTERVAL per process. Returns False if the user has
+    not been backfilled yet: the full build is left to Backfiller, off the request path.
+    """
+    if not available:
+        return False
+    now = time.monotonic()
+    if now - _last_sync.get(user_id, -SYNC_INTERVAL) < SYNC_INTERVAL:
+        return True
+
+    state = (await db.execute(select(FullTextState).filter(FullTextState.user_id == user_id))).scalars().first()
+    if state is None:
+        return False
+    _last_sync[user_id] = now
+    started = datetime.utcnow()
+    await index_items(db, user_id, await load_items(db, user_id, state.synced_at))
+    state.synced_at = started
+    await db.commit()
+    return True
+
+
+class Backfiller:
+    """Background task that builds the index for users who have none yet, one user at a time."""
+
+    def __init__(self, session_factory, load_items: Callable[..., Awaitable[List[IndexRow]]]):
+        self.session_factory = session_factory
+        self.load_items = load_items
+        self._pending: List[int] = []
+        self._task: Optional[asyncio.Task] = None
+        self.backfilled = 0
+        self.last_error: Optional[str] = None
+
+    def request(self, user_id: int) -> None:
+        """Queue a user for backfill and start the task if it isn't running."""
+        if user_id not in self._pending:
+            self._pending.append(user_id)
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self):
+        while self._pending:
+            user_id = self._pending[0]
+            try:
+                async with self.session_factory() as db:
+                    await backfill(db, user_id, self.load_items)
+                self.backfilled += 1
+            except Exception as e:
+                self.last_error = str(e)
+                logger.error(f"Full-text backfill failed for user {user_id}: {e}", exc_info=True)
+            self._pending.pop(0)
+
+    def stats(self) -> dict:
+        return {"pending": len(self._pending), "backfilled": self.backfilled, "last_error": self.last_error}
+
+
+def _sqlite_match(query: str, phrase: bool) -> Optional[str]:
+    """
+    Translate a query into FTS5 syntax with the semantics websearch_to_tsquery gives it
+    on Postgres: terms are ANDed, "quoted text" is a phrase, `or` between two terms is
+    OR, and a leading '-' excludes a term. Neither side drops stopwords ('simple' config).
+    """
+    if phrase:
+        terms = re.findall(r"\w+", query)
+        return '"' + " ".join(terms) + '"' if terms else None
+
+    clauses, excluded, pending_or = [], [], False
+    for negate_quoted, quoted, negate_word, word in re.findall(r'(-?)"([^"]*)"?|(-?)(\w+)', query):
+        negate = negate_quoted or negate_word
+        terms = re.findall(r"\w+", quoted) if quoted else [word] if word else []
+        if not terms:
+            continue
+        if not quoted and word.lower() == "or" and not negate:
+            pending_or = bool(clauses)
+            continue
+        clause = '"' + " ".join(terms) + '"'
+        if negate:
+            excluded.append(clause)
+        elif pending_or:
+            clauses[-1] = f"{clauses[-1]} OR {clause}"
+            pending_or = False
+        else:
+            clauses.append(clause)
+    if not clauses:
+        return None
+    match = " AND ".join(f"({c})" if " OR " in c else c for c in clauses)
+    return match + "".join(f" NOT {c}" for c in excluded)
+
+
+async def search(db, user_id: int, query: str, limit: int = 10, phrase: bool = False) -> List[dict]:
+    """
+    Keyword search within one user's items, best first. One result per item
+    (the best-matching chunk). Each result: {item_id, title, snippet, score}.
+    """
+    if not available:
+        return []
+    fetch = limit * 3
+    if _dialect(db) == "postgresql":
+        to_query = "phraseto_tsquery" if phrase else "websearch_to_tsquery"
+        result = await db.execute(
+            text(
+                f"SELECT item_id, title, ts_headline('simple', coalesce(body, ''), q, 'MaxWords=24, MinWords=8, StartSel=[, StopSel=]') AS snippet, "
+                f"ts_rank_cd(tsv, q) AS score "
+                f"FROM mcp_fts_docs, {to_query}('simple', :q) q "
+                f"WHERE user_id = :uid AND tsv @@ q ORDER BY score DESC LIMIT :n"
+            ),
+            {"q": query.strip('"`'), "uid": user_id, "n": fetch},
+        )
+    else:
+        match = _sqlite_match(query, phrase)
+        if not match:
+            return []
+        # bm25() is lower-is-better; negate so higher always means more relevant
+        result = await db.execute(
+            text(
+                "SELECT d.item_id, d.title, snippet(mcp_fts, 1, '[', ']', '…', 16) AS snippet, -bm25(mcp_fts) AS score "
+                "FROM mcp_fts JOIN mcp_fts_docs d ON d.id = mcp_fts.rowid "
+                "WHERE mcp_fts MATCH :q AND d.user_id = :uid ORDER BY bm25(mcp_fts) LIMIT :n"
+            ),
+            {"q": match, "uid": user_id, "n": fetch},
+        )
+
+    hits, seen = [], set()
+    for row in result.all():
+        if row.item_id in seen:
+            continue
+        seen.add(row.item_id)
+        hits.append({"item_id": row.item_id, "title": row.title, "snippet": row.snippet, "score": float(row.score or 0)})
+        if len(hits) >= limit:
+            break
+    return hits
+
+
+def reciprocal_rank_fusion(rankings: List[List[str]], k: int = 60) -> List[Tuple[str, float]]:
+    """Fuse several best-first lists of item IDs into one (Reciprocal Rank Fusion)."""
+    scores: dict = {}
+    for ranking in rankings:
+        for rank, item_id in enumerate(ranking):
+            scores[item_id] = scores.get(item_id, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(scores.items(), key=lambda kv: kv[1], reverse=True)
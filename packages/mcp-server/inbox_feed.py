@@ -0,0 +1,201 @@
+"""
+Inbox change feed and resources/updated notifications for brain://inbox.
+
+Write tools record an InboxChange row in the same transaction whenever a pending
+memory is added, edited or removed, so the feed only grows when a user's inbox
+really changes. Clients can read the deltas since a cursor (the last change id
+they saw) instead of re-reading the whole inbox.
+
+Change ids are allocated when a row is inserted, not when it commits, so on Postgres
+a reader can see id 12 while id 11 is still uncommitted. A cursor only moves past such
+a gap once the row after it is older than the settle window (see safe_head); until
+then readers stop just before the gap. Feed rows are added just before their write
+commits, so the window only has to cover a commit, a few seconds at most. Gaps from rolled-back writes and pruning therefore
+cost at most one window of delay, and rows are never skipped by a slow commit.
+
+Only writes made through this server are recorded. Approving or discarding a memory
+in the web app does not add feed rows, so such removals show up only when a client
+resyncs (reads the inbox without a cursor).
+
+InboxNotifier tracks which sessions subscribed to brain://inbox for which user.
+A background task reads new feed rows (woken after local writes, and on an
+interval to pick up writes from other server processes) and sends one
+resources/updated notification per affected user's sessions.
+"""
+import asyncio
+import logging
+import weakref
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Optional
+
+from sqlalchemy import Column, DateTime, Integer, String, delete, func
+from sqlalchemy.future import select
+
+from schema import McpBase, SchemaNotReady, ensure_schema
+
+logger = logging.getLogger("mcp_server.inbox_feed")
+
+INBOX_URI = "brain://inbox"
+# Default for how long an id gap may be an in-flight transaction before readers move past it
+SETTLE_WINDOW = timedelta(seconds=2)
+# Rows examined per safe_head call; a reader further behind catches up over several calls
+SCAN_LIMIT = 1000
+
+
+class InboxChange(McpBase):
+    __tablename__ = "mcp_inbox_changes"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    user_id = Column(Integer, nullable=False, index=True)
+    memory_id = Column(Integer, nullable=False)
+    op = Column(String(16), nullable=False)  # "added" | "updated" | "removed"
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow, index=True)
+
+
+def record(db, user_id: int, memory_ids: Iterable[int], op: str) -> bool:
+    """Add feed rows for inbox memories. Does not commit. Returns True if anything was recorded."""
+    recorded = False
+    for memory_id in memory_ids:
+        db.add(InboxChange(user_id=user_id, memory_id=memory_id, op=op))
+        recorded = True
+    return recorded
+
+
+async def safe_head(db, after_id: int, settle: timedelta = SETTLE_WINDOW) -> int:
+    """
+    Highest change id (across all users) a cursor at after_id can advance to without
+    skipping a row that may still commit: the scan stops at the first id gap whose next
+    row is younger than `settle`.
+    """
+    result = await db.execute(
+        select(InboxChange.id, InboxChange.created_at)
+        .filter(InboxChange.id > after_id)
+        .order_by(InboxChange.id)
+        .limit(SCAN_LIMIT)
+    )
+    settled = datetime.utcnow() - settle
+    safe = after_id
+    for change_id, created_at in result.all():
+        if change_id != safe + 1 and created_at > settled:
+            break
+        safe = change_id
+    return safe
+
+
+async def changes_since(db, user_id: int, after_id: int, limit: int = 200, settle: timedelta = SETTLE_WINDOW):
+    """
+    ([(id, memory_id, op, created_at)], head): changes recorded for user_id after change
+    after_id, oldest first, and the cursor to continue from once they are consumed.
+    """
+    upto = await safe_head(db, after_id, settle)
+    result = await db.execute(
+        select(InboxChange.id, InboxChange.memory_id, InboxChange.op, InboxChange.created_at)
+        .filter(InboxChange.user_id == user_id, InboxChange.id > after_id, InboxChange.id <= upto)
+        .order_by(InboxChange.id)
+        .limit(limit)
+    )
+    return result.all(), upto
+
+
+async def head(db, settle: timedelta = SETTLE_WINDOW) -> int:
+    """A cursor that starts from 'now' (the latest change id that can't be overtaken)."""
+    result = await db.execute(
+        select(func.max(InboxChange.id)).filter(InboxChange.created_at <= datetime.utcnow() - settle)
+    )
+    return await safe_head(db, result.scalar() or 0, settle)
+
+
+class InboxNotifier:
+    def __init__(self, session_factory, interval: float = 2.0, retention: timedelta = timedelta(days=7),
+                 settle: timedelta = SETTLE_WINDOW):
+        self.session_factory = session_factory
+        self.interval = interval
+        self.retention = retention
+        self.settle = settle
+        # user_id -> sessions subscribed to the inbox resource
+        self._subscribers: Dict[int, "weakref.WeakSet"] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._last_id: Optional[int] = None
+        self._last_prune = datetime.min
+        self.notifications = 0
+        self.failed = 0
+
+    def subscribe(self, user_id: int, session) -> None:
+        self._subscribers.setdefault(user_id, weakref.WeakSet()).add(session)
+        self.start()
+
+    def unsubscribe(self, session) -> None:
+        for user_id in list(self._subscribers):
+            self._subscribers[user_id].discard(session)
+            if not self._subscribers[user_id]:
+                del self._subscribers[user_id]
+
+    def start(self) -> None:
+        if self._task is not None and not self._task.done():
+            return
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def notify(self) -> None:
+        """Wake the dispatcher after a commit that recorded inbox changes."""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _run(self):
+        while True:
+            try:
+                await ensure_schema(self.session_factory)
+                await self._dispatch()
+            except SchemaNotReady:
+                # Already logged by ensure_schema; retried until the migrations are run
+                pass
+            except Exception as e:
+                logger.error(f"Inbox notification dispatch failed: {e}", exc_info=True)
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    async def _dispatch(self) -> None:
+        async with self.session_factory() as db:
+            if self._last_id is None:
+                # Only changes made after the first subscription are pushed
+                self._last_id = await head(db, self.settle)
+            if datetime.utcnow() - self._last_prune > timedelta(hours=1):
+                await db.execute(delete(InboxChange).where(InboxChange.created_at < datetime.utcnow() - self.retention))
+                await db.commit()
+                self._last_prune = datetime.utcnow()
+            if not self._subscribers:
+                self._last_id = await head(db, self.settle)
+                return
+            upto = await safe_head(db, self._last_id, self.settle)
+            if upto == self._last_id:
+                return
+            result = await db.execute(
+                select(InboxChange.user_id)
+                .filter(InboxChange.id > self._last_id, InboxChange.id <= upto)
+                .distinct()
+            )
+            changed = result.scalars().all()
+        self._last_id = upto
+        for user_id in changed:
+            for session in list(self._subscribers.get(user_id, ())):
+                try:
+                    await session.send_resource_updated(INBOX_URI)
+                    self.notifications += 1
+                except Exception as e:
+                    # Closed or broken session: stop notifying it
+                    self.failed += 1
+                    logger.debug(f"Dropping inbox subscriber: {e}")
+                    self.unsubscribe(session)
+
+    def stats(self) -> dict:
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "subscribed_users": len(self._subscribers),
+            "subscribed_sessions": sum(len(s) for s in self._subscribers.values()),
+            "notifications": self.notifications,
+            "failed": self.failed,
+        }
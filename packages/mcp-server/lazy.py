@@ -0,0 +1,66 @@
+import asyncio
+import importlib
+import threading
+import time
+from typing import Any, Callable, ContextManager, Dict, Optional
+
+
+class LazyObject:
+    """
+    Stand-in for a module attribute (e.g. app.services.vector_store.vector_store)
+    that is only imported on first use. Attribute access loads it synchronously;
+    async code should `await obj.aload()` first so the import runs off the event loop.
+    """
+
+    def __init__(self, module: str, attr: str,
+                 import_context: Optional[Callable[[], ContextManager]] = None,
+                 timings: Optional[Dict[str, float]] = None,
+                 on_load: Optional[Callable[[Any], None]] = None):
+        self._module = module
+        self._attr = attr
+        self._import_context = import_context
+        self._timings = timings
+        self._on_load = on_load
+        self._obj = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._obj is not None
+
+    def load(self) -> Any:
+        if self._obj is not None:
+            return self._obj
+        with self._lock:
+            if self._obj is None:
+                started = time.perf_counter()
+                if self._import_context:
+                    with self._import_context():
+                        module = importlib.import_module(self._module)
+                else:
+                    module = importlib.import_module(self._module)
+                obj = getattr(module, self._attr)
+                if self._on_load:
+                    self._on_load(obj)
+                self._obj = obj
+                if self._timings is not None:
+                    self._timings[f"lazy.{self._attr}"] = round(time.perf_counter() - started, 4)
+        return self._obj
+
+    def set(self, obj: Any) -> None:
+        """Use obj instead of importing the real attribute (benchmarks, local tooling)."""
+        with self._lock:
+            self._obj = obj
+
+    async def aload(self) -> Any:
+        if self._obj is not None:
+            return self._obj
+        return await asyncio.to_thread(self.load)
+
+    def __getattr__(self, name: str) -> Any:
+        # Only reached for attributes not defined on LazyObject itself
+        return getattr(self.load(), name)
+
+    def __repr__(self) -> str:
+        state = "loaded" if self.loaded else "not loaded"
+        return f"<LazyObject {self._module}.{self._attr} ({state})>"
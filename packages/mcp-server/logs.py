@@ -0,0 +1,113 @@
+"""
+Non-blocking structured logging for the MCP server.
+
+Records are handed to a QueueHandler and written to disk by a QueueListener thread,
+so tool calls on the event loop never wait on file I/O. Each record carries the
+current request ID (MCP request id when available, otherwise a generated one), and
+expensive introspection dumps go through sampled() so they only run for a fraction
+of calls at DEBUG level.
+"""
+import atexit
+import contextvars
+import functools
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import uuid
+from typing import Optional
+
+request_id_var: contextvars.ContextVar[str] = contextvars.ContextVar("mcp_request_id", default="-")
+
+SAMPLE_RATE = float(os.environ.get("BRAIN_VAULT_LOG_SAMPLE_RATE", "0.01"))
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+class RequestIdFilter(logging.Filter):
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "request_id": getattr(record, "request_id", "-"),
+            "msg": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def setup_file_logging(logger: logging.Logger, path: str = "mcp_debug.log") -> None:
+    """Attach a queue-backed file handler to logger (idempotent)."""
+    global _listener
+    if _listener is not None:
+        return
+
+    file_handler = logging.FileHandler(path)
+    if os.environ.get("BRAIN_VAULT_LOG_FORMAT", "text") == "json":
+        file_handler.setFormatter(JsonFormatter())
+    else:
+        file_handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - [%(request_id)s] %(message)s'))
+
+    log_queue: queue.Queue = queue.Queue(maxsize=int(os.environ.get("BRAIN_VAULT_LOG_QUEUE_SIZE", "10000")))
+    queue_handler = _DroppingQueueHandler(log_queue)
+    # Filter runs in the calling thread, where the request contextvar is set
+    queue_handler.addFilter(RequestIdFilter())
+    logger.addHandler(queue_handler)
+
+    _listener = logging.handlers.QueueListener(log_queue, file_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Drops records instead of blocking the caller when the writer falls behind."""
+
+    dropped = 0
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            _DroppingQueueHandler.dropped += 1
+
+
+def sampled(logger: logging.Logger, rate: float = None) -> bool:
+    """True for a random fraction of calls, and only when DEBUG is enabled."""
+    return logger.isEnabledFor(logging.DEBUG) and random.random() < (SAMPLE_RATE if rate is None else rate)
+
+
+def with_request_id(fn):
+    """Tag every log record emitted during a tool call with that call's request ID."""
+
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        request_id = None
+        for value in list(args) + list(kwargs.values()):
+            # The MCP Context exposes the JSON-RPC request id (raises outside a request)
+            if type(value).__name__ == "Context":
+                try:
+                    request_id = value.request_id
+                except Exception:
+                    request_id = None
+                break
+        token = request_id_var.set(str(request_id) if request_id else uuid.uuid4().hex[:12])
+        try:
+            return await fn(*args, **kwargs)
+        finally:
+            request_id_var.reset(token)
+
+    return wrapper
+
+
+def stats() -> dict:
+    return {"dropped_records": _DroppingQueueHandler.dropped}
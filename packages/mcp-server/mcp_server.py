@@ -1,13 +1,18 @@
+import time
+_process_started = time.perf_counter()
+
 import asyncio
 import sys
 import os
 import contextlib
 import logging
 import builtins
+from datetime import datetime, timedelta
 from typing import Any, List, Optional
 from mcp.server.fastmcp import FastMCP
+from pydantic import BaseModel
 from sqlalchemy.future import select
-from sqlalchemy import delete
+from sqlalchemy import delete, func, or_, union_all, literal, cast, null, String
 from sqlalchemy.orm import selectinload
 
 # --- STDOUT PROTECTION ---
@@ -43,35 +48,130 @@ def redirect_stdout_to_stderr():
     finally:
         sys.stdout = old_stdout
 
+# Startup phase timings (seconds), reported in the debug log and at /stats
+startup_timings = {"imports.core": round(time.perf_counter() - _process_started, 4)}
+
 # Perform imports and initialization with stdout redirected
 # This prevents libraries (like ChromaDB) from printing to stdout and breaking the MCP protocol
+_phase_started = time.perf_counter()
 with redirect_stdout_to_stderr():
-    from app.services.vector_store import vector_store
-    from app.services.ingestion import ingestion_service
     from app.db.session import AsyncSessionLocal
     from app.models.document import Document
     from app.models.user import User
     from app.models.memory import Memory
     # Import ChatSession to ensure relationship mapper works
     from app.models.chat import ChatSession
-    from app.services.context_builder import context_builder
-    from app.services.memory_service import memory_service
     # Worker tasks imported lazily to avoid Celery/Redis connection at startup
+startup_timings["imports.models"] = round(time.perf_counter() - _phase_started, 4)
+
+# --- METRICS ---
+# Per-tool latency/error metrics with a per-phase breakdown, served at /metrics.
+import metrics
+from metrics import phase
+
+def _timed_session_factory(factory):
+    """Same session factory, but every statement/commit is timed as the "sql" phase."""
+    class TimedAsyncSession(factory.class_):
+        async def execute(self, *args, **kwargs):
+            with phase("sql"):
+                return await super().execute(*args, **kwargs)
+
+        async def scalar(self, *args, **kwargs):
+            with phase("sql"):
+                return await super().scalar(*args, **kwargs)
+
+        async def get(self, *args, **kwargs):
+            with phase("sql"):
+                return await super().get(*args, **kwargs)
+
+        async def flush(self, *args, **kwargs):
+            with phase("sql"):
+                return await super().flush(*args, **kwargs)
+
+        async def commit(self):
+            with phase("sql"):
+                return await super().commit()
+
+        async def refresh(self, *args, **kwargs):
+            with phase("sql"):
+                return await super().refresh(*args, **kwargs)
+
+    return type(factory)(class_=TimedAsyncSession, **factory.kw)
+
+AsyncSessionLocal = _timed_session_factory(AsyncSessionLocal)
+
+# Heavy services (sentence-transformers, ChromaDB) are deferred until the first tool
+# that needs them, so the server can answer initialize/list/inbox immediately.
+# Imports still happen with stdout redirected, on a worker thread (see LazyObject.aload).
+from lazy import LazyObject
+
+def _lazy_service(module: str, attr: str, on_load=None) -> LazyObject:
+    return LazyObject(module, attr, import_context=redirect_stdout_to_stderr, timings=startup_timings, on_load=on_load)
+
+def _on_vector_store_loaded(store):
+    # Swap in the configured embedding backend (ONNX int8, dynamic batching) below the cache
+    try:
+        embedding_backends.install(store)
+    except Exception as e:
+        logger.error(f"Failed to install embedding backend: {e}", exc_info=True)
+    # Route every embedding (ingestion and queries) through the content-addressed cache
+    try:
+        embeddings.install(store)
+    except Exception as e:
+        logger.error(f"Failed to install embedding cache: {e}", exc_info=True)
+
+import embeddings
+import embedding_backends
+vector_store = _lazy_service("app.services.vector_store", "vector_store", on_load=_on_vector_store_loaded)
+ingestion_service = _lazy_service("app.services.ingestion", "ingestion_service")
+context_builder = _lazy_service("app.services.context_builder", "context_builder")
+memory_service = _lazy_service("app.services.memory_service", "memory_service")
 
 # Setup File Logging for Debugging (since stdout is redirected)
-import logging
-file_handler = logging.FileHandler("mcp_debug.log")
-file_handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+# Written by a background thread via a queue so tool calls never block on disk I/O
+import logs
 logger = logging.getLogger("mcp_server")
-logger.addHandler(file_handler)
-logger.setLevel(logging.INFO)
+logs.setup_file_logging(logger, "mcp_debug.log")
+logger.setLevel(os.environ.get("BRAIN_VAULT_LOG_LEVEL", "INFO").upper())
 
 # Initialize FastMCP Server with DNS rebinding protection configured
 # to allow the production domain (otherwise 421 "Invalid Host header")
 from mcp.server.transport_security import TransportSecuritySettings
 
+from contextlib import asynccontextmanager
+
+WARMUP_ENABLED = os.environ.get("BRAIN_VAULT_WARMUP", "1") == "1"
+WARMUP_DELAY = float(os.environ.get("BRAIN_VAULT_WARMUP_DELAY", "0.5"))
+_warmup_task = None
+
+async def _warm_up():
+    # Let initialize/list_tools be answered first, then load services in the background
+    await asyncio.sleep(WARMUP_DELAY)
+    started = time.perf_counter()
+    for service in (vector_store, ingestion_service, context_builder, memory_service):
+        try:
+            await service.aload()
+        except Exception as e:
+            logger.error(f"Warm-up failed for {service!r}: {e}", exc_info=True)
+    startup_timings["warmup.total"] = round(time.perf_counter() - started, 4)
+    logger.info(f"Warm-up complete. Startup timings: {startup_timings}")
+
+@asynccontextmanager
+async def server_lifespan(server):
+    # Runs once the transport owns the real stdout, so redirecting it during
+    # background imports can't swallow protocol messages.
+    global _warmup_task
+    startup_timings.setdefault("ready", round(time.perf_counter() - _process_started, 4))
+    logger.info(f"Server ready. Startup timings: {startup_timings}")
+    # Drain any outbox rows left over from a previous process
+    outbox_worker.start()
+    if WARMUP_ENABLED and _warmup_task is None:
+        _warmup_task = asyncio.create_task(_warm_up())
+    yield {}
+
 mcp = FastMCP(
     "MemWyre",
+    lifespan=server_lifespan,
     transport_security=TransportSecuritySettings(
         allowed_hosts=["server.memwyre.tech", "localhost", "127.0.0.1"],
     ),
@@ -87,6 +187,85 @@ import hashlib
 def hash_key(key: str) -> str:
     return hashlib.sha256(key.encode()).hexdigest()
 
+# --- IDENTITY CACHE ---
+# Resolved identities are cached in-process so that every tool call does not pay
+# for an ApiKey + User round-trip. Keys: ("key", key_hash), ("sub", user_id),
+# ("email", email). Unknown/revoked keys are cached as None for a shorter TTL.
+# Keys are revoked and re-scoped in the web app (another process), so a cached key's
+# is_active and scopes are re-read with one indexed single-row query once it is older
+# than AUTH_KEY_RECHECK seconds (default 5); the User lookup is saved for the full TTL.
+# The web app can also drop entries immediately on revoke/rotate via POST
+# /admin/invalidate-identity (see invalidate_api_key / invalidate_user).
+from sqlalchemy import inspect as sa_inspect
+from sqlalchemy.orm import make_transient_to_detached
+from cache import TTLCache, MISS
+
+AUTH_CACHE_TTL = float(os.environ.get("BRAIN_VAULT_AUTH_CACHE_TTL", "60"))
+AUTH_CACHE_NEGATIVE_TTL = float(os.environ.get("BRAIN_VAULT_AUTH_CACHE_NEGATIVE_TTL", "10"))
+AUTH_KEY_RECHECK = float(os.environ.get("BRAIN_VAULT_AUTH_KEY_RECHECK", "5"))
+identity_cache = TTLCache(
+    maxsize=int(os.environ.get("BRAIN_VAULT_AUTH_CACHE_SIZE", "4096")),
+    ttl=AUTH_CACHE_TTL,
+)
+
+class CachedIdentity:
+    __slots__ = ("user", "scopes", "key_name", "checked_at")
+
+    def __init__(self, user, scopes=None, key_name=None):
+        self.user = user
+        self.scopes = scopes
+        self.key_name = key_name
+        self.checked_at = time.monotonic()
+
+def _key_scopes(scopes) -> list:
+    # Default to allowing read/write if scopes aren't set (legacy keys)
+    return list(scopes or ["mcp:read", "mcp:write"])
+
+def _detached_user_copy(user):
+    """Snapshot column values into a detached User that no session owns (safe to share)."""
+    if user is None:
+        return None
+    copy = User(**{attr.key: getattr(user, attr.key) for attr in sa_inspect(User).column_attrs})
+    make_transient_to_detached(copy)
+    return copy
+
+async def _attach_cached_user(db, identity: Optional[CachedIdentity]):
+    # merge(load=False) attaches a copy to this session without emitting a SELECT
+    if identity is None or identity.user is None:
+        return None
+    return await db.merge(identity.user, load=False)
+
+def _cache_identity(cache_key, identity: Optional[CachedIdentity]):
+    if identity is None or identity.user is None:
+        identity_cache.set(cache_key, None, ttl=AUTH_CACHE_NEGATIVE_TTL)
+    else:
+        identity_cache.set(cache_key, identity)
+
+async def _recheck_api_key(db, key_hash: str, identity: CachedIdentity) -> Optional[CachedIdentity]:
+    """Re-read a cached key's status and scopes. Returns None (and caches that) if it was revoked."""
+    if time.monotonic() - identity.checked_at < AUTH_KEY_RECHECK:
+        return identity
+    result = await db.execute(
+        select(ApiKey.scopes).filter(ApiKey.key_hash == key_hash, ApiKey.is_active == True)
+    )
+    row = result.first()
+    if row is None:
+        _cache_identity(("key", key_hash), None)
+        return None
+    identity.scopes = _key_scopes(row[0])
+    identity.checked_at = time.monotonic()
+    return identity
+
+def invalidate_api_key(key_hash: str) -> None:
+    """Forget a cached API key (revoked, rotated or re-scoped) so its next use re-reads it."""
+    identity_cache.pop(("key", key_hash))
+
+def invalidate_user(user_id: int) -> int:
+    """Forget every cached identity of a user (all their keys and tokens). Returns count removed."""
+    return identity_cache.pop_where(
+        lambda key, identity: identity is not None and identity.user is not None and identity.user.id == user_id
+    )
+
 # Helper to get current user async
 async def get_current_user(db, ctx: Context = None, required_scope: str = None):
     """
@@ -96,6 +275,29 @@ async def get_current_user(db, ctx: Context = None, required_scope: str = None):
     Also validates required scopes if provided.
     Returns a tuple of (User, client_source) where client_source is determined from protocol or API key name.
     """
+    with phase("auth"):
+        user, client_source = await _resolve_current_user(db, ctx, required_scope)
+    if user is not None:
+        # Per-user rate limit and fair queueing for the calling tool's lane
+        with phase("queue"):
+            user = await _admit(db, user)
+    return (user, client_source)
+
+async def _admit(db, user):
+    """
+    scheduler.admit() for user. If the call has to queue, the session's pooled connection
+    is handed back first (auth only read), so waiting calls can't exhaust the pool; the
+    user is detached meanwhile and re-attached without a SELECT once admitted.
+    """
+    if not (scheduler.would_queue() and db.in_transaction()):
+        await scheduler.admit(user.id)
+        return user
+    db.expunge_all()
+    await db.rollback()
+    await scheduler.admit(user.id)
+    return await db.merge(user, load=False)
+
+async def _resolve_current_user(db, ctx: Context = None, required_scope: str = None):
     api_key = None
     protocol_client_name = None
 
@@ -114,9 +316,9 @@ async def get_current_user(db, ctx: Context = None, required_scope: str = None):
                     protocol_client_name = session.init_options.clientInfo.name
             
                 if protocol_client_name:
-                    logger.info(f"Detected MCP protocol client name: {protocol_client_name}")
-                else:
-                    logger.debug(f"Session attrs (could not find client info): {[a for a in dir(session) if not a.startswith('_')]}")
+                    logger.debug("Detected MCP protocol client name: %s", protocol_client_name)
+                elif logs.sampled(logger):
+                    logger.debug("Session attrs (could not find client info): %s", [a for a in dir(session) if not a.startswith('_')])
         except Exception as e:
             logger.error(f"Error extracting protocol client info: {e}")
 
@@ -127,7 +329,8 @@ async def get_current_user(db, ctx: Context = None, required_scope: str = None):
     if ctx and hasattr(ctx, 'request_context'):
         try:
             rc = ctx.request_context
-            logger.info(f"request_context type: {type(rc)}, attrs: {[a for a in dir(rc) if not a.startswith('_')]}")
+            if logs.sampled(logger):
+                logger.debug("request_context type: %s, attrs: %s", type(rc), [a for a in dir(rc) if not a.startswith('_')])
             
             # Try multiple ways to get headers (varies by transport)
             headers = {}
@@ -144,7 +347,8 @@ async def get_current_user(db, ctx: Context = None, required_scope: str = None):
             else:
                 header_dict = {}
             
-            logger.info(f"Extracted headers keys: {list(header_dict.keys())}")
+            if logs.sampled(logger):
+                logger.debug("Extracted headers keys: %s", list(header_dict.keys()))
             
             # Check Custom Headers for explicit client name
             for key, value in header_dict.items():
@@ -159,7 +363,8 @@ async def get_current_user(db, ctx: Context = None, required_scope: str = None):
                     break
 
             if auth_header:
-                logger.info(f"Found auth header: {auth_header[:20]}...")
+                # Never log token material, only which scheme was used
+                logger.debug("Found auth header (scheme: %s)", "bearer" if auth_header.startswith("Bearer ") else "raw")
                 if auth_header.startswith("Bearer "):
                     token = auth_header.split(" ")[1]
                     if token.startswith("bv_sk_"):
@@ -188,30 +393,47 @@ async def get_current_user(db, ctx: Context = None, required_scope: str = None):
         # A. Persistent API Key
         if api_key.startswith("bv_sk_"):
             hashed = hash_key(api_key)
-            result = await db.execute(select(ApiKey).filter(ApiKey.key_hash == hashed, ApiKey.is_active == True))
-            key_record = result.scalars().first()
-            if key_record:
-                
-                # Check scopes, default to allowing read/write if scopes aren't set (legacy keys)
-                scopes = key_record.scopes or ["mcp:read", "mcp:write"]
-                if required_scope and required_scope not in scopes:
+            cache_key = ("key", hashed)
+            identity = identity_cache.get(cache_key)
+            if identity is MISS:
+                identity = None
+                result = await db.execute(select(ApiKey).filter(ApiKey.key_hash == hashed, ApiKey.is_active == True))
+                key_record = result.scalars().first()
+                if key_record:
+                    result_user = await db.execute(select(User).filter(User.id == key_record.user_id))
+                    identity = CachedIdentity(
+                        user=_detached_user_copy(result_user.scalars().first()),
+                        scopes=_key_scopes(key_record.scopes),
+                        key_name=key_record.name,
+                    )
+                _cache_identity(cache_key, identity)
+            elif identity is not None:
+                identity = await _recheck_api_key(db, hashed, identity)
+
+            if identity:
+                # Check scopes
+                if required_scope and required_scope not in identity.scopes:
                     raise Exception(f"Permission denied: Missing required scope '{required_scope}'")
-                
-                result_user = await db.execute(select(User).filter(User.id == key_record.user_id))
-                user = result_user.scalars().first()
-                key_record_name = key_record.name
-        
+
+                user = await _attach_cached_user(db, identity)
+                key_record_name = identity.key_name
+
         # B. OAuth2 Access Token (JWT)
         else:
             try:
-                # Verify JWT
+                # Verify JWT (always decoded so expiry is enforced; only the User lookup is cached)
                 payload = jwt.decode(api_key, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
                 user_id: str = payload.get("sub")
-                
+
                 # For JWT, assume full user access within MCP for now, or decode scopes if added to JWT later
                 if user_id:
-                    result = await db.execute(select(User).filter(User.id == int(user_id)))
-                    user = result.scalars().first()
+                    cache_key = ("sub", str(user_id))
+                    identity = identity_cache.get(cache_key)
+                    if identity is MISS:
+                        result = await db.execute(select(User).filter(User.id == int(user_id)))
+                        identity = CachedIdentity(user=_detached_user_copy(result.scalars().first()))
+                        _cache_identity(cache_key, identity)
+                    user = await _attach_cached_user(db, identity)
             except JWTError:
                 # Invalid or expired token
                 pass
@@ -222,28 +444,205 @@ async def get_current_user(db, ctx: Context = None, required_scope: str = None):
         # Fallback assume full access for local dev
         user_email = os.environ.get("BRAIN_VAULT_USER_EMAIL")
         if user_email:
-            result = await db.execute(select(User).filter(User.email == user_email))
-            user = result.scalars().first()
-            
+            identity = identity_cache.get(("email", user_email))
+            if identity is MISS:
+                result = await db.execute(select(User).filter(User.email == user_email))
+                identity = CachedIdentity(user=_detached_user_copy(result.scalars().first()))
+                _cache_identity(("email", user_email), identity)
+            user = await _attach_cached_user(db, identity)
+
         user_id = os.environ.get("BRAIN_VAULT_USER_ID")
         if not user and user_id:
-            result = await db.execute(select(User).filter(User.id == int(user_id)))
-            user = result.scalars().first()
+            identity = identity_cache.get(("sub", str(user_id)))
+            if identity is MISS:
+                result = await db.execute(select(User).filter(User.id == int(user_id)))
+                identity = CachedIdentity(user=_detached_user_copy(result.scalars().first()))
+                _cache_identity(("sub", str(user_id)), identity)
+            user = await _attach_cached_user(db, identity)
 
     # Determine priority for client_source
     client_source = protocol_client_name or env_client_name or key_record_name
     return (user, client_source)
 
+# --- RETRIEVAL EXECUTOR ---
+# context_builder is synchronous (embedding + vector query). Run it on a bounded
+# thread pool so one slow search doesn't freeze every other session on the loop.
+from executor import BoundedExecutor, ServerBusyError, CallTimeoutError, SingleFlight
+
+retrieval_executor = BoundedExecutor(
+    max_workers=int(os.environ.get("BRAIN_VAULT_RETRIEVAL_CONCURRENCY", "4")),
+    max_queue=int(os.environ.get("BRAIN_VAULT_RETRIEVAL_QUEUE", "16")),
+    timeout=float(os.environ.get("BRAIN_VAULT_RETRIEVAL_TIMEOUT", "20")),
+    name="retrieval",
+)
+
+# Vector-store writes (which embed inside add_documents) get their own pool so a
+# bulk import can't starve searches.
+ingestion_executor = BoundedExecutor(
+    max_workers=int(os.environ.get("BRAIN_VAULT_INGESTION_CONCURRENCY", "2")),
+    max_queue=int(os.environ.get("BRAIN_VAULT_INGESTION_QUEUE", "8")),
+    timeout=float(os.environ.get("BRAIN_VAULT_INGESTION_TIMEOUT", "120")),
+    name="ingestion",
+)
+
+# --- PER-TENANT SCHEDULING ---
+# Expensive tools are rate limited per user and share their lane's slots fairly
+# across users (see scheduler.py); cheap tools run in a separate "light" lane.
+from scheduler import Scheduler, Lane
+
+def _lane(name: str, concurrency: int, rate: float, burst: float) -> Lane:
+    prefix = f"BRAIN_VAULT_{name.upper()}_LANE"
+    return Lane(
+        name,
+        concurrency=int(os.environ.get(f"{prefix}_CONCURRENCY", str(concurrency))),
+        rate=float(os.environ.get(f"{prefix}_RATE", str(rate))),
+        burst=float(os.environ.get(f"{prefix}_BURST", str(burst))),
+        max_waiting=int(os.environ.get("BRAIN_VAULT_LANE_MAX_WAITING", "4")),
+        max_wait=float(os.environ.get("BRAIN_VAULT_LANE_MAX_WAIT", "30")),
+    )
+
+scheduler = Scheduler(
+    {
+        "retrieval": _lane("retrieval", concurrency=4, rate=2.0, burst=10),
+        "ingestion": _lane("ingestion", concurrency=2, rate=1.0, burst=20),
+        "listing": _lane("listing", concurrency=4, rate=2.0, burst=10),
+        "light": _lane("light", concurrency=32, rate=10.0, burst=30),
+    },
+    enabled=os.environ.get("BRAIN_VAULT_RATE_LIMITS", "1") == "1",
+)
+
+# --- VECTOR OUTBOX ---
+# Vector adds/deletes are written to an outbox table in the same transaction as the
+# row change and applied in batches by a background worker (see outbox.py).
+from schema import ensure_schema
+import fulltext
+import dedup
+from outbox import OutboxWorker, enqueue_add, enqueue_delete, enqueue_purge, stored_vectors
+import tag_index
+import daterange
+import inbox_feed
+from pagination import encode_cursor, decode_cursor, keyset_after
+
+outbox_worker = OutboxWorker(
+    AsyncSessionLocal,
+    get_vector_store=vector_store.aload,
+    executor=ingestion_executor,
+    batch_size=int(os.environ.get("BRAIN_VAULT_OUTBOX_BATCH_SIZE", "500")),
+    interval=float(os.environ.get("BRAIN_VAULT_OUTBOX_INTERVAL", "1.0")),
+    # Results cached between the commit and the vector write may be stale
+    on_applied=lambda user_ids: [bump_user_generation(uid) for uid in user_ids],
+)
+
+# Change feed for brain://inbox subscribers (see inbox_feed.py)
+inbox_notifier = inbox_feed.InboxNotifier(
+    AsyncSessionLocal,
+    interval=float(os.environ.get("BRAIN_VAULT_INBOX_POLL_INTERVAL", "2.0")),
+    settle=timedelta(seconds=float(os.environ.get("BRAIN_VAULT_INBOX_SETTLE_WINDOW", "2.0"))),
+)
+
+async def _ensure_mcp_tables():
+    """Check the MCP-owned tables are migrated (raises SchemaNotReady) and detect the full-text index."""
+    await ensure_schema(AsyncSessionLocal)
+    await fulltext.ensure_schema(AsyncSessionLocal)
+
+# --- RETRIEVAL CACHE ---
+# Results are keyed by (user_id, generation, normalized query, purpose, token budget).
+# Every write tool bumps the user's generation, so entries cached before a write can
+# never be served again; they simply age out of the LRU. The TTL only guards against
+# writes made outside this process (web app, other workers).
+retrieval_cache = TTLCache(
+    maxsize=int(os.environ.get("BRAIN_VAULT_RETRIEVAL_CACHE_SIZE", "1024")),
+    ttl=float(os.environ.get("BRAIN_VAULT_RETRIEVAL_CACHE_TTL", "300")),
+)
+_user_generations: dict = {}
+retrieval_flights = SingleFlight()
+
+def bump_user_generation(user_id: int):
+    """Invalidate cached retrieval results for a user. Call after any write to their vault."""
+    _user_generations[user_id] = _user_generations.get(user_id, 0) + 1
+
+def _normalize_query(query: str) -> str:
+    return " ".join(query.lower().split()).rstrip("?!. ")
+
+async def build_context_async(query: str, user_id: int, limit_tokens: int = 2000, purpose: str = "general") -> dict:
+    with phase("retrieval"):
+        return await _build_context_cached(query, user_id, limit_tokens, purpose)
+
+async def _build_context_cached(query: str, user_id: int, limit_tokens: int, purpose: str) -> dict:
+    generation = _user_generations.get(user_id, 0)
+    cache_key = (user_id, generation, _normalize_query(query), purpose, limit_tokens)
+    cached = retrieval_cache.get(cache_key)
+    if cached is not MISS:
+        return cached
+
+    async def compute():
+        await context_builder.aload()
+        result = await retrieval_executor.run(
+            context_builder.build_context, query=query, user_id=user_id, limit_tokens=limit_tokens
+        )
+        # Don't cache a result that raced with a write
+        if _user_generations.get(user_id, 0) == generation:
+            retrieval_cache.set(cache_key, result)
+        return result
+
+    # Concurrent identical searches (e.g. extension + plugin + desktop client) share one computation
+    return await retrieval_flights.do(cache_key, compute)
+
+
 
+# --- NEAR-DUPLICATE DETECTION ---
+# "flag" by default: saves are never dropped or rewritten unless a client asks for it
+DEDUP_MODE = os.environ.get("BRAIN_VAULT_DEDUP_MODE", "flag")
+DEDUP_MAX_DISTANCE = int(os.environ.get("BRAIN_VAULT_DEDUP_MAX_DISTANCE", str(dedup.MAX_DISTANCE)))
+if DEDUP_MAX_DISTANCE > dedup.MAX_DISTANCE:
+    logger.warning(f"BRAIN_VAULT_DEDUP_MAX_DISTANCE={DEDUP_MAX_DISTANCE} exceeds what the signature bands "
+                   f"can find reliably; using {dedup.MAX_DISTANCE}")
+    DEDUP_MAX_DISTANCE = dedup.MAX_DISTANCE
+if DEDUP_MODE not in dedup.MODES:
+    logger.warning(f"BRAIN_VAULT_DEDUP_MODE={DEDUP_MODE} is not one of {dedup.MODES}; using 'flag'")
+    DEDUP_MODE = "flag"
+
+async def _live_duplicate(db, user, duplicate):
+    """
+    The memory a signature match points at, or None if it is gone. Its stale signature is
+    dropped in the caller's transaction (the save that follows commits it).
+    """
+    result = await db.execute(select(Memory).filter(Memory.id == duplicate[0], Memory.user_id == user.id))
+    existing = result.scalars().first()
+    if not existing:
+        await dedup.remove(db, [duplicate[0]])
+    return existing
+
+async def _resolve_duplicate(db, user, existing, distance: int, text: str, tags: Optional[List[str]], mode: str) -> str:
+    """Apply a "reject" or "merge" on_duplicate mode against an existing near-identical memory."""
+    memory_id = existing.id
+    dedup.handled[mode] += 1
+    if mode == "reject":
+        return f"Not saved: near-duplicate of existing memory mem_{memory_id} (distance {distance}). Use update_memory to change it."
+
+    if mode == "merge":
+        current = tag_index.parse_tags(existing.tags)
+        new_tags = [t for t in dict.fromkeys(tags or []) if t and t not in current]
+        if not new_tags:
+            return f"Near-duplicate of existing memory mem_{memory_id}; nothing new to save."
+        # Goes through the update path so the chunks' tag metadata is rewritten as well
+        await tag_index.record(db, user.id, memory_id, current + new_tags)
+        await _apply_memory_update(db, user, existing, existing.content, tags=current + new_tags)
+        return f"Near-duplicate of existing memory mem_{memory_id}; merged tags {', '.join('#' + t for t in new_tags)} into it instead of saving a copy."
 
 @mcp.tool()
-async def save_memory(text: str, ctx: Context, source: str = "mcp", tags: Optional[List[str]] = None) -> str:
+@metrics.instrument_tool
+@logs.with_request_id
+@scheduler.lane("ingestion")
+async def save_memory(text: str, ctx: Context, source: str = "mcp", tags: Optional[List[str]] = None,
+                      on_duplicate: Optional[str] = None) -> str:
     """
     Save a new memory snippet to the MemWyre Vault. Use this tool when the user explicitly asks you to 'remember' something, 'save' a note, or when you encounter important information that should be persisted for future reference.
     Args:
         text: The content of the memory.
         source: Source of memory (default 'mcp').
         tags: Optional list of tags.
+        on_duplicate: What to do if a near-identical memory already exists: "flag" (save anyway and report it), "reject", "merge" (add tags to the existing memory) or "off". Defaults to the server setting.
     """
     async with AsyncSessionLocal() as db:
         try:
@@ -260,42 +659,397 @@ async def save_memory(text: str, ctx: Context, source: str = "mcp", tags: Option
             
             logger.info(f"Effective source: {effective_source} (identified source: {key_name})")
 
-            memory = await memory_service.create_memory(
-                db=db,
-                user=user,
-                content=text,
-                source=effective_source,
-                tags=tags
-            )
-            
+            # Near-duplicate check runs before any model work
+            mode = on_duplicate or DEDUP_MODE
+            if mode not in dedup.MODES:
+                return f"Error: on_duplicate must be one of {', '.join(dedup.MODES)}."
+            note = ""
+            if mode != "off":
+                await _ensure_mcp_tables()
+                await dedup.sync(db, user.id, Memory)
+                duplicate = await dedup.find_duplicate(db, user.id, text, DEDUP_MAX_DISTANCE)
+                existing = await _live_duplicate(db, user, duplicate) if duplicate else None
+                if existing is not None:
+                    if mode != "flag":
+                        return await _resolve_duplicate(db, user, existing, duplicate[1], text, tags, mode)
+                    dedup.handled["flag"] += 1
+                    note = f" Possible near-duplicate of mem_{existing.id} (distance {duplicate[1]})."
+
+            memory = await _create_memory(db, user, text, effective_source, tags)
+            await db.commit()
+            inbox_notifier.notify()
+
             logger.info(f"Memory saved successfully: mem_{memory.id}")
-            return f"Memory saved to Inbox with ID: mem_{memory.id} (Status: {memory.status})"
+            return f"Memory saved to Inbox with ID: mem_{memory.id} (Status: {memory.status}){note}"
         except Exception as e:
             logger.error(f"Error saving memory: {e}", exc_info=True)
             return f"Error saving memory: {str(e)}"
 
+def _content_chunk_ids(prefix: str, chunks: List[str]) -> List[str]:
+    """
+    Stable chunk IDs derived from chunk text: '<prefix>_<sha256[:16]>_<n>', where n
+    disambiguates identical chunks within the same item. Unchanged text keeps its ID
+    across edits, so only changed chunks need re-embedding.
+    """
+    seen = {}
+    ids = []
+    for chunk in chunks:
+        digest = hashlib.sha256(chunk.encode()).hexdigest()[:16]
+        n = seen.get(digest, 0)
+        seen[digest] = n + 1
+        ids.append(f"{prefix}_{digest}_{n}")
+    return ids
+
+async def _chunk_memory(memory, content: str, user_id: int):
+    """Chunk memory content via the ingestion service and assign content-hashed IDs."""
+    with phase("ingestion"):
+        await ingestion_service.aload()
+        _, _, enriched_chunks, metadatas = await ingestion_service.process_text(
+            text=content,
+            document_id=memory.id,
+            title=memory.title,
+            doc_type="memory",
+            metadata={"user_id": user_id, "memory_id": memory.id, "tags": str(memory.tags) if memory.tags else "", "source": memory.source_llm or "mcp"}
+        )
+    return _content_chunk_ids(f"mem_{memory.id}", enriched_chunks), enriched_chunks, metadatas
+
+class MemoryItem(BaseModel):
+    text: str
+    tags: Optional[List[str]] = None
+    source: Optional[str] = None
+
+MAX_BATCH_SIZE = int(os.environ.get("BRAIN_VAULT_MAX_BATCH_SIZE", "100"))
+
+async def _create_memory(db, user, text: str, source: str, tags: Optional[List[str]]):
+    """
+    Create a memory through memory_service (the backend's canonical create path: row,
+    defaults, chunking and vectors), then add its tag, keyword, signature and inbox rows.
+    save_memory and save_memories both save through here. The index rows are left for
+    the caller to commit; if that never happens, the indexes' own sync picks the memory up.
+    """
+    with phase("ingestion"):
+        await memory_service.aload()
+        memory = await memory_service.create_memory(db=db, user=user, content=text, source=source, tags=tags)
+    bump_user_generation(user.id)
+
+    await _ensure_mcp_tables()
+    await tag_index.record(db, user.id, memory.id, tag_index.parse_tags(memory.tags))
+    await fulltext.index_items(db, user.id, [(f"mem_{memory.id}", 0, memory.title, memory.content)])
+    dedup.record(db, user.id, memory.id, memory.content)
+    if memory.status == "pending":
+        inbox_feed.record(db, user.id, [memory.id], "added")
+    return memory
+
 @mcp.tool()
-async def search_memwyre(query: str, ctx: Context, purpose: str = "general") -> str:
+@metrics.instrument_tool
+@logs.with_request_id
+@scheduler.lane("ingestion")
+async def save_memories(items: List[MemoryItem], ctx: Context) -> str:
+    """
+    Save several memory snippets to the MemWyre Vault in one call (one authentication and session for the whole batch). Prefer this over repeated save_memory calls when importing or capturing many snippets at once.
+    Args:
+        items: List of memories, each with 'text' and optional 'tags' and 'source' (default 'mcp').
+    Returns one line per item with its new ID or the error for that item. Near-duplicates (of existing memories or of earlier items in the same call) are noted or skipped according to the server's duplicate setting.
+    """
+    if not items:
+        return "Error: No items provided."
+    if len(items) > MAX_BATCH_SIZE:
+        return f"Error: Too many items ({len(items)}). Maximum batch size is {MAX_BATCH_SIZE}."
+
+    async with AsyncSessionLocal() as db:
+        try:
+            logger.info(f"MCP save_memories called. Items: {len(items)}")
+            user, key_name = await get_current_user(db, ctx, required_scope="mcp:write")
+            if not user:
+                return "Error: No user found."
+
+            # index -> result line; filled in as items succeed or fail
+            outcomes = {}
+            saved = 0
+            await _ensure_mcp_tables()
+            if DEDUP_MODE != "off":
+                await dedup.sync(db, user.id, Memory)
+            for i, item in enumerate(items):
+                if not item.text or not item.text.strip():
+                    outcomes[i] = "Error: Empty text."
+                    continue
+                source = item.source or "mcp"
+                if source == "mcp" and key_name:
+                    source = key_name
+                try:
+                    note = ""
+                    if DEDUP_MODE != "off":
+                        # Earlier items of this call are committed with their signatures, so they match too
+                        duplicate = await dedup.find_duplicate(db, user.id, item.text, DEDUP_MAX_DISTANCE)
+                        if duplicate and await _live_duplicate(db, user, duplicate) is not None:
+                            if DEDUP_MODE != "flag":
+                                outcomes[i] = f"Skipped: near-duplicate of mem_{duplicate[0]}"
+                                continue
+                            dedup.handled["flag"] += 1
+                            note = f" - possible near-duplicate of mem_{duplicate[0]}"
+                    memory = await _create_memory(db, user, item.text, source, item.tags)
+                    await db.commit()
+                except Exception as e:
+                    logger.error(f"save_memories item {i} failed: {e}", exc_info=True)
+                    outcomes[i] = f"Error: {e}"
+                    await db.rollback()
+                    await db.refresh(user)
+                    continue
+                outcomes[i] = f"mem_{memory.id} (Status: {memory.status}){note}"
+                saved += 1
+
+            if saved:
+                inbox_notifier.notify()
+            logger.info(f"save_memories: saved {saved}/{len(items)}")
+            lines = [f"Saved {saved} of {len(items)} memories to Inbox."]
+            lines.extend(f"[{i}] {outcomes[i]}" for i in range(len(items)))
+            return "\n".join(lines)
+        except Exception as e:
+            logger.error(f"Error saving memories: {e}", exc_info=True)
+            return f"Error saving memories: {str(e)}"
+
+def _changed_since(model, since):
+    # updated_at only where the backend model has it; deletes are caught by _keyword_hits
+    if hasattr(model, "updated_at"):
+        return or_(model.created_at > since, model.updated_at > since)
+    return model.created_at > since
+
+async def _fulltext_rows_since(db, user_id: int, since):
+    """Memories and document chunks created (or updated) after `since` (all when None), for the keyword index."""
+    query = select(Memory.id, Memory.title, Memory.content).filter(Memory.user_id == user_id)
+    if since:
+        query = query.filter(_changed_since(Memory, since))
+    rows = [(f"mem_{m.id}", 0, m.title, m.content) for m in (await db.execute(query)).all()]
+
+    chunk_model, text_col, order_col = _chunk_columns()
+    query = (
+        select(Document.id, Document.title, order_col.label("idx"), text_col.label("text"))
+        .join(chunk_model, chunk_model.document_id == Document.id)
+        .filter(Document.user_id == user_id)
+    )
+    if since:
+        query = query.filter(_changed_since(Document, since))
+    rows.extend((f"doc_{d.id}", d.idx or 0, d.title, d.text) for d in (await db.execute(query)).all())
+    return rows
+
+# A user's first full keyword-index build runs here, never inside a search call
+fulltext_backfill = fulltext.Backfiller(AsyncSessionLocal, _fulltext_rows_since)
+
+async def _sync_keyword_index(db, user_id: int) -> bool:
+    """Incrementally sync the user's keyword index; False (and a queued backfill) if it has none yet."""
+    await _ensure_mcp_tables()
+    if not fulltext.available:
+        return False
+    if await fulltext.sync(db, user_id, _fulltext_rows_since):
+        return True
+    fulltext_backfill.request(user_id)
+    return False
+
+KEYWORD_RESULT_LIMIT = int(os.environ.get("BRAIN_VAULT_KEYWORD_RESULTS", "5"))
+
+async def _stale_keyword_items(db, user_id: int, item_ids: List[str]) -> set:
+    """
+    Check keyword hits against the items themselves: items deleted (or no longer the
+    user's) are dropped from the index, memories whose text changed are re-indexed.
+    Returns the stale item IDs. Does not commit.
+    """
+    mem_ids = {int(i[4:]): i for i in item_ids if i.startswith("mem_") and i[4:].isdigit()}
+    doc_ids = {int(i[4:]): i for i in item_ids if i.startswith("doc_") and i[4:].isdigit()}
+    current, found = {}, set()
+    if mem_ids:
+        result = await db.execute(
+            select(Memory.id, Memory.title, Memory.content).filter(Memory.id.in_(mem_ids), Memory.user_id == user_id)
+        )
+        current = {mem_ids[row.id]: (row.title, row.content) for row in result.all()}
+        found.update(current)
+    if doc_ids:
+        result = await db.execute(select(Document.id).filter(Document.id.in_(doc_ids), Document.user_id == user_id))
+        found.update(doc_ids[row.id] for row in result.all())
+
+    missing = [i for i in item_ids if i not in found]
+    indexed = await fulltext.indexed_text(db, list(current))
+    edited = [item_id for item_id, text in current.items() if indexed.get(item_id) != text]
+    await fulltext.remove_items(db, missing)
+    await fulltext.index_items(db, user_id, [(item_id, 0, *current[item_id]) for item_id in edited])
+    return set(missing) | set(edited)
+
+async def _keyword_hits(db, user_id: int, query: str, limit: int, phrase: bool) -> List[dict]:
+    """fulltext.search, with hits on items deleted or edited outside the MCP server fixed up first."""
+    for _ in range(2):
+        hits = await fulltext.search(db, user_id, query, limit=limit, phrase=phrase)
+        stale = await _stale_keyword_items(db, user_id, [h["item_id"] for h in hits])
+        if not stale:
+            return hits
+        # The index is corrected now; search again so edited items rank on their current text
+        await db.commit()
+    return [h for h in hits if h["item_id"] not in stale]
+
+def _format_keyword_hits(hits) -> str:
+    return "\n".join(f"- [{h['item_id']}] {h['title'] or ''}: {(h['snippet'] or '').strip()}" for h in hits)
+
+def _vector_item_ids(context: dict) -> List[str]:
+    """Best-first mem_/doc_ IDs behind a build_context result, if it exposes its sources."""
+    ids = []
+    for source in context.get("sources") or context.get("chunks") or []:
+        meta = source.get("metadata", source) if isinstance(source, dict) else {}
+        if meta.get("memory_id") is not None:
+            item_id = f"mem_{meta['memory_id']}"
+        elif meta.get("document_id") is not None:
+            item_id = f"doc_{meta['document_id']}"
+        else:
+            continue
+        if item_id not in ids:
+            ids.append(item_id)
+    return ids
+
+@mcp.tool()
+@metrics.instrument_tool
+@logs.with_request_id
+@scheduler.lane("retrieval")
+async def search_memwyre(query: str, ctx: Context, purpose: str = "general",
+                         start_date: Optional[str] = None, end_date: Optional[str] = None) -> str:
     """
     The PRIMARY tool for searching the user's "MemWyre". Use this to retrieve relevant context, notes, code snippets, or past conversations from the MemWyre Vault.
     ALWAYS use this before answering questions that might require personal context.
+    Exact identifiers (function names, ticket numbers, "quoted error strings") are matched by keyword as well as by meaning.
     Args:
         query: The semantic search query (e.g., "python fastapi project structure", "notes on meeting with Bob", or "auth system specs").
         purpose: Optional hint for context formatting ("general", "code", "summary").
+        start_date: Only return items created on or after this date (YYYY-MM-DD, optional).
+        end_date: Only return items created on or before this date (YYYY-MM-DD, optional).
+    With a date range, the best overall matches are found first and then filtered by date, so
+    a narrow or old range can come back short; use search_by_date to list everything in a range.
     """
+    date_range = None
+    if start_date or end_date:
+        try:
+            date_range = daterange.parse_range(start_date or "1970-01-01", end_date or datetime.utcnow().strftime("%Y-%m-%d"))
+        except ValueError as e:
+            return f"Error: {str(e)}"
+
     async with AsyncSessionLocal() as db:
         try:
             user, _ = await get_current_user(db, ctx, required_scope="mcp:read")
             if not user:
                 return "Error: No user found."
-                
-            # Context builder uses vector store (network/sync)
-            ctx = context_builder.build_context(query=query, user_id=user.id, limit_tokens=2000)
-            return ctx["text"]
+
+            if date_range:
+                return await _search_in_range(db, user.id, query, purpose, *date_range)
+
+            # Keyword index (FTS5 / tsvector): cheap, and exact for identifiers
+            hits = []
+            literal = fulltext.looks_literal(query)
+            with phase("sql"):
+                try:
+                    if await _sync_keyword_index(db, user.id):
+                        hits = await _keyword_hits(db, user.id, query, limit=KEYWORD_RESULT_LIMIT * 2, phrase=literal)
+                except Exception as e:
+                    logger.error(f"Keyword search failed, using vector search only: {e}")
+                    await db.rollback()
+
+            # Fast path: a literal token with exact matches needs no embedding at all
+            if literal and hits:
+                return f"Keyword matches for {query}:\n" + _format_keyword_hits(hits[:KEYWORD_RESULT_LIMIT])
+
+            # Context builder uses vector store (network/sync), so it runs off the event loop
+            ctx = await build_context_async(query=query, user_id=user.id, limit_tokens=2000, purpose=purpose)
+            if not hits:
+                return ctx["text"]
+
+            # The vector context is kept as built; keyword hits it doesn't already cover are
+            # appended in keyword-rank order (not fused: the context text isn't re-ranked)
+            vector_ids = set(_vector_item_ids(ctx))
+            extra = [h for h in hits if h["item_id"] not in vector_ids]
+            if not extra:
+                return ctx["text"]
+            return ctx["text"] + "\n\n## Keyword matches\n" + _format_keyword_hits(extra[:KEYWORD_RESULT_LIMIT])
+        except (ServerBusyError, CallTimeoutError) as e:
+            return f"Error: {str(e)}"
         except Exception as e:
             return f"Error searching vault: {str(e)}"
 
+# Date filters apply after retrieval, so dated searches over-fetch candidates from both sides
+DATED_SEARCH_CONTEXT_TOKENS = int(os.environ.get("BRAIN_VAULT_DATED_SEARCH_TOKENS", "8000"))
+DATED_SEARCH_KEYWORD_CANDIDATES = int(os.environ.get("BRAIN_VAULT_DATED_SEARCH_KEYWORD_CANDIDATES", "100"))
+
+async def _items_in_range(db, user_id: int, item_ids: List[str], start, end) -> dict:
+    """The subset of item_ids created in [start, end), as item_id -> (created_at, title, preview)."""
+    mem_ids = [int(i[4:]) for i in item_ids if i.startswith("mem_") and i[4:].isdigit()]
+    doc_ids = [int(i[4:]) for i in item_ids if i.startswith("doc_") and i[4:].isdigit()]
+    found = {}
+    for prefix, model, ids in (("mem", Memory, mem_ids), ("doc", Document, doc_ids)):
+        if not ids:
+            continue
+        result = await db.execute(
+            select(model.id, model.created_at, model.title, func.substr(model.content, 1, 200).label("preview")).filter(
+                model.id.in_(ids),
+                model.user_id == user_id,
+                model.created_at >= start,
+                model.created_at < end
+            )
+        )
+        for row in result.all():
+            found[f"{prefix}_{row.id}"] = (row.created_at, row.title, row.preview)
+    return found
+
+async def _search_in_range(db, user_id: int, query: str, purpose: str, start, end) -> str:
+    """
+    search_memwyre restricted to a creation-date range. Keyword and vector candidates
+    are over-fetched and then post-filtered: the range is checked in SQL on the
+    (user_id, created_at) index, and the surviving items are fused by RRF and listed
+    with their dates. Matches ranked below the candidate cut-off are not seen.
+    """
+    hits = []
+    with phase("sql"):
+        try:
+            if await _sync_keyword_index(db, user_id):
+                hits = await _keyword_hits(db, user_id, query, limit=DATED_SEARCH_KEYWORD_CANDIDATES, phrase=fulltext.looks_literal(query))
+        except Exception as e:
+            logger.error(f"Keyword search failed, using vector search only: {e}")
+            await db.rollback()
+
+    context = await build_context_async(query=query, user_id=user_id, limit_tokens=DATED_SEARCH_CONTEXT_TOKENS, purpose=purpose)
+    vector_ids = _vector_item_ids(context)
+    keyword_ids = [h["item_id"] for h in hits]
+
+    await _ensure_mcp_tables()
+    in_range = await _items_in_range(db, user_id, list(dict.fromkeys(vector_ids + keyword_ids)), start, end)
+    fused = fulltext.reciprocal_rank_fusion([
+        [i for i in vector_ids if i in in_range],
+        [i for i in keyword_ids if i in in_range],
+    ])
+    label = f"{start.strftime('%Y-%m-%d')} and {(end - timedelta(days=1)).strftime('%Y-%m-%d')}"
+    if not fused:
+        return f"No matching memories found between {label}."
+
+    snippets = {h["item_id"]: h["snippet"] for h in hits}
+    lines = [f"Matches created between {label}:"]
+    for item_id, _ in fused[:KEYWORD_RESULT_LIMIT * 2]:
+        created_at, title, preview = in_range[item_id]
+        text = (snippets.get(item_id) or preview or "").strip()
+        lines.append(f"- [{item_id}] {created_at.strftime('%Y-%m-%d')} {title or ''}: {text}")
+    return "\n".join(lines)
+
+# --- LISTING HELPERS ---
+# Listings only show a title or a short preview, so select just those columns and
+# truncate content in SQL: large memories are never read, transferred or hydrated.
+def content_preview(length: int):
+    return func.substr(Memory.content, 1, length).label("preview")
+
+async def _list_inbox(db, user_id: int, preview_len: int):
+    """Pending memories as (id, source_llm, preview) rows, newest first."""
+    result = await db.execute(
+        select(Memory.id, Memory.source_llm, content_preview(preview_len)).filter(
+            Memory.user_id == user_id,
+            Memory.status == "pending"
+        ).order_by(Memory.created_at.desc())
+    )
+    return result.all()
+
 @mcp.tool()
+@metrics.instrument_tool
+@logs.with_request_id
+@scheduler.lane("light")
 async def get_inbox(ctx: Context) -> str:
     """
     Get list of pending memories in the MemWyre Inbox.
@@ -306,42 +1060,62 @@ async def get_inbox(ctx: Context) -> str:
             if not user:
                 return "Error: No user found."
                 
-            result = await db.execute(
-                select(Memory).filter(
-                    Memory.user_id == user.id,
-                    Memory.status == "pending"
-                ).order_by(Memory.created_at.desc())
-            )
-            memories = result.scalars().all()
+            memories = await _list_inbox(db, user.id, preview_len=50)
             
             if not memories:
                 return "Inbox is empty."
                 
             results = []
             for mem in memories:
-                results.append(f"ID: mem_{mem.id} | Content: {mem.content[:50]}... | Source: {mem.source_llm}")
+                results.append(f"ID: mem_{mem.id} | Content: {mem.preview or ''}... | Source: {mem.source_llm}")
                 
             return "\n".join(results)
         except Exception as e:
             return f"Error getting inbox: {str(e)}"
 
+DOCUMENT_PAGE_SIZE = int(os.environ.get("BRAIN_VAULT_DOCUMENT_PAGE_SIZE", "20000"))
+
+def _chunk_columns():
+    """(chunk model, text column, order column) for Document.chunks, resolved from the mapper."""
+    chunk_model = Document.chunks.property.mapper.class_
+    columns = chunk_model.__table__.c
+    text_col = next(getattr(chunk_model, name) for name in ("content", "text", "chunk_text") if name in columns)
+    order_col = chunk_model.chunk_index if "chunk_index" in columns else chunk_model.id
+    return chunk_model, text_col, order_col
+
 @mcp.tool()
-async def get_document(doc_id: int, ctx: Context) -> str:
+@metrics.instrument_tool
+@logs.with_request_id
+@scheduler.lane("listing")
+async def get_document(doc_id: int, ctx: Context, offset: int = 0, length: Optional[int] = None,
+                       chunk_index: Optional[int] = None, list_chunks: bool = False) -> str:
     """
-    Retrieve the full content of a specific document by ID from MemWyre.
+    Retrieve the content of a specific document by ID from MemWyre. Large documents are returned one page at a time.
     Args:
         doc_id: The ID of the document.
+        offset: Character offset to start reading from (default 0).
+        length: Maximum number of characters to return (default and max 20000).
+        chunk_index: Return only this stored chunk of the document instead of a character range.
+        list_chunks: Return the document's chunk boundaries (index, size, preview) instead of content.
     """
+    length = DOCUMENT_PAGE_SIZE if not length or length <= 0 else min(length, DOCUMENT_PAGE_SIZE)
+    offset = max(offset, 0)
+
     async with AsyncSessionLocal() as db:
         try:
             user, _ = await get_current_user(db, ctx, required_scope="mcp:read")
             if not user:
                 return "Error: No user found."
-                
+
+            # Only the requested slice and the total size are loaded, never the full content
             result = await db.execute(
-                select(Document).filter(Document.id == doc_id)
+                select(
+                    Document.user_id,
+                    func.length(Document.content).label("total"),
+                    func.substr(Document.content, offset + 1, length).label("content"),
+                ).filter(Document.id == doc_id)
             )
-            doc = result.scalars().first()
+            doc = result.first()
             
             if not doc:
                 return f"Document with ID {doc_id} not found."
@@ -349,12 +1123,41 @@ async def get_document(doc_id: int, ctx: Context) -> str:
             # Check ownership
             if doc.user_id != user.id:
                  return f"Document with ID {doc_id} not found (Access Denied)."
-                 
-            return doc.content
+
+            if list_chunks or chunk_index is not None:
+                chunk_model, text_col, order_col = _chunk_columns()
+                base = select(order_col.label("idx"), func.length(text_col).label("size")).filter(chunk_model.document_id == doc_id)
+                if list_chunks:
+                    rows = (await db.execute(base.add_columns(func.substr(text_col, 1, 60).label("preview")).order_by(order_col))).all()
+                    if not rows:
+                        return f"Document doc_{doc_id} has no stored chunks."
+                    lines = [f"Document doc_{doc_id}: {len(rows)} chunks, {doc.total or 0} characters"]
+                    lines.extend(f"- chunk {row.idx} | {row.size} chars | {(row.preview or '').strip()}..." for row in rows)
+                    return "\n".join(lines)
+
+                row = (await db.execute(base.add_columns(text_col.label("text")).filter(order_col == chunk_index))).first()
+                if not row:
+                    return f"Error: Chunk {chunk_index} not found in document doc_{doc_id}."
+                return row.text
+
+            total = doc.total or 0
+            # Small documents read from the start come back exactly as before
+            if offset == 0 and total <= length:
+                return doc.content or ""
+            if offset >= total:
+                return f"Error: Offset {offset} is past the end of document doc_{doc_id} ({total} characters)."
+
+            end = offset + len(doc.content or "")
+            header = f"[Document doc_{doc_id} | characters {offset}-{end} of {total}"
+            header += f" | Next offset: {end}]" if end < total else " | End of document]"
+            return header + "\n" + (doc.content or "")
         except Exception as e:
             return f"Error getting document: {str(e)}"
 
 @mcp.tool()
+@metrics.instrument_tool
+@logs.with_request_id
+@scheduler.lane("retrieval")
 async def generate_prompt(query: str, ctx: Context, template: str = "standard") -> str:
     """
     Generate a prompt with retrieved context from MemWyre.
@@ -369,7 +1172,7 @@ async def generate_prompt(query: str, ctx: Context, template: str = "standard")
                 return "Error: No user found."
             
             # 1. Retrieve Context using ContextBuilder (Standardized)
-            ctx = context_builder.build_context(query=query, user_id=user.id, limit_tokens=2000)
+            ctx = await build_context_async(query=query, user_id=user.id, limit_tokens=2000, purpose=template)
             context_str = ctx["text"]
             
             # 3. Apply Template
@@ -405,10 +1208,59 @@ QUESTION:
 {query}
 """
             return prompt
+        except (ServerBusyError, CallTimeoutError) as e:
+            return f"Error: {str(e)}"
         except Exception as e:
             return f"Error generating prompt: {str(e)}"
 
+async def _apply_memory_update(db, user, memory, content: str, tags: Optional[List[str]] = None) -> None:
+    """
+    Replace a memory's content and commit. The new text is chunked (no embedding) into
+    content-hashed chunk IDs and diffed against the vectors the memory actually has
+    (outbox.stored_vectors), so only changed chunks are queued for embedding and every
+    stored vector not in the new set is deleted, whatever ID it was indexed under.
+    Unchanged chunks whose metadata moved (e.g. chunk_index, or tags when `tags` replaces
+    them) are re-added too; their text is unchanged, so the embedding cache serves them.
+    """
+    if tags is not None:
+        memory.tags = tags
+    new_ids, new_chunks, new_metadatas = await _chunk_memory(memory, content, user.id)
+
+    await _ensure_mcp_tables()
+    store = await vector_store.aload()
+    stored = await stored_vectors(db, store, ingestion_executor, memory.id)
+    if stored is None:
+        # The store can't be searched by metadata: re-add every chunk and drop the one
+        # vector ID the row records
+        stored = {memory.embedding_id: None} if memory.embedding_id else {}
+
+    new_id_set = set(new_ids)
+    stale_ids = [i for i in stored if i not in new_id_set]
+    added = [(i, c, m) for i, c, m in zip(new_ids, new_chunks, new_metadatas) if stored.get(i) != m]
+
+    # Update DB and queue vector changes in one transaction: only changed chunks get embedded
+    memory.content = content
+    memory.embedding_id = new_ids[0] if new_ids else None
+    await fulltext.index_items(db, user.id, [(f"mem_{memory.id}", 0, memory.title, content)])
+    await dedup.replace(db, user.id, memory.id, content)
+    if memory.status == "pending":
+        inbox_feed.record(db, user.id, [memory.id], "updated")
+    enqueue_delete(db, user.id, stale_ids)
+    if added:
+        ids, chunks, metadatas = (list(x) for x in zip(*added))
+        enqueue_add(db, user.id, ids, chunks, metadatas)
+    await db.commit()
+    bump_user_generation(user.id)
+    outbox_worker.notify()
+    inbox_notifier.notify()
+
+    logger.info(f"update mem_{memory.id}: {len(added)} chunks (re)added, {len(stale_ids)} removed, "
+                f"{len(new_ids) - len(added)} reused")
+
 @mcp.tool()
+@metrics.instrument_tool
+@logs.with_request_id
+@scheduler.lane("ingestion")
 async def update_memory(memory_id: str, content: str, ctx: Context) -> str:
     """
     Update the content of an existing memory in MemWyre.
@@ -437,42 +1289,95 @@ async def update_memory(memory_id: str, content: str, ctx: Context) -> str:
             if not memory:
                 return "Error: Memory not found."
 
-            # Update DB
-            memory.content = content
-            await db.commit()
-            await db.refresh(memory)
-
-            # Update Vector Store
-            if memory.embedding_id:
-                try:
-                    vector_store.delete(ids=[memory.embedding_id])
-                except:
-                    pass
-            
-            # Re-ingest
-            ids, raw_chunks, enriched_chunks, metadatas = await ingestion_service.process_text(
-                text=memory.content,
-                document_id=memory.id,
-                title=memory.title,
-                doc_type="memory",
-                metadata={"user_id": user.id, "memory_id": memory.id, "tags": str(memory.tags) if memory.tags else "", "source": "mcp"}
-            )
-            
-            if ids:
-                memory.embedding_id = ids[0]
-                await db.commit()
-                
-                vector_store.add_documents(
-                    ids=ids,
-                    documents=enriched_chunks,
-                    metadatas=metadatas
-                )
+            if content == memory.content:
+                return f"Memory {memory_id} unchanged."
 
+            await _apply_memory_update(db, user, memory, content)
             return f"Memory {memory_id} updated successfully."
         except Exception as e:
             return f"Error updating memory: {str(e)}"
 
+def _parse_item_id(item_id: str):
+    """Split 'mem_12' / 'doc_5' into ('mem', 12). Raises ValueError on anything else."""
+    prefix, _, raw = item_id.partition("_")
+    if prefix not in ("mem", "doc"):
+        raise ValueError("ID must start with 'mem_' or 'doc_'.")
+    try:
+        return prefix, int(raw)
+    except ValueError:
+        raise ValueError("Invalid ID format.")
+
+async def _delete_items(db, user, item_ids: List[str]):
+    """
+    Delete memories/documents owned by user: one IN select per kind, ORM deletes (so
+the backend's cascades run) and one commit.
+    Vector deletes are queued in the outbox within the same transaction, so they are
+    retried until applied instead of leaving orphan vectors behind.
+    Returns (deleted_ids, {item_id: error}).
+    """
+    failed = {}
+    mem_ids, doc_ids = {}, {}
+    for item_id in item_ids:
+        try:
+            prefix, pk = _parse_item_id(item_id)
+        except ValueError as e:
+            failed[item_id] = str(e)
+            continue
+        (mem_ids if prefix == "mem" else doc_ids)[pk] = item_id
+
+    memories, documents = [], []
+    if mem_ids:
+        result = await db.execute(select(Memory).filter(Memory.id.in_(mem_ids), Memory.user_id == user.id))
+        memories = result.scalars().all()
+    if doc_ids:
+        # Eager load chunks because their embedding IDs are needed
+        result = await db.execute(
+            select(Document).options(selectinload(Document.chunks)).filter(Document.id.in_(doc_ids), Document.user_id == user.id)
+        )
+        documents = result.scalars().all()
+
+    found_mem = {m.id for m in memories}
+    found_doc = {d.id for d in documents}
+    for pk, item_id in mem_ids.items():
+        if pk not in found_mem:
+            failed[item_id] = "Memory not found."
+    for pk, item_id in doc_ids.items():
+        if pk not in found_doc:
+            failed[item_id] = "Document not found."
+
+    vector_ids = []
+    for document in documents:
+        vector_ids.extend(chunk.embedding_id for chunk in document.chunks if chunk.embedding_id)
+
+    await _ensure_mcp_tables()
+    # A memory's vectors are every chunk with its memory_id, not only embedding_id (chunk 0)
+    for m in memories:
+        await enqueue_purge(db, user.id, m.id, fallback_ids=[m.embedding_id] if m.embedding_id else [])
+    if vector_ids:
+        enqueue_delete(db, user.id, vector_ids)
+    await fulltext.remove_items(db, [mem_ids[m.id] for m in memories] + [doc_ids[d.id] for d in documents])
+    await dedup.remove(db, list(found_mem))
+    inbox_changed = inbox_feed.record(db, user.id, [m.id for m in memories if m.status == "pending"], "removed")
+    await tag_index.forget(db, user.id, list(found_mem))
+
+    # ORM deletes so relationship cascades (memory links, document chunks) run
+    for item in [*memories, *documents]:
+        await db.delete(item)
+    await db.commit()
+    if memories or documents:
+        bump_user_generation(user.id)
+    if vector_ids or memories:
+        outbox_worker.notify()
+    if inbox_changed:
+        inbox_notifier.notify()
+
+    deleted = [mem_ids[pk] for pk in found_mem] + [doc_ids[pk] for pk in found_doc]
+    return deleted, failed
+
 @mcp.tool()
+@metrics.instrument_tool
+@logs.with_request_id
+@scheduler.lane("light")
 async def delete_memory(memory_id: str, ctx: Context) -> str:
     """
     Delete a memory or document by ID from MemWyre.
@@ -485,97 +1390,116 @@ async def delete_memory(memory_id: str, ctx: Context) -> str:
             if not user:
                 return "Error: No user found."
 
-            if memory_id.startswith("doc_"):
-                # Handle Document Deletion
-                try:
-                    doc_id = int(memory_id.split("_")[1])
-                except ValueError:
-                    return "Error: Invalid ID format."
-
-                # Eager load chunks because they are accessed
-                result = await db.execute(
-                    select(Document).options(selectinload(Document.chunks)).filter(Document.id == doc_id, Document.user_id == user.id)
-                )
-                document = result.scalars().first()
+            deleted, failed = await _delete_items(db, user, [memory_id])
+            if memory_id in failed:
+                return f"Error: {failed[memory_id]}"
 
-                if not document:
-                    return "Error: Document not found."
-                
-                # Delete chunks from vector store
-                for chunk in document.chunks:
-                    if chunk.embedding_id:
-                        try:
-                            vector_store.delete(ids=[chunk.embedding_id])
-                        except:
-                            pass # Ignore vector store errors
-                
-                await db.delete(document)
-                await db.commit()
-                return f"Document {memory_id} deleted successfully."
-                
-            elif memory_id.startswith("mem_"):
-                # Handle Memory Deletion
-                try:
-                    mem_id = int(memory_id.split("_")[1])
-                except ValueError:
-                    return "Error: Invalid ID format."
-
-                result = await db.execute(select(Memory).filter(Memory.id == mem_id, Memory.user_id == user.id))
-                memory = result.scalars().first()
-                if not memory:
-                    return "Error: Memory not found."
-                
-                if memory.embedding_id:
-                    try:
-                        vector_store.delete(ids=[memory.embedding_id])
-                    except:
-                        pass
-                    
-                await db.delete(memory)
-                await db.commit()
-                return f"Memory {memory_id} deleted successfully."
-            
-            else:
-                return "Error: ID must start with 'mem_' or 'doc_'."
+            kind = "Document" if memory_id.startswith("doc_") else "Memory"
+            return f"{kind} {memory_id} deleted successfully."
         except Exception as e:
             return f"Error deleting item: {str(e)}"
 
 @mcp.tool()
-async def list_memories(ctx: Context, limit: int = 10, offset: int = 0) -> str:
+@metrics.instrument_tool
+@logs.with_request_id
+@scheduler.lane("ingestion")
+async def delete_memories(memory_ids: List[str], ctx: Context) -> str:
     """
-    List recent memories and documents in MemWyre.
+    Delete many memories and/or documents from MemWyre in one call.
     Args:
-        limit: Number of items to return (default 10).
-        offset: Pagination offset (default 0).
+        memory_ids: IDs of the items (e.g., ['mem_1', 'mem_2', 'doc_5']).
+    Lists the IDs that were deleted and, separately, the IDs that failed and why. Failed IDs are left intact and can be retried.
     """
+    if not memory_ids:
+        return "Error: No IDs provided."
+    if len(memory_ids) > MAX_BATCH_SIZE:
+        return f"Error: Too many IDs ({len(memory_ids)}). Maximum batch size is {MAX_BATCH_SIZE}."
+
+    async with AsyncSessionLocal() as db:
+        try:
+            user, _ = await get_current_user(db, ctx, required_scope="mcp:write")
+            if not user:
+                return "Error: No user found."
+
+            deleted, failed = await _delete_items(db, user, list(dict.fromkeys(memory_ids)))
+
+            lines = [f"Deleted {len(deleted)} of {len(deleted) + len(failed)} items."]
+            if deleted:
+                lines.append("Deleted: " + ", ".join(deleted))
+            if failed:
+                lines.append("Failed:")
+                lines.extend(f"- {item_id}: {error}" for item_id, error in failed.items())
+            return "\n".join(lines)
+        except Exception as e:
+            return f"Error deleting items: {str(e)}"
+
+@mcp.tool()
+@metrics.instrument_tool
+@logs.with_request_id
+@scheduler.lane("listing")
+async def list_memories(ctx: Context, limit: int = 10, cursor: Optional[str] = None) -> str:
+    """
+    List recent memories and documents in MemWyre, newest first, as a single timeline.
+    Args:
+        limit: Number of items to return (default 10, max 100).
+        cursor: Pass the 'Next cursor' value from a previous call to get the next page.
+    """
+    limit = max(1, min(limit, 100))
+    try:
+        after = decode_cursor(cursor)
+    except ValueError as e:
+        return f"Error: {str(e)}"
+
     async with AsyncSessionLocal() as db:
         try:
             user, _ = await get_current_user(db, ctx, required_scope="mcp:read")
             if not user:
                 return "Error: No user found."
-                
-            # Fetch Memories
+
+            # One time-ordered stream over both tables, paged by (created_at, kind, id).
+            # Each side is filtered and limited before the union so it can use its index.
+            def timeline(model, kind, file_type_col):
+                kind_col = literal(kind)
+                query = select(
+                    model.created_at.label("created_at"),
+                    kind_col.label("kind"),
+                    model.id.label("id"),
+                    model.title.label("title"),
+                    file_type_col.label("file_type"),
+                ).filter(model.user_id == user.id)
+                if after:
+                    query = query.filter(keyset_after([(model.created_at, after[0]), (kind_col, after[1]), (model.id, after[2])]))
+                query = query.order_by(model.created_at.desc(), model.id.desc()).limit(limit + 1)
+                return select(query.subquery())
+
+            stream = union_all(
+                timeline(Memory, "mem", cast(null(), String)),
+                timeline(Document, "doc", Document.file_type),
+            ).subquery()
             result = await db.execute(
-                select(Memory).filter(Memory.user_id == user.id).order_by(Memory.created_at.desc()).limit(limit).offset(offset)
-            )
-            memories = result.scalars().all()
-            
-            # Fetch Documents (simple logic, separate query for now)
-            result_docs = await db.execute(
-                select(Document).filter(Document.user_id == user.id).order_by(Document.created_at.desc()).limit(limit).offset(offset)
+                select(stream)
+                .order_by(stream.c.created_at.desc(), stream.c.kind.desc(), stream.c.id.desc())
+                .limit(limit + 1)
             )
-            documents = result_docs.scalars().all()
-            
+            rows = result.all()
+
+            has_more = len(rows) > limit
+            rows = rows[:limit]
+
             results = []
-            for mem in memories:
-                results.append(f"[Memory] ID: mem_{mem.id} | Title: {mem.title} | Created: {mem.created_at}")
-                
-            for doc in documents:
-                results.append(f"[Document] ID: doc_{doc.id} | Title: {doc.title} | Type: {doc.file_type} | Created: {doc.created_at}")
-                
+            for row in rows:
+                if row.kind == "mem":
+                    results.append(f"[Memory] ID: mem_{row.id} | Title: {row.title} | Created: {row.created_at}")
+                else:
+                    results.append(f"[Document] ID: doc_{row.id} | Title: {row.title} | Type: {row.file_type} | Created: {row.created_at}")
+
             if not results:
                 return "No memories found."
-                
+
+            if has_more:
+                last = rows[-1]
+                results.append(f"Next cursor: {encode_cursor([last.created_at, last.kind, last.id])}")
+
             return "\n".join(results)
         except Exception as e:
             return f"Error listing memories: {str(e)}"
@@ -588,29 +1512,145 @@ async def get_inbox_resource() -> str:
     """
     async with AsyncSessionLocal() as db:
         try:
-            user, _ = await get_current_user(db, None, required_scope="mcp:read")
+            user, _ = await get_current_user(db, _request_context(), required_scope="mcp:read")
             if not user:
                 return "Error: No user found."
                 
-            result = await db.execute(
-                select(Memory).filter(
-                    Memory.user_id == user.id,
-                    Memory.status == "pending"
-                ).order_by(Memory.created_at.desc())
-            )
-            memories = result.scalars().all()
+            memories = await _list_inbox(db, user.id, preview_len=100)
             
             if not memories:
                 return "Inbox is empty."
                 
             results = ["# MemWyre Inbox"]
             for mem in memories:
-                results.append(f"- [ID: mem_{mem.id}] ({mem.source_llm}): {mem.content[:100]}...")
+                results.append(f"- [ID: mem_{mem.id}] ({mem.source_llm}): {mem.preview or ''}...")
                 
             return "\n".join(results)
         except Exception as e:
             return f"Error reading inbox resource: {str(e)}"
 
+# --- INBOX SUBSCRIPTIONS ---
+# Clients subscribe to brain://inbox and get resources/updated only when their own
+# inbox changes; get_inbox_changes then returns just the deltas.
+def _request_context() -> Optional[Context]:
+    """Context of the MCP request being handled (None outside one, e.g. stdio tests)."""
+    try:
+        return mcp.get_context()
+    except Exception:
+        return None
+
+_lowlevel_server = mcp._mcp_server
+
+def initialization_options():
+    """
+    The server's initialization options with resources.subscribe advertised. MCP SDK 1.x
+    reports subscribe=False even with a handler registered (2.x derives it from the
+    handler), so the stdio entry point passes these to Server.run itself. The streamable
+    HTTP app builds its options inside the SDK and advertises subscribe only on SDK 2.x;
+    HTTP clients on 1.x can still subscribe, or poll get_inbox_changes.
+    """
+    options = _lowlevel_server.create_initialization_options()
+    if options.capabilities.resources is not None:
+        options.capabilities.resources.subscribe = True
+    return options
+
+async def run_stdio():
+    from mcp.server.stdio import stdio_server
+
+    async with stdio_server() as (read_stream, write_stream):
+        await _lowlevel_server.run(read_stream, write_stream, initialization_options())
+
+@_lowlevel_server.subscribe_resource()
+async def subscribe_resource(uri) -> None:
+    if str(uri) != inbox_feed.INBOX_URI:
+        return
+    async with AsyncSessionLocal() as db:
+        user, _ = await get_current_user(db, _request_context(), required_scope="mcp:read")
+    if user:
+        await _ensure_mcp_tables()
+        inbox_notifier.subscribe(user.id, _lowlevel_server.request_context.session)
+
+@_lowlevel_server.unsubscribe_resource()
+async def unsubscribe_resource(uri) -> None:
+    if str(uri) == inbox_feed.INBOX_URI:
+        inbox_notifier.unsubscribe(_lowlevel_server.request_context.session)
+
+INBOX_FEED_OPS = {"added": "+", "updated": "~", "removed": "-"}
+
+@mcp.tool()
+@metrics.instrument_tool
+@logs.with_request_id
+@scheduler.lane("light")
+async def get_inbox_changes(ctx: Context, cursor: Optional[str] = None, limit: int = 100) -> str:
+    """
+    Incremental view of the MemWyre Inbox. Call without a cursor to get the current inbox and a cursor; afterwards pass the latest cursor to get only what changed since (+ added, ~ edited, - removed from the inbox).
+    Changes made through this server are tracked; memories approved or discarded in the MemWyre web app are only dropped on a resync (call without a cursor).
+    Args:
+        cursor: The 'Cursor' value from the previous call (optional).
+        limit: Maximum number of changes to return (default 100, max 500).
+    """
+    limit = max(1, min(limit, 500))
+    try:
+        position = decode_cursor(cursor)
+    except ValueError as e:
+        return f"Error: {str(e)}"
+
+    async with AsyncSessionLocal() as db:
+        try:
+            user, _ = await get_current_user(db, ctx, required_scope="mcp:read")
+            if not user:
+                return "Error: No user found."
+
+            await _ensure_mcp_tables()
+            now = datetime.utcnow()
+            if not position:
+                # Snapshot: the cursor is taken first, so changes committed meanwhile are
+                # replayed on the next call (harmless: the last op per memory wins)
+                after_id = await inbox_feed.head(db, inbox_notifier.settle)
+                memories = await _list_inbox(db, user.id, preview_len=100)
+                lines = [f"+ mem_{mem.id} ({mem.source_llm}): {mem.preview or ''}..." for mem in memories] or ["Inbox is empty."]
+                lines.append(f"Cursor: {encode_cursor([after_id, now])}")
+                return "\n".join(lines)
+
+            after_id, issued_at = position
+            if issued_at < now - inbox_notifier.retention:
+                return "Error: Cursor expired. Call get_inbox_changes without a cursor to resync."
+
+            changes, upto = await inbox_feed.changes_since(db, user.id, after_id, limit=limit + 1, settle=inbox_notifier.settle)
+            has_more = len(changes) > limit
+            changes = changes[:limit]
+            if not changes:
+                return f"No inbox changes.\nCursor: {encode_cursor([upto, now])}"
+
+            # Last change per memory wins; show current text for memories still in the inbox
+            latest = {}
+            for change in changes:
+                latest.pop(change.memory_id, None)
+                latest[change.memory_id] = change.op
+            pending_ids = [mid for mid, op in latest.items() if op != "removed"]
+            previews = {}
+            if pending_ids:
+                result = await db.execute(
+                    select(Memory.id, Memory.source_llm, content_preview(100)).filter(
+                        Memory.id.in_(pending_ids), Memory.user_id == user.id, Memory.status == "pending"
+                    )
+                )
+                previews = {row.id: row for row in result.all()}
+
+            lines = []
+            for memory_id, op in latest.items():
+                row = previews.get(memory_id)
+                if op == "removed" or row is None:
+                    lines.append(f"- mem_{memory_id}")
+                else:
+                    lines.append(f"{INBOX_FEED_OPS[op]} mem_{memory_id} ({row.source_llm}): {row.preview or ''}...")
+            if has_more:
+                lines.append("More changes pending: call again with the new cursor.")
+            lines.append(f"Cursor: {encode_cursor([changes[-1].id if has_more else upto, now])}")
+            return "\n".join(lines)
+        except Exception as e:
+            return f"Error getting inbox changes: {str(e)}"
+
 # --- PROMPTS ---
 @mcp.prompt()
 def daily_briefing() -> str:
@@ -627,85 +1667,193 @@ def project_context(project_name: str) -> str:
     return f"Please search MemWyre for all information related to '{project_name}'. Summarize the key points, technical decisions, and current status."
 
 @mcp.tool()
-async def search_by_date(start_date: str, ctx: Context, end_date: Optional[str] = None) -> str:
+@metrics.instrument_tool
+@logs.with_request_id
+@scheduler.lane("listing")
+async def search_by_date(start_date: str, ctx: Context, end_date: Optional[str] = None,
+                         limit: int = 50, cursor: Optional[str] = None, aggregate: Optional[str] = None) -> str:
     """
-    Find memories in MemWyre created within a specific date range.
+    Find memories in MemWyre created within a specific date range, oldest first.
+    For long ranges, call with aggregate="week" (or "day") first to see when activity happened and which tags dominate, then fetch a narrower range.
     Args:
         start_date: Start date in YYYY-MM-DD format.
         end_date: End date in YYYY-MM-DD format (optional, defaults to end of start_date).
+        limit: Memories per page (default 50, max 200).
+        cursor: Pass the 'Next cursor' value from a previous call to get the next page.
+        aggregate: "day" or "week" to return memory counts per period and the top tags instead of memories.
     """
+    limit = max(1, min(limit, 200))
+    if aggregate and aggregate not in daterange.BUCKETS:
+        return f"Error: aggregate must be one of {', '.join(daterange.BUCKETS)}."
+    try:
+        start, end = daterange.parse_range(start_date, end_date)
+        after = decode_cursor(cursor)
+    except ValueError as e:
+        return f"Error: {str(e)}"
+    label = f"{start_date} and {end_date or start_date}"
+
     async with AsyncSessionLocal() as db:
         try:
             user, _ = await get_current_user(db, ctx, required_scope="mcp:read")
             if not user:
                 return "Error: No user found."
-                
-            from datetime import datetime, timedelta
-            
-            try:
-                start = datetime.strptime(start_date, "%Y-%m-%d")
-                if end_date:
-                    end = datetime.strptime(end_date, "%Y-%m-%d") + timedelta(days=1) # Inclusive of end date
-                else:
-                    end = start + timedelta(days=1)
-            except ValueError:
-                return "Error: Invalid date format. Use YYYY-MM-DD."
-                
-            result = await db.execute(
-                select(Memory).filter(
-                    Memory.user_id == user.id,
-                    Memory.created_at >= start,
-                    Memory.created_at < end
-                ).order_by(Memory.created_at.asc())
+
+            await _ensure_mcp_tables()
+            if aggregate:
+                # GROUP BY day on the (user_id, created_at) index; weeks are rolled up from days
+                days = await daterange.day_counts(db, Memory, user.id, start, end)
+                if not days:
+                    return f"No memories found between {label}."
+                periods = days if aggregate == "day" else daterange.week_counts(days)
+                tags = await daterange.top_tags(db, Memory, user.id, start, end)
+                lines = [f"{sum(n for _, n in days)} memories between {label}, per {aggregate}:"]
+                lines.extend(f"{'Week of ' if aggregate == 'week' else ''}{period.isoformat()}: {n}" for period, n in periods)
+                if tags:
+                    lines.append("Top tags: " + ", ".join(f"#{tag} ({n})" for tag, n in tags))
+                return "\n".join(lines)
+
+            query = select(Memory.id, Memory.created_at, Memory.title, content_preview(200)).filter(
+                Memory.user_id == user.id,
+                Memory.created_at >= start,
+                Memory.created_at < end
             )
-            memories = result.scalars().all()
-            
+            if after:
+                query = query.filter(keyset_after([(Memory.created_at, after[0]), (Memory.id, after[1])], descending=False))
+            result = await db.execute(query.order_by(Memory.created_at.asc(), Memory.id.asc()).limit(limit + 1))
+            memories = result.all()
+
             if not memories:
-                return f"No memories found between {start_date} and {end_date or start_date}."
-                
+                return f"No memories found between {label}."
+
+            has_more = len(memories) > limit
+            memories = memories[:limit]
             results = []
             for mem in memories:
-                results.append(f"[{mem.created_at.strftime('%Y-%m-%d %H:%M')}] {mem.title}: {mem.content[:200]}...")
-                
+                results.append(f"[{mem.created_at.strftime('%Y-%m-%d %H:%M')}] mem_{mem.id} | {mem.title}: {mem.preview or ''}...")
+            if has_more:
+                last = memories[-1]
+                results.append(f"Next cursor: {encode_cursor([last.created_at, last.id])}")
+
             return "\n".join(results)
         except Exception as e:
             return f"Error searching by date: {str(e)}"
 
 @mcp.tool()
-async def get_all_tags(ctx: Context) -> str:
+@metrics.instrument_tool
+@logs.with_request_id
+@scheduler.lane("listing")
+async def get_all_tags(ctx: Context, prefix: Optional[str] = None, limit: int = 500, refresh: bool = False) -> str:
     """
-    Get a list of all tags currently used in MemWyre. 
+    Get a list of all tags currently used in MemWyre, with how many memories use each.
     Use this to understand the taxonomy of the user's knowledge.
+    Args:
+        prefix: Only return tags starting with this text (optional).
+        limit: Maximum number of tags to return (default 500).
+        refresh: Recount tags from scratch instead of syncing recent changes.
     """
     async with AsyncSessionLocal() as db:
         try:
             user, _ = await get_current_user(db, ctx, required_scope="mcp:read")
             if not user:
                 return "Error: No user found."
-            
-            # Inefficient but valid for MVP: Fetch all and aggregate
-            result = await db.execute(select(Memory).filter(Memory.user_id == user.id))
-            memories = result.scalars().all()
-            
-            all_tags = set()
-            for mem in memories:
-                if mem.tags:
-                    try:
-                        # mem.tags might be a list or a string repr of list depending on SQLite/JSON handling
-                        tags_list = mem.tags if isinstance(mem.tags, list) else eval(mem.tags)
-                        for tag in tags_list:
-                            all_tags.add(tag)
-                    except:
-                        pass
-                        
-            sorted_tags = sorted(list(all_tags))
-            
-            if not sorted_tags:
-                return "No tags found."
-                
-            return "Current Tags:\n" + ", ".join([f"#{t}" for t in sorted_tags])
+
+            # Served from the maintained tag index: O(tags), not O(memories); sync picks
+            # up memories created, retagged or deleted outside MCP since the last call
+            await _ensure_mcp_tables()
+            if refresh:
+                await tag_index.rebuild(db, user.id, Memory)
+            else:
+                await tag_index.sync(db, user.id, Memory)
+            tags = await tag_index.list_tags(db, user.id, prefix=prefix, limit=limit)
+
+            if not tags:
+                return f"No tags found starting with '{prefix}'." if prefix else "No tags found."
+
+            return "Current Tags:\n" + ", ".join([f"#{tag} ({count})" for tag, count, _ in tags])
         except Exception as e:
             return f"Error getting tags: {str(e)}"
 
+# --- SERVER STATS ---
+def get_server_stats() -> dict:
+    """In-process counters for caches and queues (served at /stats in HTTP mode)."""
+    return {
+        "startup_timings": startup_timings,
+        "identity_cache": identity_cache.stats(),
+        "logging": logs.stats(),
+        "retrieval_executor": retrieval_executor.stats(),
+        "retrieval_cache": retrieval_cache.stats(),
+        "retrieval_singleflight": retrieval_flights.stats(),
+        "ingestion_executor": ingestion_executor.stats(),
+        "outbox": outbox_worker.stats(),
+        "fulltext_backfill": fulltext_backfill.stats(),
+        "embedding_cache": embeddings.stats(),
+        "embedding_backend": embedding_backends.stats(),
+        "dedup": dedup.stats(),
+        "scheduler": scheduler.stats(),
+        "inbox_feed": inbox_notifier.stats(),
+    }
+
+from starlette.requests import Request
+from starlette.responses import JSONResponse, PlainTextResponse
+import hmac
+
+# /stats, /metrics and /admin/* expose per-user counters and internals. With BRAIN_VAULT_ADMIN_TOKEN
+# set they require "Authorization: Bearer <token>"; without it only direct loopback clients
+# are served (a request carrying proxy forwarding headers is not treated as local).
+ADMIN_TOKEN = os.environ.get("BRAIN_VAULT_ADMIN_TOKEN", "")
+_LOOPBACK_HOSTS = {"127.0.0.1", "::1", "localhost"}
+_FORWARDING_HEADERS = ("forwarded", "x-forwarded-for", "x-real-ip")
+
+def _admin_allowed(request: Request) -> bool:
+    if ADMIN_TOKEN:
+        scheme, _, token = request.headers.get("authorization", "").partition(" ")
+        return scheme.lower() == "bearer" and hmac.compare_digest(token.strip().encode(), ADMIN_TOKEN.encode())
+    if any(h in request.headers for h in _FORWARDING_HEADERS):
+        return False
+    return request.client is not None and request.client.host in _LOOPBACK_HOSTS
+
+def _admin_route(path: str, methods=("GET",)):
+    def decorator(fn):
+        async def route(request: Request):
+            if not _admin_allowed(request):
+                return PlainTextResponse("Forbidden", status_code=403)
+            return await fn(request)
+        route.__name__ = fn.__name__
+        return mcp.custom_route(path, methods=list(methods))(route)
+    return decorator
+
+@_admin_route("/stats")
+async def stats_route(request: Request) -> JSONResponse:
+    return JSONResponse(get_server_stats())
+
+@_admin_route("/metrics")
+async def metrics_route(request: Request) -> PlainTextResponse:
+    return PlainTextResponse(
+        metrics.render(extra_gauges=get_server_stats()),
+        media_type="text/plain; version=0.0.4",
+    )
+
+@_admin_route("/admin/invalidate-identity", methods=("POST",))
+async def invalidate_identity_route(request: Request) -> JSONResponse:
+    """
+    Called by the web app when a key is revoked, rotated or re-scoped: {"key_hash": ...}
+    and/or {"user_id": ...}. Only reaches the worker that serves it; other workers pick
+    the change up within AUTH_KEY_RECHECK seconds.
+    """
+    try:
+        body = await request.json()
+        key_hash = body.get("key_hash")
+        user_id = int(body["user_id"]) if body.get("user_id") is not None else None
+    except (ValueError, TypeError, AttributeError):
+        return JSONResponse({"error": "Expected a JSON object with key_hash and/or user_id"}, status_code=400)
+    if not key_hash and user_id is None:
+        return JSONResponse({"error": "Expected a JSON object with key_hash and/or user_id"}, status_code=400)
+    if key_hash:
+        invalidate_api_key(str(key_hash))
+    if user_id is not None:
+        invalidate_user(user_id)
+    return JSONResponse({"ok": True})
+
 if __name__ == "__main__":
-    mcp.run()
+    # Same as mcp.run() (stdio), with the subscribe capability declared
+    asyncio.run(run_stdio())
@@ -0,0 +1,160 @@
+"""
+In-process latency/error metrics for MCP tools, rendered in the Prometheus text
+exposition format (no client library or external service needed).
+
+Each tool call gets a per-call phase accumulator (via a contextvar). Code inside a
+tool wraps work in `with phase("sql")` etc.; phases don't nest (time spent in an
+inner phase is attributed to the outermost one), and whatever time is left over
+when the tool returns is recorded as the "format" phase.
+"""
+import contextlib
+import contextvars
+import functools
+import threading
+import time
+from typing import Dict, Iterable, Optional, Tuple
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = ()):
+        self.name, self.help, self.labelnames = name, help, labelnames
+        self._values: Dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = tuple(labels.get(n, "") for n in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        for key, value in sorted(self._values.items()):
+            yield f"{self.name}{_labels(self.labelnames, key)} {value}"
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name, self.help, self.labelnames, self.buckets = name, help, labelnames, buckets
+        # key -> [bucket counts..., sum, count]
+        self._values: Dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(labels.get(n, "") for n in self.labelnames)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[i] += 1
+            entry[-2] += value
+            entry[-1] += 1
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        for key, entry in sorted(self._values.items()):
+            for i, bound in enumerate(self.buckets):
+                yield f"{self.name}_bucket{_labels(self.labelnames + ('le',), key + (repr(bound),))} {entry[i]}"
+            yield f"{self.name}_bucket{_labels(self.labelnames + ('le',), key + ('+Inf',))} {entry[-1]}"
+            yield f"{self.name}_sum{_labels(self.labelnames, key)} {entry[-2]}"
+            yield f"{self.name}_count{_labels(self.labelnames, key)} {entry[-1]}"
+
+
+def _labels(names: Tuple[str, ...], values: tuple) -> str:
+    if not names:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for v in values)
+    return "{" + ",".join(f'{n}="{v}"' for n, v in zip(names, escaped)) + "}"
+
+
+tool_duration = Histogram("mcp_tool_duration_seconds", "End-to-end MCP tool latency.", ("tool",))
+phase_duration = Histogram("mcp_tool_phase_duration_seconds", "MCP tool latency by phase.", ("tool", "phase"))
+tool_calls = Counter("mcp_tool_calls_total", "MCP tool calls by outcome.", ("tool", "status"))
+
+_REGISTRY = [tool_duration, phase_duration, tool_calls]
+
+
+class _CallTimer:
+    __slots__ = ("tool", "phases", "active")
+
+    def __init__(self, tool: str):
+        self.tool = tool
+        self.phases: Dict[str, float] = {}
+        self.active = False
+
+
+_current_call: contextvars.ContextVar[Optional[_CallTimer]] = contextvars.ContextVar("mcp_current_call", default=None)
+
+
+@contextlib.contextmanager
+def phase(name: str):
+    """Attribute the enclosed time to `name` for the current tool call (no-op outside one)."""
+    call = _current_call.get()
+    if call is None or call.active:
+        yield
+        return
+    call.active = True
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        call.phases[name] = call.phases.get(name, 0.0) + time.perf_counter() - started
+        call.active = False
+
+
+def instrument_tool(fn):
+    """Record latency, per-phase breakdown and error count for an async tool."""
+    tool = fn.__name__
+
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        call = _CallTimer(tool)
+        token = _current_call.set(call)
+        started = time.perf_counter()
+        status = "error"
+        try:
+            result = await fn(*args, **kwargs)
+            # Tools report failures as "Error..." strings rather than raising
+            if not (isinstance(result, str) and result.startswith("Error")):
+                status = "ok"
+            return result
+        finally:
+            _current_call.reset(token)
+            total = time.perf_counter() - started
+            tool_duration.observe(total, tool=tool)
+            tool_calls.inc(tool=tool, status=status)
+            for name, seconds in call.phases.items():
+                phase_duration.observe(seconds, tool=tool, phase=name)
+            phase_duration.observe(max(total - sum(call.phases.values()), 0.0), tool=tool, phase="format")
+
+    return wrapper
+
+
+def _flatten(prefix: str, value, out: list):
+    if isinstance(value, dict):
+        for k, v in value.items():
+            _flatten(f"{prefix}_{k}".replace(".", "_"), v, out)
+    elif isinstance(value, (int, float)) and not isinstance(value, bool):
+        out.append((prefix, value))
+    elif isinstance(value, bool):
+        out.append((prefix, int(value)))
+
+
+def render(extra_gauges: Optional[dict] = None) -> str:
+    """Prometheus text format for all tool metrics plus numeric values of extra_gauges."""
+    lines = []
+    for metric in _REGISTRY:
+        lines.extend(metric.render())
+    if extra_gauges:
+        flat = []
+        _flatten("mcp", extra_gauges, flat)
+        for name, value in flat:
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {value}")
+    return "\n".join(lines) + "\n"
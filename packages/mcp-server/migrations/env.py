@@ -0,0 +1,43 @@
+"""
+Alembic environment for the MCP server's own tables.
+
+This chain is separate from the backend's: its revisions live in migrations/versions/
+and are tracked in mcp_alembic_version, so the two histories can share a database
+without touching each other's head. By default it migrates the backend's database
+(app.db.session); schema.upgrade() passes a connection in instead.
+"""
+import asyncio
+from logging.config import fileConfig
+
+from alembic import context
+
+from schema import VERSION_TABLE
+
+config = context.config
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name)
+
+
+def run_migrations(connection) -> None:
+    context.configure(connection=connection, version_table=VERSION_TABLE, render_as_batch=True)
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+async def run_async_migrations() -> None:
+    from app.db.session import AsyncSessionLocal
+
+    engine = AsyncSessionLocal.kw["bind"]
+    async with engine.connect() as connection:
+        await connection.run_sync(run_migrations)
+        await connection.commit()
+
+
+if context.is_offline_mode():
+    raise SystemExit("Offline (--sql) mode is not supported for the MCP migrations")
+
+connection = config.attributes.get("connection")
+if connection is not None:
+    run_migrations(connection)
+else:
+    asyncio.run(run_async_migrations())
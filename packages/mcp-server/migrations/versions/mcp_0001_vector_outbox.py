@@ -0,0 +1,40 @@
+"""
+Vector outbox (mcp_vector_outbox).
+
+Databases where an earlier server version created the table at runtime already have
+it; it is left as it is.
+
+Revision ID: mcp_0001
+Revises:
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "mcp_0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    if sa.inspect(op.get_bind()).has_table("mcp_vector_outbox"):
+        return
+    op.create_table(
+        "mcp_vector_outbox",
+        sa.Column("id", sa.Integer, primary_key=True, autoincrement=True),
+        sa.Column("op", sa.String(16), nullable=False),
+        sa.Column("user_id", sa.Integer, nullable=True),
+        sa.Column("vector_id", sa.String(255), nullable=False),
+        sa.Column("document", sa.Text, nullable=True),
+        sa.Column("meta", sa.JSON, nullable=True),
+        sa.Column("attempts", sa.Integer, nullable=False),
+        sa.Column("next_attempt_at", sa.DateTime, nullable=False),
+        sa.Column("last_error", sa.Text, nullable=True),
+        sa.Column("created_at", sa.DateTime, nullable=False),
+    )
+    op.create_index("ix_mcp_vector_outbox_vector_id", "mcp_vector_outbox", ["vector_id"])
+    op.create_index("ix_mcp_vector_outbox_next_attempt_at", "mcp_vector_outbox", ["next_attempt_at"])
+
+
+def downgrade() -> None:
+    op.drop_table("mcp_vector_outbox")
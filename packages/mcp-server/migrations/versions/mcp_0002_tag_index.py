@@ -0,0 +1,52 @@
+"""
+Tag index (mcp_tag_index, mcp_tag_index_state) and per-memory tag snapshots
+(mcp_memory_tags).
+
+Tables an earlier server version created at runtime are kept; the state table gains
+synced_at if it predates incremental sync.
+
+Revision ID: mcp_0002
+Revises: mcp_0001
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "mcp_0002"
+down_revision = "mcp_0001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table("mcp_tag_index"):
+        op.create_table(
+            "mcp_tag_index",
+            sa.Column("user_id", sa.Integer, primary_key=True),
+            sa.Column("tag", sa.String(255), primary_key=True),
+            sa.Column("count", sa.Integer, nullable=False),
+            sa.Column("last_used_at", sa.DateTime, nullable=True),
+        )
+    if not inspector.has_table("mcp_tag_index_state"):
+        op.create_table(
+            "mcp_tag_index_state",
+            sa.Column("user_id", sa.Integer, primary_key=True),
+            sa.Column("built_at", sa.DateTime, nullable=False),
+            sa.Column("synced_at", sa.DateTime, nullable=True),
+        )
+    elif "synced_at" not in {c["name"] for c in inspector.get_columns("mcp_tag_index_state")}:
+        op.add_column("mcp_tag_index_state", sa.Column("synced_at", sa.DateTime, nullable=True))
+    if not inspector.has_table("mcp_memory_tags"):
+        op.create_table(
+            "mcp_memory_tags",
+            sa.Column("memory_id", sa.Integer, primary_key=True),
+            sa.Column("user_id", sa.Integer, nullable=False),
+            sa.Column("tags", sa.Text, nullable=False),
+        )
+        op.create_index("ix_mcp_memory_tags_user_id", "mcp_memory_tags", ["user_id"])
+
+
+def downgrade() -> None:
+    op.drop_table("mcp_memory_tags")
+    op.drop_table("mcp_tag_index_state")
+    op.drop_table("mcp_tag_index")
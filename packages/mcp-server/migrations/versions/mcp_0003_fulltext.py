@@ -0,0 +1,81 @@
+"""
+Full-text keyword index: mcp_fts_state, and mcp_fts_docs with an FTS5 external-content
+table and sync triggers (SQLite) or a generated tsvector column and GIN index
+(Postgres). Other dialects, and SQLite builds without FTS5, get no index; the server
+then searches by vector only.
+
+Every statement is IF NOT EXISTS, so databases where an earlier server version
+created these objects at runtime are left as they are.
+
+Revision ID: mcp_0003
+Revises: mcp_0002
+"""
+import logging
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "mcp_0003"
+down_revision = "mcp_0002"
+branch_labels = None
+depends_on = None
+
+logger = logging.getLogger("alembic.runtime.migration")
+
+SQLITE_DDL = [
+    """CREATE TABLE IF NOT EXISTS mcp_fts_docs (
+        id INTEGER PRIMARY KEY, item_id TEXT NOT NULL, user_id INTEGER NOT NULL,
+        part INTEGER NOT NULL DEFAULT 0, title TEXT, body TEXT)""",
+    "CREATE INDEX IF NOT EXISTS ix_mcp_fts_docs_item ON mcp_fts_docs(item_id)",
+    "CREATE INDEX IF NOT EXISTS ix_mcp_fts_docs_user ON mcp_fts_docs(user_id)",
+    # '_' kept inside tokens so identifiers like get_all_tags match as one term
+    """CREATE VIRTUAL TABLE IF NOT EXISTS mcp_fts USING fts5(
+        title, body, content='mcp_fts_docs', content_rowid='id', tokenize="unicode61 tokenchars '_'")""",
+    """CREATE TRIGGER IF NOT EXISTS mcp_fts_ai AFTER INSERT ON mcp_fts_docs BEGIN
+        INSERT INTO mcp_fts(rowid, title, body) VALUES (new.id, new.title, new.body); END""",
+    """CREATE TRIGGER IF NOT EXISTS mcp_fts_ad AFTER DELETE ON mcp_fts_docs BEGIN
+        INSERT INTO mcp_fts(mcp_fts, rowid, title, body) VALUES ('delete', old.id, old.title, old.body); END""",
+]
+
+POSTGRES_DDL = [
+    """CREATE TABLE IF NOT EXISTS mcp_fts_docs (
+        id BIGSERIAL PRIMARY KEY, item_id TEXT NOT NULL, user_id INTEGER NOT NULL,
+        part INTEGER NOT NULL DEFAULT 0, title TEXT, body TEXT,
+        tsv tsvector GENERATED ALWAYS AS (to_tsvector('simple', coalesce(title, '') || ' ' || coalesce(body, ''))) STORED)""",
+    "CREATE INDEX IF NOT EXISTS ix_mcp_fts_docs_item ON mcp_fts_docs(item_id)",
+    "CREATE INDEX IF NOT EXISTS ix_mcp_fts_docs_user ON mcp_fts_docs(user_id)",
+    "CREATE INDEX IF NOT EXISTS ix_mcp_fts_docs_tsv ON mcp_fts_docs USING GIN(tsv)",
+]
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    if not sa.inspect(bind).has_table("mcp_fts_state"):
+        op.create_table(
+            "mcp_fts_state",
+            sa.Column("user_id", sa.Integer, primary_key=True),
+            sa.Column("synced_at", sa.DateTime, nullable=False),
+        )
+
+    dialect = bind.dialect.name
+    if dialect == "postgresql":
+        for statement in POSTGRES_DDL:
+            op.execute(statement)
+    elif dialect == "sqlite":
+        fts5 = bind.exec_driver_sql("SELECT sqlite_compileoption_used('ENABLE_FTS5')").scalar()
+        if not fts5:
+            logger.warning("SQLite was built without FTS5: skipping the full-text index")
+            return
+        for statement in SQLITE_DDL:
+            op.execute(statement)
+    else:
+        logger.warning(f"No full-text index for the {dialect} dialect")
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name == "sqlite":
+        op.execute("DROP TRIGGER IF EXISTS mcp_fts_ad")
+        op.execute("DROP TRIGGER IF EXISTS mcp_fts_ai")
+        op.execute("DROP TABLE IF EXISTS mcp_fts")
+    op.execute("DROP TABLE IF EXISTS mcp_fts_docs")
+    op.drop_table("mcp_fts_state")
@@ -0,0 +1,47 @@
+"""
+Near-duplicate signatures (mcp_memory_signatures, mcp_memory_signature_state).
+
+Tables an earlier server version created at runtime are kept; the state table gains
+synced_at if it predates incremental sync.
+
+Revision ID: mcp_0004
+Revises: mcp_0003
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "mcp_0004"
+down_revision = "mcp_0003"
+branch_labels = None
+depends_on = None
+
+BANDS = ("band0", "band1", "band2", "band3")
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table("mcp_memory_signatures"):
+        op.create_table(
+            "mcp_memory_signatures",
+            sa.Column("memory_id", sa.Integer, primary_key=True),
+            sa.Column("user_id", sa.Integer, nullable=False),
+            sa.Column("simhash", sa.BigInteger, nullable=False),
+            sa.Column("shingles", sa.Integer, nullable=False),
+            *(sa.Column(band, sa.Integer, nullable=False) for band in BANDS),
+        )
+        for column in ("user_id", *BANDS):
+            op.create_index(f"ix_mcp_memory_signatures_{column}", "mcp_memory_signatures", [column])
+    if not inspector.has_table("mcp_memory_signature_state"):
+        op.create_table(
+            "mcp_memory_signature_state",
+            sa.Column("user_id", sa.Integer, primary_key=True),
+            sa.Column("built_at", sa.DateTime, nullable=False),
+            sa.Column("synced_at", sa.DateTime, nullable=True),
+        )
+    elif "synced_at" not in {c["name"] for c in inspector.get_columns("mcp_memory_signature_state")}:
+        op.add_column("mcp_memory_signature_state", sa.Column("synced_at", sa.DateTime, nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_table("mcp_memory_signature_state")
+    op.drop_table("mcp_memory_signatures")
@@ -0,0 +1,35 @@
+"""
+Inbox change feed (mcp_inbox_changes).
+
+Databases where an earlier server version created the table at runtime already have
+it; it is left as it is.
+
+Revision ID: mcp_0005
+Revises: mcp_0004
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "mcp_0005"
+down_revision = "mcp_0004"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    if sa.inspect(op.get_bind()).has_table("mcp_inbox_changes"):
+        return
+    op.create_table(
+        "mcp_inbox_changes",
+        sa.Column("id", sa.Integer, primary_key=True, autoincrement=True),
+        sa.Column("user_id", sa.Integer, nullable=False),
+        sa.Column("memory_id", sa.Integer, nullable=False),
+        sa.Column("op", sa.String(16), nullable=False),
+        sa.Column("created_at", sa.DateTime, nullable=False),
+    )
+    op.create_index("ix_mcp_inbox_changes_user_id", "mcp_inbox_changes", ["user_id"])
+    op.create_index("ix_mcp_inbox_changes_created_at", "mcp_inbox_changes", ["created_at"])
+
+
+def downgrade() -> None:
+    op.drop_table("mcp_inbox_changes")
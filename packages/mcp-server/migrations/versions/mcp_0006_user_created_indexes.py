@@ -0,0 +1,34 @@
+"""
+(user_id, created_at) indexes on the backend's memories and documents tables, for the
+MCP server's time-range queries (search_by_date, date filters, keyset pages).
+
+The tables belong to the backend, so its migrations must have run first. The index
+names match the ones earlier MCP server versions created at runtime, so databases
+that already have them are left as they are.
+
+Revision ID: mcp_0006
+Revises: mcp_0005
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "mcp_0006"
+down_revision = "mcp_0005"
+branch_labels = None
+depends_on = None
+
+TABLES = ("memories", "documents")
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    missing = [table for table in TABLES if not inspector.has_table(table)]
+    if missing:
+        raise RuntimeError(f"Backend tables {', '.join(missing)} not found: run the backend's migrations first")
+    for table in TABLES:
+        op.create_index(f"ix_mcp_{table}_user_created", table, ["user_id", "created_at"], if_not_exists=True)
+
+
+def downgrade() -> None:
+    for table in TABLES:
+        op.drop_index(f"ix_mcp_{table}_user_created", table_name=table, if_exists=True)
@@ -0,0 +1,264 @@
+"""
+Transactional outbox for vector-store mutations.
+
+Write tools add VectorOutbox rows in the same transaction as the SQL change, so the
+intent to add/delete vectors is durable the moment the commit returns. OutboxWorker
+drains the table in batches in the background: repeated operations on the same
+vector ID are coalesced (last one wins), adds and deletes are grouped into one call
+each, and failed batches are retried with exponential backoff.
+
+A "purge" op deletes every vector whose memory_id metadata matches, whatever its ID
+(legacy memories were indexed under IDs the server can't recompute); it is queued
+when a memory is deleted. Edits instead diff against stored_vectors(), the memory's
+vectors as the store has them with not-yet-applied ops laid over them.
+"""
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, List, Optional
+
+from sqlalchemy import Column, DateTime, Integer, JSON, String, Text, delete, func
+from sqlalchemy.future import select
+
+from schema import McpBase, SchemaNotReady, ensure_schema
+
+logger = logging.getLogger("mcp_server.outbox")
+
+
+def shared_collection(vector_store):
+    """The backend store's underlying collection, if it exposes one (for metadata lookups)."""
+    for attr in ("collection", "_collection"):
+        collection = getattr(vector_store, attr, None)
+        if collection is not None and hasattr(collection, "get"):
+            return collection
+    return None
+
+
+class VectorOutbox(McpBase):
+    __tablename__ = "mcp_vector_outbox"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    op = Column(String(16), nullable=False)  # "add" | "delete" | "purge"
+    user_id = Column(Integer, nullable=True)
+    vector_id = Column(String(255), nullable=False, index=True)
+    document = Column(Text, nullable=True)
+    meta = Column(JSON, nullable=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime, nullable=False, default=datetime.utcnow, index=True)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+
+def enqueue_add(db, user_id: int, ids: List[str], documents: List[str], metadatas: List[dict]) -> None:
+    for vector_id, document, meta in zip(ids, documents, metadatas):
+        db.add(VectorOutbox(op="add", user_id=user_id, vector_id=vector_id, document=document, meta=meta))
+
+
+def enqueue_delete(db, user_id: int, ids: List[str]) -> None:
+    for vector_id in ids:
+        db.add(VectorOutbox(op="delete", user_id=user_id, vector_id=vector_id))
+
+
+def _pending_for_memory(memory_id: int):
+    return VectorOutbox.vector_id.like(f"mem\\_{memory_id}\\_%", escape="\\")
+
+
+async def enqueue_purge(db, user_id: int, memory_id: int, fallback_ids: List[str] = ()) -> None:
+    """
+    Queue deletion of every vector of a deleted memory (by memory_id metadata).
+    fallback_ids are deleted instead if the store can't be searched by metadata.
+    Does not commit.
+    """
+    # The memory is going away: adds still waiting to be applied must not land after the purge
+    await db.execute(delete(VectorOutbox).where(VectorOutbox.op == "add", _pending_for_memory(memory_id)))
+    db.add(VectorOutbox(
+        op="purge", user_id=user_id, vector_id=f"purge:mem_{memory_id}",
+        meta={"memory_id": memory_id, "ids": list(fallback_ids)},
+    ))
+
+
+async def stored_vectors(db, vector_store, executor, memory_id: int) -> Optional[dict]:
+    """
+    {vector_id: metadata} for a memory's vectors: what the store holds (looked up by
+    memory_id metadata) with this memory's pending outbox ops applied on top, in commit
+    order. None if the store can't be searched by metadata.
+    """
+    collection = shared_collection(vector_store)
+    if collection is None:
+        return None
+    found = await executor.run(collection.get, where={"memory_id": memory_id}, include=["metadatas"])
+    stored = dict(zip(found.get("ids") or [], found.get("metadatas") or []))
+    result = await db.execute(
+        select(VectorOutbox.op, VectorOutbox.vector_id, VectorOutbox.meta)
+        .filter(_pending_for_memory(memory_id))
+        .order_by(VectorOutbox.id)
+    )
+    for op, vector_id, meta in result.all():
+        if op == "add":
+            stored[vector_id] = meta or {}
+        elif op == "delete":
+            stored.pop(vector_id, None)
+    return stored
+
+
+class OutboxWorker:
+    """Background task that applies pending VectorOutbox rows to the vector store."""
+
+    def __init__(self, session_factory, get_vector_store: Callable[[], Awaitable], executor,
+                 batch_size: int = 500, interval: float = 1.0,
+                 max_backoff: float = 300.0, on_applied: Optional[Callable] = None):
+        self.session_factory = session_factory
+        # Called with the set of user IDs whose vectors changed after each applied batch
+        self.on_applied = on_applied
+        self.get_vector_store = get_vector_store
+        self.executor = executor
+        self.batch_size = batch_size
+        self.interval = interval
+        self.max_backoff = max_backoff
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self.flushed_ops = 0
+        self.coalesced_ops = 0
+        self.failed_batches = 0
+        self.last_error: Optional[str] = None
+
+    def start(self) -> None:
+        """Start the worker on the running loop if it isn't already running."""
+        if self._task is not None and not self._task.done():
+            return
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def notify(self) -> None:
+        """Wake the worker after a commit that enqueued work."""
+        self.start()
+        self._wakeup.set()
+
+    async def _run(self):
+        while True:
+            try:
+                await ensure_schema(self.session_factory)
+                # Keep draining while full batches come back
+                while await self.flush_once() >= self.batch_size:
+                    pass
+            except SchemaNotReady as e:
+                # Already logged by ensure_schema; retried until the migrations are run
+                self.last_error = str(e)
+            except Exception as e:
+                self.last_error = str(e)
+                logger.error(f"Outbox flush failed: {e}", exc_info=True)
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    async def flush_once(self) -> int:
+        """Apply one batch of due outbox rows. Returns the number of rows picked up."""
+        async with self.session_factory() as db:
+            result = await db.execute(
+                select(VectorOutbox)
+                .filter(VectorOutbox.next_attempt_at <= datetime.utcnow())
+                .order_by(VectorOutbox.id)
+                .limit(self.batch_size)
+                .with_for_update(skip_locked=True)
+            )
+            rows = result.scalars().all()
+            if not rows:
+                return 0
+
+            # Coalesce: rows are in commit order, so the last op per vector ID wins
+            latest = {}
+            for row in rows:
+                latest[row.vector_id] = row
+            self.coalesced_ops += len(rows) - len(latest)
+
+            delete_ids = [vid for vid, row in latest.items() if row.op == "delete"]
+            adds = [row for row in latest.values() if row.op == "add"]
+            purges = [row for row in latest.values() if row.op == "purge"]
+            delete_rows = [row for row in rows if latest[row.vector_id].op == "delete"]
+            add_rows = [row for row in rows if latest[row.vector_id].op == "add"]
+            purge_rows = [row for row in rows if latest[row.vector_id].op == "purge"]
+
+            vector_store = await self.get_vector_store()
+            done, failed = [], []
+            if purges:
+                try:
+                    purged = await self.executor.run(self._resolve_purges, vector_store, purges)
+                    if purged:
+                        await self.executor.run(vector_store.delete, ids=purged)
+                    done.extend(purge_rows)
+                except Exception as e:
+                    failed.append((purge_rows, e))
+            if delete_ids:
+                try:
+                    await self.executor.run(vector_store.delete, ids=delete_ids)
+                    done.extend(delete_rows)
+                except Exception as e:
+                    failed.append((delete_rows, e))
+            if adds:
+                try:
+                    await self.executor.run(
+                        vector_store.add_documents,
+                        ids=[row.vector_id for row in adds],
+                        documents=[row.document for row in adds],
+                        metadatas=[row.meta or {} for row in adds],
+                    )
+                    done.extend(add_rows)
+                except Exception as e:
+                    failed.append((add_rows, e))
+
+            if done:
+                # Also drop older rows for the same IDs still waiting on a retry: they are
+                # superseded by the op just applied and must not replay after it.
+                done_ids = list({row.vector_id for row in done})
+                await db.execute(
+                    delete(VectorOutbox).where(
+                        VectorOutbox.vector_id.in_(done_ids),
+                        VectorOutbox.id <= max(row.id for row in done),
+                    )
+                )
+                self.flushed_ops += len(done)
+
+            now = datetime.utcnow()
+            for failed_rows, error in failed:
+                self.failed_batches += 1
+                self.last_error = str(error)
+                logger.error(f"Outbox batch of {len(failed_rows)} ops failed, will retry: {error}")
+                for row in failed_rows:
+                    row.attempts += 1
+                    row.last_error = str(error)[:1000]
+                    row.next_attempt_at = now + timedelta(seconds=min(2 ** row.attempts, self.max_backoff))
+
+            await db.commit()
+            if done and self.on_applied:
+                self.on_applied({row.user_id for row in done if row.user_id is not None})
+            return len(rows)
+
+    @staticmethod
+    def _resolve_purges(vector_store, purges) -> list:
+        """Vector IDs the purge ops remove."""
+        collection = shared_collection(vector_store)
+        resolved = []
+        for row in purges:
+            meta = row.meta or {}
+            if collection is not None:
+                ids = collection.get(where={"memory_id": meta["memory_id"]}, include=[]).get("ids") or []
+            else:
+                ids = meta.get("ids") or []
+            resolved.extend(ids)
+        return resolved
+
+    async def pending(self) -> int:
+        async with self.session_factory() as db:
+            result = await db.execute(select(func.count(VectorOutbox.id)))
+            return result.scalar() or 0
+
+    def stats(self) -> dict:
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "flushed_ops": self.flushed_ops,
+            "coalesced_ops": self.coalesced_ops,
+            "failed_batches": self.failed_batches,
+            "last_error": self.last_error,
+        }
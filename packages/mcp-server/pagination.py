@@ -0,0 +1,52 @@
+"""
+Keyset (cursor) pagination helpers.
+
+A cursor encodes the sort key of the last row on a page, and the next page is
+"rows strictly after that key". Unlike OFFSET, the cost of fetching a page does
+not grow with how deep the client has scrolled.
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Any, List, Optional, Sequence, Tuple
+
+from sqlalchemy import and_, or_
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """Opaque, URL-safe cursor for a sort key (datetimes are stored as ISO strings)."""
+    payload = [
+        {"dt": v.isoformat()} if isinstance(v, datetime) else v
+        for v in values
+    ]
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(",", ":")).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[List[Any]]:
+    """Inverse of encode_cursor. Raises ValueError on a malformed cursor."""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+    except Exception:
+        raise ValueError("Invalid cursor.")
+    if not isinstance(payload, list):
+        raise ValueError("Invalid cursor.")
+    return [
+        datetime.fromisoformat(v["dt"]) if isinstance(v, dict) and "dt" in v else v
+        for v in payload
+    ]
+
+
+def keyset_after(keys: Sequence[Tuple[Any, Any]], descending: bool = True):
+    """
+    SQL predicate selecting rows that sort strictly after the given key, i.e. the
+    lexicographic comparison (c1, c2, ...) < (v1, v2, ...) (or > when ascending).
+    keys: [(column_expression, cursor_value), ...] in sort order.
+    """
+    col, value = keys[0]
+    beyond = col < value if descending else col > value
+    if len(keys) == 1:
+        return beyond
+    return or_(beyond, and_(col == value, keyset_after(keys[1:], descending)))
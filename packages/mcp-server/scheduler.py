@@ -0,0 +1,238 @@
+"""
+Per-tenant rate limiting and fair scheduling for MCP tools.
+
+Tools are assigned to lanes ("retrieval", "ingestion", "listing", "light"). Each lane
+has its own concurrency limit and a token bucket per user. A call is admitted once
+the caller's user is known (see get_current_user): an empty bucket fails at once with
+RateLimitedError, otherwise the call waits for a lane slot. Callers should not hold a
+database connection while they wait (see would_queue). Freed slots are handed
+to waiting users round-robin, so one tenant looping on an expensive tool queues
+behind its own calls while everyone else keeps getting turns. Cheap tools use the
+"light" lane, so a saturated retrieval lane never delays them.
+"""
+import asyncio
+import contextvars
+import functools
+import time
+from collections import OrderedDict, deque
+from typing import Dict, Optional
+
+from cache import TTLCache, MISS
+
+
+class RateLimitedError(Exception):
+    """Raised when a user is over their rate or queue allowance for a lane."""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self) -> float:
+        """Consume one token. Returns 0 on success, else seconds until one is available."""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class Lane:
+    """
+    - concurrency: calls running at once across all users.
+    - rate / burst: per-user token bucket (calls per second, bucket size).
+    - max_waiting: calls one user may have queued for a slot; beyond that, throttled.
+    - max_wait: seconds a queued call waits for a slot before giving up.
+    """
+
+    def __init__(self, name: str, concurrency: int, rate: float, burst: float,
+                 max_waiting: int = 4, max_wait: float = 30.0):
+        self.name = name
+        self.concurrency = concurrency
+        self.rate = rate
+        self.burst = burst
+        self.max_waiting = max_waiting
+        self.max_wait = max_wait
+        # An idle bucket refills completely within burst/rate seconds, so dropping it then is lossless
+        self._buckets = TTLCache(maxsize=100000, ttl=max(burst / rate, 1.0) if rate > 0 else 3600.0)
+        # user_id -> queued futures; iteration order is the round-robin order
+        self._waiting: "OrderedDict[int, deque]" = OrderedDict()
+        self._active = 0
+        # Moving average of how long a slot is held, for retry-after estimates
+        self._hold_time = 0.5
+        self.admitted = 0
+        self.queued = 0
+        self.throttled = 0
+
+    def _retry_after(self, queued_ahead: int) -> float:
+        return max(1.0, self._hold_time * (queued_ahead + 1) / max(self.concurrency, 1))
+
+    def _check_rate(self, user_id: int) -> None:
+        if self.rate <= 0:
+            return
+        bucket = self._buckets.get(user_id)
+        if bucket is MISS:
+            bucket = TokenBucket(self.rate, self.burst)
+            self._buckets.set(user_id, bucket)
+        wait = bucket.take()
+        if wait:
+            self.throttled += 1
+            raise RateLimitedError(f"Rate limit exceeded for {self.name} tools", retry_after=wait)
+
+    def is_full(self) -> bool:
+        """True if a new call would have to queue for a slot."""
+        return self._active >= self.concurrency or bool(self._waiting)
+
+    async def acquire(self, user_id: int) -> None:
+        self._check_rate(user_id)
+        if self._active < self.concurrency and not self._waiting:
+            self._active += 1
+            self.admitted += 1
+            return
+
+        queue = self._waiting.get(user_id)
+        if queue is not None and len(queue) >= self.max_waiting:
+            self.throttled += 1
+            raise RateLimitedError(f"Too many queued {self.name} calls", retry_after=self._retry_after(len(queue)))
+        if queue is None:
+            queue = self._waiting[user_id] = deque()
+        future = asyncio.get_running_loop().create_future()
+        queue.append(future)
+        self.queued += 1
+        try:
+            await asyncio.wait_for(future, self.max_wait)
+        except asyncio.TimeoutError:
+            self._discard(user_id, future)
+            self.throttled += 1
+            raise RateLimitedError(f"Timed out waiting for a {self.name} slot", retry_after=self._retry_after(len(queue)))
+        except BaseException:
+            if future.done() and not future.cancelled():
+                # The slot was handed over just as the caller went away: pass it on
+                self.release()
+            else:
+                self._discard(user_id, future)
+            raise
+        self.admitted += 1
+
+    def _discard(self, user_id: int, future) -> None:
+        queue = self._waiting.get(user_id)
+        if queue is None:
+            return
+        try:
+            queue.remove(future)
+        except ValueError:
+            pass
+        if not queue:
+            del self._waiting[user_id]
+
+    def release(self, held: Optional[float] = None) -> None:
+        if held is not None:
+            self._hold_time = 0.9 * self._hold_time + 0.1 * held
+        # Hand the slot straight to the next user in round-robin order
+        while self._waiting:
+            user_id, queue = next(iter(self._waiting.items()))
+            future = queue.popleft()
+            if queue:
+                self._waiting.move_to_end(user_id)
+            else:
+                del self._waiting[user_id]
+            if not future.done():
+                future.set_result(None)
+                return
+        self._active -= 1
+
+    def stats(self) -> dict:
+        return {
+            "concurrency": self.concurrency,
+            "active": self._active,
+            "waiting_users": len(self._waiting),
+            "waiting_calls": sum(len(q) for q in self._waiting.values()),
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "throttled": self.throttled,
+        }
+
+
+class _Admission:
+    __slots__ = ("lane", "started", "error")
+
+    def __init__(self, lane: Lane):
+        self.lane = lane
+        self.started: Optional[float] = None
+        self.error: Optional[RateLimitedError] = None
+
+
+_current: contextvars.ContextVar[Optional[_Admission]] = contextvars.ContextVar("mcp_lane_admission", default=None)
+
+
+class Scheduler:
+    def __init__(self, lanes: Dict[str, Lane], enabled: bool = True):
+        self.lanes = lanes
+        self.enabled = enabled
+
+    def lane(self, name: str):
+        """
+        Assign an async tool to a lane. The slot is taken by admit() once the user is
+        known and released when the tool returns. A throttled call returns a
+        retry-after error string, matching how tools report other failures.
+        """
+        lane = self.lanes[name]
+
+        def decorator(fn):
+            @functools.wraps(fn)
+            async def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return await fn(*args, **kwargs)
+                admission = _Admission(lane)
+                token = _current.set(admission)
+                try:
+                    result = await fn(*args, **kwargs)
+                except RateLimitedError as e:
+                    admission.error = e
+                finally:
+                    _current.reset(token)
+                    if admission.started is not None:
+                        lane.release(time.monotonic() - admission.started)
+                # Tools turn exceptions into generic error strings; report throttling plainly
+                if admission.error is not None:
+                    return format_throttled(admission.error)
+                return result
+
+            return wrapper
+
+        return decorator
+
+    def would_queue(self) -> bool:
+        """True if admit() is still pending for the current tool and would wait for a slot."""
+        admission = _current.get()
+        return admission is not None and admission.started is None and admission.lane.is_full()
+
+    async def admit(self, user_id: int) -> None:
+        """Take a slot in the current tool's lane for user_id (no-op outside a laned tool)."""
+        admission = _current.get()
+        if admission is None or admission.started is not None:
+            return
+        try:
+            await admission.lane.acquire(user_id)
+        except RateLimitedError as e:
+            admission.error = e
+            raise
+        admission.started = time.monotonic()
+
+    def stats(self) -> dict:
+        return {"enabled": self.enabled, **{name: lane.stats() for name, lane in self.lanes.items()}}
+
+
+def format_throttled(error: RateLimitedError) -> str:
+    return f"Error: {error}. Retry after {error.retry_after:.1f}s."
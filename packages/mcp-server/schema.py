@@ -0,0 +1,89 @@
+"""
+Tables owned by the MCP server itself (outbox, tag index, ...).
+
+They live on their own declarative base so they don't depend on the backend's
+model registry. They are created by a separate Alembic chain (migrations/, tracked
+in mcp_alembic_version): run `alembic upgrade head` from packages/mcp-server before
+starting the server, or upgrade() from code. The server itself runs no DDL unless
+BRAIN_VAULT_AUTO_MIGRATE=1; ensure_schema() only checks that the chain is at head.
+"""
+import asyncio
+import logging
+import os
+
+from sqlalchemy.orm import declarative_base
+
+logger = logging.getLogger("mcp_server.schema")
+
+McpBase = declarative_base()
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+VERSION_TABLE = "mcp_alembic_version"
+
+AUTO_MIGRATE = os.environ.get("BRAIN_VAULT_AUTO_MIGRATE", "0") == "1"
+
+_schema_ready = False
+_schema_reported = False
+_schema_lock = asyncio.Lock()
+
+
+class SchemaNotReady(RuntimeError):
+    """The MCP migrations have not been applied (up to head) to this database."""
+
+
+def _alembic_config():
+    from alembic.config import Config
+
+    config = Config()
+    config.set_main_option("script_location", MIGRATIONS_DIR)
+    return config
+
+
+async def upgrade(session_factory, revision: str = "head") -> None:
+    """Apply the MCP migrations up to `revision` on the session factory's database."""
+    from alembic import command
+
+    def run(connection):
+        config = _alembic_config()
+        config.attributes["connection"] = connection
+        command.upgrade(config, revision)
+
+    async with session_factory() as db:
+        conn = await db.connection()
+        await conn.run_sync(run)
+        await db.commit()
+
+
+def _revisions(connection):
+    from alembic.migration import MigrationContext
+    from alembic.script import ScriptDirectory
+
+    current = MigrationContext.configure(connection, opts={"version_table": VERSION_TABLE}).get_current_heads()
+    heads = ScriptDirectory.from_config(_alembic_config()).get_heads()
+    return set(current), set(heads)
+
+
+async def ensure_schema(session_factory) -> None:
+    """
+    Check once per process that the MCP migrations are at head (applying them first
+    when AUTO_MIGRATE is set). Raises SchemaNotReady otherwise; the error is logged once.
+    """
+    global _schema_ready, _schema_reported
+    if _schema_ready:
+        return
+    async with _schema_lock:
+        if _schema_ready:
+            return
+        if AUTO_MIGRATE:
+            await upgrade(session_factory)
+        async with session_factory() as db:
+            conn = await db.connection()
+            current, heads = await conn.run_sync(_revisions)
+        if current != heads:
+            message = (f"MCP tables are at revision {', '.join(sorted(current)) or 'none'}, expected "
+                       f"{', '.join(sorted(heads))}: run `alembic upgrade head` in packages/mcp-server")
+            if not _schema_reported:
+                logger.error(message)
+                _schema_reported = True
+            raise SchemaNotReady(message)
+        _schema_ready = True
@@ -0,0 +1,256 @@
+"""
+Incrementally maintained per-user tag index (tag -> count, last used).
+
+Counts are kept alongside a per-memory snapshot of the tags they were counted from
+(mcp_memory_tags). MCP write tools call record()/forget() in the same transaction as
+the memory change, so get_all_tags can be served in O(tags) instead of scanning every
+memory. Memories created, retagged or deleted by the web app are picked up by sync():
+it builds a user's index on first use, then diffs memories changed since the last sync
+against their snapshots and drops snapshots whose memory is gone. Diffing against the
+snapshot makes every step idempotent, so overlapping syncs and MCP writes never count
+a memory twice.
+"""
+import ast
+import json
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import Column, DateTime, Integer, String, Text, delete, func, or_, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.future import select
+
+from schema import McpBase
+
+# Per-process throttle for sync(); web-app tag changes show up within this long
+SYNC_INTERVAL = 5.0
+# Re-scan a little before the last sync so rows committed while it ran aren't missed
+SYNC_OVERLAP = timedelta(seconds=60)
+
+_last_sync: Dict[int, float] = {}
+
+
+class TagIndex(McpBase):
+    __tablename__ = "mcp_tag_index"
+
+    user_id = Column(Integer, primary_key=True)
+    tag = Column(String(255), primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+    last_used_at = Column(DateTime, nullable=True)
+
+
+class TagIndexState(McpBase):
+    __tablename__ = "mcp_tag_index_state"
+
+    user_id = Column(Integer, primary_key=True)
+    built_at = Column(DateTime, nullable=False)
+    synced_at = Column(DateTime, nullable=True)
+
+
+class MemoryTags(McpBase):
+    """The tags each memory was last counted with."""
+    __tablename__ = "mcp_memory_tags"
+
+    memory_id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, nullable=False, index=True)
+    tags = Column(Text, nullable=False, default="[]")
+
+
+def parse_tags(raw) -> List[str]:
+    """Tags may be stored as a list or as a JSON/Python repr of one depending on the backend."""
+    if not raw:
+        return []
+    if isinstance(raw, (list, tuple)):
+        tags = raw
+    else:
+        try:
+            tags = json.loads(raw)
+        except (TypeError, ValueError):
+            try:
+                tags = ast.literal_eval(raw)
+            except (ValueError, SyntaxError):
+                return []
+    if not isinstance(tags, (list, tuple)):
+        return []
+    return [str(t).strip() for t in tags if t is not None and str(t).strip()]
+
+
+def _insert(db):
+    return pg_insert if db.bind.dialect.name == "postgresql" else sqlite_insert
+
+
+async def _state(db, user_id: int) -> Optional[TagIndexState]:
+    result = await db.execute(select(TagIndexState).filter(TagIndexState.user_id == user_id))
+    return result.scalars().first()
+
+
+async def _apply_delta(db, user_id: int, delta: Counter) -> None:
+    delta = {tag: n for tag, n in delta.items() if n}
+    if not delta:
+        return
+    now = datetime.utcnow()
+    insert = _insert(db)
+    for tag, n in delta.items():
+        if n > 0:
+            stmt = insert(TagIndex).values(user_id=user_id, tag=tag, count=n, last_used_at=now)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[TagIndex.user_id, TagIndex.tag],
+                set_={"count": TagIndex.count + n, "last_used_at": now},
+            )
+            await db.execute(stmt)
+        else:
+            await db.execute(
+                update(TagIndex)
+                .where(TagIndex.user_id == user_id, TagIndex.tag == tag)
+                .values(count=TagIndex.count + n)
+            )
+    if any(n < 0 for n in delta.values()):
+        await db.execute(delete(TagIndex).where(TagIndex.user_id == user_id, TagIndex.count <= 0))
+
+
+async def _record(db, user_id: int, tags_by_memory: Dict[int, List[str]]) -> None:
+    if not tags_by_memory:
+        return
+    result = await db.execute(
+        select(MemoryTags)
+        .filter(MemoryTags.memory_id.in_(list(tags_by_memory)))
+        .with_for_update()
+    )
+    snapshots = {s.memory_id: s for s in result.scalars().all()}
+    delta = Counter()
+    for memory_id, tags in tags_by_memory.items():
+        snapshot = snapshots.get(memory_id)
+        old = parse_tags(snapshot.tags) if snapshot else []
+        if snapshot and Counter(old) == Counter(tags):
+            continue
+        delta.update(tags)
+        delta.subtract(old)
+        if snapshot:
+            snapshot.tags = json.dumps(tags)
+        else:
+            db.add(MemoryTags(memory_id=memory_id, user_id=user_id, tags=json.dumps(tags)))
+    await _apply_delta(db, user_id, delta)
+
+
+async def record(db, user_id: int, memory_id: int, tags: Iterable[str]) -> None:
+    """
+    Count a memory with its current tags (created or retagged). Does not commit. Skipped
+    when the user's index has not been built yet, since the first build counts everything.
+    """
+    if await _state(db, user_id) is None:
+        return
+    await _record(db, user_id, {memory_id: [t for t in tags if t]})
+
+
+async def forget(db, user_id: int, memory_ids: Iterable[int]) -> None:
+    """Uncount deleted memories. Does not commit."""
+    memory_ids = list(memory_ids)
+    if not memory_ids:
+        return
+    result = await db.execute(
+        select(MemoryTags).filter(MemoryTags.user_id == user_id, MemoryTags.memory_id.in_(memory_ids))
+    )
+    delta = Counter()
+    for snapshot in result.scalars().all():
+        delta.subtract(parse_tags(snapshot.tags))
+        await db.delete(snapshot)
+    await _apply_delta(db, user_id, delta)
+
+
+async def rebuild(db, user_id: int, memory_model) -> None:
+    """Recount a user's tags from the memories table (reads only the tags column). Commits."""
+    started = datetime.utcnow()
+    result = await db.execute(
+        select(memory_model.id, memory_model.tags, memory_model.created_at).filter(memory_model.user_id == user_id)
+    )
+    counts, last_used, snapshots = Counter(), {}, []
+    for memory_id, raw_tags, created_at in result.all():
+        tags = parse_tags(raw_tags)
+        snapshots.append({"memory_id": memory_id, "user_id": user_id, "tags": json.dumps(tags)})
+        for tag in tags:
+            counts[tag] += 1
+            if created_at and (tag not in last_used or created_at > last_used[tag]):
+                last_used[tag] = created_at
+
+    await db.execute(delete(TagIndex).where(TagIndex.user_id == user_id))
+    await db.execute(delete(MemoryTags).where(MemoryTags.user_id == user_id))
+    if counts:
+        await db.execute(
+            _insert(db)(TagIndex),
+            [{"user_id": user_id, "tag": t, "count": n, "last_used_at": last_used.get(t)} for t, n in counts.items()],
+        )
+    if snapshots:
+        await db.execute(_insert(db)(MemoryTags), snapshots)
+    await db.execute(delete(TagIndexState).where(TagIndexState.user_id == user_id))
+    db.add(TagIndexState(user_id=user_id, built_at=started, synced_at=started))
+    await db.commit()
+    _last_sync[user_id] = time.monotonic()
+
+
+def _changed_since(model, since):
+    if hasattr(model, "updated_at"):
+        return or_(model.created_at > since, model.updated_at > since)
+    return model.created_at > since
+
+
+async def sync(db, user_id: int, memory_model) -> None:
+    """
+    Bring a user's index up to date with memories changed outside the MCP server.
+    Builds it on first use; afterwards reads only memories created or updated since the
+    last sync, plus an anti-join for deletions when the snapshot count shows any.
+    Throttled to once per SYNC_INTERVAL per process. Commits.
+    """
+    state = await _state(db, user_id)
+    if state is None:
+        try:
+            await rebuild(db, user_id, memory_model)
+        except IntegrityError:
+            # Another worker built it concurrently
+            await db.rollback()
+        return
+
+    now = time.monotonic()
+    if now - _last_sync.get(user_id, -SYNC_INTERVAL) < SYNC_INTERVAL:
+        return
+    _last_sync[user_id] = now
+
+    started = datetime.utcnow()
+    since = (state.synced_at or state.built_at) - SYNC_OVERLAP
+    result = await db.execute(
+        select(memory_model.id, memory_model.tags).filter(
+            memory_model.user_id == user_id, _changed_since(memory_model, since)
+        )
+    )
+    await _record(db, user_id, {memory_id: parse_tags(raw) for memory_id, raw in result.all()})
+    await db.flush()
+
+    live = await db.scalar(select(func.count()).select_from(memory_model).filter(memory_model.user_id == user_id))
+    counted = await db.scalar(select(func.count()).select_from(MemoryTags).filter(MemoryTags.user_id == user_id))
+    if counted > live:
+        gone = await db.execute(
+            select(MemoryTags.memory_id).filter(
+                MemoryTags.user_id == user_id,
+                ~select(memory_model.id).filter(memory_model.id == MemoryTags.memory_id).exists(),
+            )
+        )
+        await forget(db, user_id, [row[0] for row in gone.all()])
+
+    state.synced_at = started
+    await db.commit()
+
+
+async def list_tags(db, user_id: int, prefix: Optional[str] = None, limit: Optional[int] = None):
+    """Returns [(tag, count, last_used_at)] ordered by tag."""
+    query = select(TagIndex.tag, TagIndex.count, TagIndex.last_used_at).filter(
+        TagIndex.user_id == user_id, TagIndex.count > 0
+    )
+    if prefix:
+        query = query.filter(TagIndex.tag.startswith(prefix, autoescape=True))
+    query = query.order_by(TagIndex.tag)
+    if limit:
+        query = query.limit(limit)
+    result = await db.execute(query)
+    return result.all()
@@ -0,0 +1,48 @@
+"""
+Parity of the int8 ONNX embedding backend with the sentence-transformers model it is
+exported from (the same check as `python embedding_backends.py --parity`). Skipped
+unless onnxruntime and sentence-transformers are installed; the first run downloads,
+exports and quantizes the model into BRAIN_VAULT_ONNX_DIR.
+"""
+import os
+
+import pytest
+
+pytest.importorskip("onnxruntime")
+sentence_transformers = pytest.importorskip("sentence_transformers")
+
+import embedding_backends
+
+MODEL = os.environ.get("BRAIN_VAULT_ONNX_MODEL", embedding_backends.DEFAULT_MODEL)
+
+
+@pytest.fixture(scope="module")
+def reference():
+    try:
+        return sentence_transformers.SentenceTransformer(MODEL, device="cpu")
+    except OSError as e:
+        # Not cached and the Hugging Face Hub is unreachable
+        pytest.skip(f"{MODEL} unavailable: {e}")
+
+
+@pytest.fixture(scope="module")
+def backend(reference):
+    try:
+        return embedding_backends.load_onnx_backend(MODEL)
+    except (OSError, RuntimeError) as e:
+        # No ONNX export available and optimum isn't installed (or can't download) to make one
+        pytest.skip(str(e))
+
+
+def test_max_length_follows_model(reference, backend):
+    assert backend.max_length == reference.max_seq_length
+
+
+def test_parity_with_reference_model(reference, backend):
+    result = embedding_backends.parity_check(
+        lambda batch: reference.encode(batch, convert_to_numpy=True),
+        backend,
+        embedding_backends.PARITY_TEXTS,
+    )
+    assert result["passed"], result
+    assert result["neighbour_agreement"] >= 0.9, result